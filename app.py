@@ -1,5 +1,3 @@
-import os
-import sqlite3
 #!/usr/bin/env python3
 """
 WhatsApp AI Assistant Webhook Server
@@ -7,14 +5,31 @@ Receives webhook notifications from whatsapp-mcp and processes messages.
 """
 
 import os
+import hmac
 import json
 import logging
+from contextlib import nullcontext
 from datetime import datetime
 from flask import Flask, request, jsonify
 import requests
 from dotenv import load_dotenv
-import openai
-from dotenv import load_dotenv
+from llm_client import get_llm_client_manager
+from response_cache import cache_key, get_response_cache, parse_routes
+from mcp_client import MCPClient
+from sharding import ShardSet, shard_archive_dir
+from write_behind import WriteBehindQueue
+from message_cache import RecentMessageCache
+from message_archive import MessageArchiver
+from retention import RetentionManager, RetentionPolicy, parse_chat_policies
+from backup import BackupManager
+from epoch_ms import to_epoch_ms
+from message_bodies import BodyInterner, content_sql, insert_values_sql
+import schema
+import chat_stats
+from summary_window import parse_summary_window
+from rolling_summary import RollingSummarizer
+from context_builder import ContextBuilder
+from single_flight import SingleFlight
 
 # Load environment variables
 load_dotenv()
@@ -24,62 +39,279 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+mcp_client = MCPClient()
 
 # Configuration
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 MCP_BASE_URL = os.getenv('MCP_BASE_URL', 'http://localhost:3000')
 DATABASE_PATH = os.getenv('DATABASE_PATH', 'messages.db')
-
-# Initialize OpenAI client (will be done in function calls)
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', '8192'))
+DB_SHARDS = int(os.getenv('DB_SHARDS', '1'))
+WRITE_BEHIND = os.getenv('WRITE_BEHIND', 'False').lower() == 'true'
+WRITE_BEHIND_BATCH = int(os.getenv('WRITE_BEHIND_BATCH', '500'))
+WRITE_BEHIND_INTERVAL_MS = int(os.getenv('WRITE_BEHIND_INTERVAL_MS', '50'))
+HISTORY_CACHE_PER_CHAT = int(os.getenv('HISTORY_CACHE_PER_CHAT', '50'))
+HISTORY_CACHE_MAX_MB = int(os.getenv('HISTORY_CACHE_MAX_MB', '64'))
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '0'))
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', os.path.join(os.path.dirname(os.path.abspath(DATABASE_PATH)), 'archive'))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv('ARCHIVE_INTERVAL_HOURS', '24'))
+RETENTION_MAX_AGE_DAYS = float(os.getenv('RETENTION_MAX_AGE_DAYS', '0'))
+RETENTION_MAX_ROWS_PER_CHAT = int(os.getenv('RETENTION_MAX_ROWS_PER_CHAT', '0'))
+RETENTION_CHAT_POLICIES = parse_chat_policies(os.getenv('RETENTION_CHAT_POLICIES'))
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', '1'))
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv('LLM_MAX_CONCURRENT_REQUESTS', '8'))
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '60'))
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', '3000'))
+LLM_MAX_TOKENS = int(os.getenv('LLM_MAX_TOKENS', '150'))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', '3600'))
+LLM_CACHE_DB_PATH = os.getenv('LLM_CACHE_DB_PATH') or None
+LLM_CACHE_ROUTES = parse_routes(os.getenv('LLM_CACHE_ROUTES', 'chat,summary,simple'))
+BACKUP_DIR = os.getenv('BACKUP_DIR')
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', '24'))
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '7'))
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+MAX_SUMMARY_MESSAGES = int(os.getenv('MAX_SUMMARY_MESSAGES', '20'))
+MAX_SUMMARY_WINDOW_MESSAGES = int(os.getenv('MAX_SUMMARY_WINDOW_MESSAGES', '200'))
+
+# Long-lived connections shared by every request (WAL, synchronous=NORMAL).
+# With DB_SHARDS > 1 chats are hashed across that many files, each with its own writer.
+shards = ShardSet(DATABASE_PATH, DB_SHARDS, cache_size_kb=DB_CACHE_SIZE_KB)
+
+# Optional group commit: inserts are batched and committed by one writer thread per shard
+write_queues = [
+    WriteBehindQueue(manager, max_batch=WRITE_BEHIND_BATCH, flush_interval_ms=WRITE_BEHIND_INTERVAL_MS)
+    for manager in shards.managers
+] if WRITE_BEHIND else None
+
+# Newest messages of active chats, kept in memory so history reads skip SQLite
+history_cache = RecentMessageCache(
+    per_chat=HISTORY_CACHE_PER_CHAT, max_bytes=HISTORY_CACHE_MAX_MB * 1024 * 1024
+) if HISTORY_CACHE_PER_CHAT > 0 else None
+
+# Moves messages older than ARCHIVE_AFTER_DAYS into per-month files (0 disables)
+archivers = [
+    MessageArchiver(
+        path, shard_archive_dir(ARCHIVE_DIR, path, DB_SHARDS), max_age_days=ARCHIVE_AFTER_DAYS,
+        order_column='timestamp_ms'
+    )
+    for path in shards.paths
+] if ARCHIVE_AFTER_DAYS > 0 else None
+
+# Deletes messages beyond the retention limits in small batches (all limits 0 disables)
+retention_managers = [
+    RetentionManager(
+        path,
+        RetentionPolicy(max_age_days=RETENTION_MAX_AGE_DAYS or None, max_rows=RETENTION_MAX_ROWS_PER_CHAT or None),
+        RETENTION_CHAT_POLICIES,
+        order_column='timestamp_ms',
+        # Deleted messages must not be served from the history cache (or reach prompts)
+        on_delete=history_cache.invalidate if history_cache else None
+    )
+    for path in shards.paths
+] if RETENTION_MAX_AGE_DAYS > 0 or RETENTION_MAX_ROWS_PER_CHAT > 0 or RETENTION_CHAT_POLICIES else None
+
+# Compressed online snapshots of every shard in BACKUP_DIR (unset disables)
+backup_managers = [
+    BackupManager(path, BACKUP_DIR, keep=BACKUP_KEEP, pages_per_step=BACKUP_PAGES_PER_STEP)
+    for path in shards.paths
+] if BACKUP_DIR else None
+
+# Repeated bot replies (help text, error messages) are stored once per shard
+body_interners = [BodyInterner(manager) for manager in shards.managers]
+
+# Columns of history rows read back from the archive files (bot replies are stored there in full)
+ARCHIVE_HISTORY_COLUMNS = 'sender, content, timestamp, id, timestamp_ms'
+
+def write_queue_for(chat_id):
+    """Return the write-behind queue of a chat's shard, or None"""
+    return write_queues[shards.index(chat_id)] if write_queues else None
+
+def archiver_for(chat_id):
+    """Return the archiver of a chat's shard, or None"""
+    return archivers[shards.index(chat_id)] if archivers else None
+
+# One pooled OpenAI client for all request threads, at most LLM_MAX_CONCURRENT_REQUESTS calls in flight
+llm = get_llm_client_manager(
+    OPENAI_API_KEY,
+    max_concurrent=LLM_MAX_CONCURRENT_REQUESTS,
+    connect_timeout=LLM_CONNECT_TIMEOUT,
+    read_timeout=LLM_READ_TIMEOUT,
+    max_connections=LLM_MAX_CONNECTIONS
+)
+
+# Repeated prompts on the routes in LLM_CACHE_ROUTES are answered from memory (0 entries disables)
+response_cache = get_response_cache(
+    LLM_CACHE_DB_PATH,
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+    routes=LLM_CACHE_ROUTES
+) if LLM_CACHE_MAX_ENTRIES > 0 else None
+
+# Identical requests made at the same time (e.g. several members sending /summary) share one API call
+llm_flights = SingleFlight()
+
+# Replies send as much recent history as fits LLM_CONTEXT_TOKENS, leaving LLM_MAX_TOKENS for the answer
+context_builder = ContextBuilder(
+    "You are a helpful WhatsApp AI assistant. Keep responses concise and helpful.",
+    max_context_tokens=LLM_CONTEXT_TOKENS,
+    max_completion_tokens=LLM_MAX_TOKENS
+)
 
 def init_database():
-    """Initialize SQLite database for storing messages"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            chat_id TEXT NOT NULL,
-            sender TEXT NOT NULL,
-            timestamp DATETIME NOT NULL,
-            content TEXT NOT NULL,
-            message_type TEXT DEFAULT 'text'
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
+    """Create or migrate the shared messages schema (see schema.py) in every shard"""
+    for path in shards.paths:
+        schema.initialize(path)
+    for archiver in archivers or []:
+        # Older archive files get the hot table's columns (timestamp_ms for range reads)
+        archiver.upgrade()
 
 def store_message(chat_id, sender, content, message_type='text'):
     """Store a message in the database"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+    sql = f'''
+        INSERT INTO messages (chat_id, sender, timestamp, content, body_id, message_type, timestamp_ms)
+        VALUES (?1, ?2, ?3, {insert_values_sql('?4', '?6')}, ?5, ?7)
+    '''
+    timestamp = datetime.now()
+    # Naive local time taken as UTC, as epoch_ms_sql does for the rows other writers store
+    timestamp_ms = to_epoch_ms(timestamp)
+    # Bot replies that repeat verbatim reference one shared copy of their text
+    body_id = body_interners[shards.index(chat_id)].intern(content) if sender == 'bot' else None
+    params = (chat_id, sender, timestamp, content, message_type, body_id, timestamp_ms)
+    
+    # A warm-up of the history cache overlapping this write must not also install the row
+    with history_cache.writing(chat_id) if history_cache else nullcontext():
+        row_id = None
+        write_queue = write_queue_for(chat_id)
+        if write_queue:
+            # Committed with the next batch; visible to readers after the flush
+            write_queue.submit(sql, params)
+        else:
+            with shards.manager(chat_id).writer() as conn:
+                row_id = conn.execute(sql, params).lastrowid
+        
+        if history_cache:
+            # Same shape get_recent_messages returns (timestamps as SQLite stores them)
+            history_cache.append(chat_id, {
+                'sender': sender, 'content': content, 'timestamp': timestamp.isoformat(' '), 'id': row_id,
+                'timestamp_ms': timestamp_ms
+            })
+
+def get_recent_messages(chat_id, limit=50, before=None):
+    """
+    Retrieve recent messages for a chat, oldest first.
     
-    cursor.execute('''
-        INSERT INTO messages (chat_id, sender, timestamp, content, message_type)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (chat_id, sender, datetime.now(), content, message_type))
+    `before` is an optional (timestamp_ms, id) keyset cursor: only messages
+    strictly older than it are returned, so paging back through history
+    seeks straight to the page in the (chat_id, timestamp_ms) index instead
+    of skipping over an offset.
     
-    conn.commit()
-    conn.close()
+    Reads of the newest messages are served from history_cache when possible.
+    """
+    if before is None and history_cache:
+        messages = history_cache.get(chat_id, limit)
+        if messages is not None:
+            return messages
+        
+        # Warm the chat's ring buffer; queued writes must be visible first
+        write_queue = write_queue_for(chat_id)
+        if write_queue:
+            write_queue.flush()
+        history_cache.begin_warm(chat_id)
+        fetch = max(limit, HISTORY_CACHE_PER_CHAT)
+        messages = _select_messages(chat_id, fetch)
+        history_cache.finish_warm(chat_id, messages, complete=len(messages) < fetch and not archivers)
+        return messages[-limit:] if limit > 0 else []
+    
+    return _select_messages(chat_id, limit, before)
+
+def _select_messages(chat_id, limit, before=None):
+    """Read a chat's newest messages (older than `before`, if given) from SQLite"""
+    with shards.manager(chat_id).reader() as conn:
+        # Ordered by instant: the text timestamps of the project's writers differ in format
+        if before is None:
+            messages = conn.execute(f'''
+                SELECT sender, {content_sql()}, timestamp, id, timestamp_ms FROM messages
+                WHERE chat_id = ?
+                ORDER BY timestamp_ms DESC, id DESC
+                LIMIT ?
+            ''', (chat_id, limit)).fetchall()
+        else:
+            messages = conn.execute(f'''
+                SELECT sender, {content_sql()}, timestamp, id, timestamp_ms FROM messages
+                WHERE chat_id = ? AND (timestamp_ms, id) < (?, ?)
+                ORDER BY timestamp_ms DESC, id DESC
+                LIMIT ?
+            ''', (chat_id, before[0], before[1], limit)).fetchall()
+    
+    archiver = archiver_for(chat_id)
+    if archiver and len(messages) < limit:
+        # History continues in the monthly archive files
+        older = (messages[-1][4], messages[-1][3]) if messages else before
+        messages += archiver.query_history(chat_id, limit - len(messages), older, columns=ARCHIVE_HISTORY_COLUMNS)
+    
+    return _message_dicts(messages)
+
+def _message_dicts(rows):
+    """Convert newest-first (sender, content, timestamp, id, timestamp_ms) rows to message dicts, oldest first"""
+    return [
+        {'sender': row[0], 'content': row[1], 'timestamp': row[2], 'id': row[3], 'timestamp_ms': row[4]}
+        for row in reversed(rows)
+    ]
 
-def get_recent_messages(chat_id, limit=50):
-    """Retrieve recent messages for a chat"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    cursor = conn.cursor()
+def get_messages_between(chat_id, since, until=None, limit=None):
+    """
+    Retrieve a chat's messages timestamped in [since, until), oldest first.
     
-    cursor.execute('''
-        SELECT sender, content, timestamp FROM messages
-        WHERE chat_id = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    ''', (chat_id, limit))
+    A range scan of the (chat_id, timestamp_ms) index that continues into the
+    archive files the window reaches. With a limit, the newest `limit`
+    messages of the window are returned.
+    """
+    write_queue = write_queue_for(chat_id)
+    if write_queue:
+        write_queue.flush()
+    since_ms = to_epoch_ms(since)
+    until_ms = to_epoch_ms(until or datetime.now())
+    sql = f'''
+        SELECT sender, {content_sql()}, timestamp, id, timestamp_ms FROM messages
+        WHERE chat_id = ? AND timestamp_ms >= ? AND timestamp_ms < ?
+        ORDER BY timestamp_ms DESC, id DESC
+    '''
+    params = (chat_id, since_ms, until_ms)
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params += (limit,)
+    with shards.manager(chat_id).reader() as conn:
+        messages = conn.execute(sql, params).fetchall()
     
-    messages = cursor.fetchall()
-    conn.close()
+    archiver = archiver_for(chat_id)
+    if archiver and (limit is None or len(messages) < limit):
+        for row in archiver.iter_range(chat_id, since_ms, until_ms, columns=ARCHIVE_HISTORY_COLUMNS):
+            if limit is not None and len(messages) >= limit:
+                break
+            messages.append(row)
     
-    return [{'sender': msg[0], 'content': msg[1], 'timestamp': msg[2]} for msg in reversed(messages)]
+    return _message_dicts(messages)
+
+def list_chats(active_since=None, limit=100):
+    """List chats most recently active first (every shard), from the trigger-maintained chats view"""
+    since_ms = to_epoch_ms(active_since) if active_since else None
+    chats = []
+    for manager in shards.managers:
+        with manager.reader() as conn:
+            chats += chat_stats.list_active_chats(conn, since_ms, limit)
+    if len(shards) > 1:
+        chats.sort(key=lambda chat: chat['last_message_ms'] or 0, reverse=True)
+        chats = chats[:limit]
+    return chats
+
+def parse_before_cursor(value):
+    """Parse a `<timestamp_ms>,<id>` cursor; raises ValueError if malformed"""
+    timestamp_ms, message_id = value.split(',')
+    return int(timestamp_ms), int(message_id)
 
 def send_message_via_mcp(chat_id, message):
     """Send message via MCP REST API"""
@@ -100,41 +332,102 @@ def send_message_via_mcp(chat_id, message):
         logger.error(f"Failed to send message via MCP: {e}")
         return False
 
-def generate_ai_response(message_history, current_message):
-    """Generate AI response using OpenAI"""
+def generate_ai_response(message_history, current_message, route='chat'):
+    """
+    Generate AI response using OpenAI
+    
+    `route` names the caller (chat, summary, urgent); responses are cached
+    only for routes listed in LLM_CACHE_ROUTES.
+    """
     if not OPENAI_API_KEY:
         return "AI service not configured. Please set OPENAI_API_KEY environment variable."
     
     try:
-        # Initialize OpenAI client
-        client = openai.OpenAI(api_key=OPENAI_API_KEY)
-        
-        # Prepare conversation context
-        messages = [
-            {"role": "system", "content": "You are a helpful WhatsApp AI assistant. Keep responses concise and helpful."}
-        ]
-        
-        # Add recent message history for context
-        for msg in message_history[-10:]:  # Last 10 messages for context
-            role = "assistant" if msg['sender'] == "bot" else "user"
-            messages.append({"role": role, "content": msg['content']})
-        
-        # Add current message
-        messages.append({"role": "user", "content": current_message})
-        
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=messages,
-            max_tokens=150,
-            temperature=0.7
+        # Prepare conversation context: newest history first, as much as fits the token budget
+        messages = context_builder.build(
+            [("assistant" if msg['sender'] == "bot" else "user", msg['content']) for msg in message_history],
+            current_message
         )
         
-        return response.choices[0].message.content.strip()
+        return complete_chat(messages, route)
         
     except Exception as e:
         logger.error(f"Failed to generate AI response: {e}")
         return "Sorry, I'm having trouble processing your request right now."
 
+def complete_chat(messages, route='chat'):
+    """
+    Send prompt messages to the model, through the response cache; raises on failure
+    
+    Concurrent calls with the same request fingerprint wait for one API call and share its reply.
+    """
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY is not set")
+    params = {"model": "gpt-3.5-turbo", "max_tokens": LLM_MAX_TOKENS, "temperature": 0.7}
+    key = cache_key(messages=messages, **params)
+    cached_route = response_cache is not None and response_cache.enabled_for(route)
+    if cached_route:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+    
+    def request():
+        response = llm.create_chat_completion(messages=messages, **params)
+        content = response.choices[0].message.content.strip()
+        if cached_route:
+            response_cache.put(key, content)
+        return content
+    
+    return llm_flights.do(key, request)
+
+def is_summary_command(text):
+    """Return whether a message is a /summary command (with or without a time range)"""
+    return text.lower().strip().split(' ', 1)[0] in ['summary', '/summary']
+
+# Plain /summary folds the messages since the last summary into a stored per-chat summary
+summarizer = RollingSummarizer(
+    lambda prompt: complete_chat([
+        {"role": "system", "content": context_builder.system_prompt},
+        {"role": "user", "content": prompt}
+    ], route='summary'),
+    max_new_messages=MAX_SUMMARY_MESSAGES,
+    is_command=is_summary_command
+)
+
+def summarize_chat(chat_id):
+    """Bring a chat's rolling summary up to date and return it, or None if there is nothing to summarize"""
+    write_queue = write_queue_for(chat_id)
+    if write_queue:
+        write_queue.flush()
+    manager = shards.manager(chat_id)
+    return summarizer.summarize(chat_id, manager.reader, manager.writer)
+
+# Static replies for testing
+STATIC_REPLIES = {
+    'help': 'Hello! I am your WhatsApp AI Assistant. You can ask me anything!',
+    'hello': 'Hi there! How can I help you today?',
+    'hi': 'Hello! Nice to meet you!',
+    'default': 'Thanks for your message! This is an automated reply from your AI Assistant.'
+}
+
+def generate_reply(message_text: str) -> str:
+    """
+    Generate a static reply based on the incoming message.
+    
+    Args:
+        message_text: The incoming message text (lowercase)
+        
+    Returns:
+        str: The reply text to send
+    """
+    # Check for specific keywords
+    for keyword, reply in STATIC_REPLIES.items():
+        if keyword != 'default' and keyword in message_text:
+            return reply
+    
+    # Default reply
+    return STATIC_REPLIES['default']
+
 def process_message(chat_id, sender, message_content):
     """Process incoming message and generate appropriate response"""
     # Store the incoming message
@@ -144,22 +437,37 @@ def process_message(chat_id, sender, message_content):
     
     # Handle specific commands
     if message_lower in ['help', '/help']:
-        response = "I'm your AI assistant! I can help with questions, provide summaries, and chat. Try '/summary' to get a chat summary."
-        
-    elif message_lower in ['summary', '/summary']:
-        recent_messages = get_recent_messages(chat_id, 20)
+        response = "I'm your AI assistant! I can help with questions, provide summaries, and chat. Try '/summary' to get a chat summary, or '/summary 24h' and '/summary since 9am' for a time range."
+        
+    elif is_summary_command(message_lower):
+        # "/summary" updates the chat's rolling summary; "/summary 24h" or "/summary since 9am" a time window
+        recent_messages = None
+        try:
+            window = parse_summary_window(message_lower.split(' ', 1)[1] if ' ' in message_lower else '')
+        except ValueError:
+            response = "I didn't understand that time range. Try '/summary 24h' or '/summary since 9am'."
+        else:
+            if window:
+                recent_messages = get_messages_between(chat_id, window[0], window[1], MAX_SUMMARY_WINDOW_MESSAGES)
+                response = "No recent messages to summarize."
+            elif not OPENAI_API_KEY:
+                response = "AI service not configured. Please set OPENAI_API_KEY environment variable."
+            else:
+                try:
+                    response = summarize_chat(chat_id) or "No recent messages to summarize."
+                except Exception as e:
+                    logger.error(f"Failed to summarize chat {chat_id}: {e}")
+                    response = "Sorry, I'm having trouble processing your request right now."
         if recent_messages:
             # Create a summary of recent messages
             conversation = "\n".join([f"{msg['sender']}: {msg['content']}" for msg in recent_messages])
             summary_prompt = f"Summarize this conversation in 2-3 sentences:\n{conversation}"
-            response = generate_ai_response([], summary_prompt)
-        else:
-            response = "No recent messages to summarize."
+            response = generate_ai_response([], summary_prompt, route='summary')
             
     elif any(urgent_word in message_lower for urgent_word in ['urgent', 'asap', 'emergency', 'help!']):
         # Handle urgent messages
         recent_messages = get_recent_messages(chat_id)
-        response = generate_ai_response(recent_messages, message_content)
+        response = generate_ai_response(recent_messages, message_content, route='urgent')
         response += "\n\n⚠️ This message has been flagged as urgent."
         
     else:
@@ -173,14 +481,6 @@ def process_message(chat_id, sender, message_content):
     return response
 
 @app.route('/health', methods=['GET'])
-def health_check():
-    """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
-
-@app.route('/webhook', methods=['POST'])
-def webhook():
-    """Webhook endpoint to receive messages from MCP"""
-@app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({
@@ -188,94 +488,10 @@ def health_check():
         'timestamp': datetime.utcnow().isoformat(),
         'service': 'whatsapp-ai-assistant'
     })
-"""
-WhatsApp AI Assistant - Main application with webhook listener and auto-reply.
-"""
-import os
-from flask import Flask, request, jsonify
-from mcp_client import MCPClient
-from dotenv import load_dotenv
-
-load_dotenv()
-
-app = Flask(__name__)
-mcp_client = MCPClient()
-
-# Static replies for testing
-STATIC_REPLIES = {
-    'help': 'Hello! I am your WhatsApp AI Assistant. You can ask me anything!',
-    'hello': 'Hi there! How can I help you today?',
-    'hi': 'Hello! Nice to meet you!',
-    'default': 'Thanks for your message! This is an automated reply from your AI Assistant.'
-}
-
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """
-    Webhook endpoint to receive messages from whatsapp-mcp
-    Expected payload format:
-    {
-        "chatId": "string",
-        "senderId": "string", 
-        "message": "string",
-        "timestamp": "ISO8601"
-    }
-    """
-    try:
-        # Parse the incoming webhook data
-        data = request.get_json()
-        
-        if not data:
-            logger.warning("Received empty webhook payload")
-            return jsonify({'error': 'Empty payload'}), 400
-        
-        # Extract message details
-        chat_id = data.get('chatId')
-        sender_id = data.get('senderId')
-        message = data.get('message')
-        timestamp = data.get('timestamp', datetime.utcnow().isoformat())
-        
-        # Log the received message
-        logger.info(f"Received message from {sender_id} in chat {chat_id}: {message}")
-        
-        # TODO: Process the message (store to database, generate AI response, etc.)
-        # For now, just acknowledge receipt
-        
-        response = {
-            'status': 'received',
-            'chatId': chat_id,
-            'senderId': sender_id,
-            'processedAt': datetime.utcnow().isoformat()
-        }
-        
-        return jsonify(response), 200
-        
-    except Exception as e:
-        logger.error(f"Error processing webhook: {str(e)}")
-        return jsonify({'error': 'Internal server error'}), 500
-
-@app.route('/webhook', methods=['GET'])
-def webhook_verify():
-    """
-    Webhook verification endpoint for MCP setup
-    Some webhook systems require GET verification
-    """
-    verify_token = request.args.get('verify_token')
-    challenge = request.args.get('challenge')
-    
-    # For basic verification, return the challenge
-    if challenge:
-        logger.info(f"Webhook verification requested with challenge: {challenge}")
-        return challenge
-    
-    return jsonify({'status': 'webhook_endpoint_active'}), 200
-
-if __name__ == '__main__':
-    port = int(os.getenv('WEBHOOK_PORT', 5000))
-    debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
-    
-    logger.info(f"Starting webhook server on port {port}")
     Webhook endpoint to receive incoming WhatsApp messages from MCP.
     Processes the message and sends an automatic reply.
     """
@@ -308,6 +524,22 @@ if __name__ == '__main__':
         logger.error(f"Error processing webhook: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
+@app.route('/webhook', methods=['GET'])
+def webhook_verify():
+    """
+    Webhook verification endpoint for MCP setup
+    Some webhook systems require GET verification
+    """
+    verify_token = request.args.get('verify_token')
+    challenge = request.args.get('challenge')
+    
+    # For basic verification, return the challenge
+    if challenge:
+        logger.info(f"Webhook verification requested with challenge: {challenge}")
+        return challenge
+    
+    return jsonify({'status': 'webhook_endpoint_active'}), 200
+
 @app.route('/send', methods=['POST'])
 def send_message():
     """Manual endpoint to send messages"""
@@ -331,85 +563,94 @@ def send_message():
 
 @app.route('/messages/<chat_id>', methods=['GET'])
 def get_messages(chat_id):
-    """Get recent messages for a chat"""
+    """Get recent messages for a chat, paging back with ?before=<timestamp_ms>,<id>"""
     try:
         limit = request.args.get('limit', 50, type=int)
-        messages = get_recent_messages(chat_id, limit)
-        return jsonify({'messages': messages})
+        before = request.args.get('before')
+        if before:
+            try:
+                before = parse_before_cursor(before)
+            except ValueError:
+                return jsonify({'error': 'Invalid before cursor, expected <timestamp_ms>,<id>'}), 400
+        
+        messages = get_recent_messages(chat_id, limit, before)
+        write_queue = write_queue_for(chat_id)
+        if messages and messages[0]['id'] is None and write_queue:
+            # Served from cache before its batch was flushed; read the ids back
+            write_queue.flush()
+            messages = _select_messages(chat_id, limit, before)
+        
+        # Cursor for the next (older) page; None once history is exhausted
+        next_before = None
+        if len(messages) == limit:
+            next_before = f"{messages[0]['timestamp_ms']},{messages[0]['id']}"
+        
+        return jsonify({'messages': messages, 'next_before': next_before})
         
     except Exception as e:
         logger.error(f"Error retrieving messages: {e}")
         return jsonify({'error': 'Internal server error'}), 500
 
-if __name__ == '__main__':
-    # Initialize database
-    init_database()
-    
-    # Get port from environment variable or default to 5000
-    port = int(os.getenv('PORT', 5000))
-    
-    # Run the app
-    app.run(host='0.0.0.0', port=port, debug=os.getenv('DEBUG', 'False').lower() == 'true')
-            return jsonify({'error': 'No data received'}), 400
-        
-        # Extract message details
-        sender_id = data.get('sender')
-        chat_id = data.get('chat_id', sender_id)  # Use sender as fallback
-        message_text = data.get('text', '').lower().strip()
-        timestamp = data.get('timestamp')
-        
-        if not sender_id or not message_text:
-            return jsonify({'error': 'Missing required fields: sender or text'}), 400
-        
-        print(f"Received message from {sender_id}: {message_text}")
-        
-        # Generate reply based on message content
-        reply_text = generate_reply(message_text)
-        
-        # Send reply using MCP client
-        success = mcp_client.send_reply(chat_id, reply_text)
+@app.route('/chats', methods=['GET'])
+def get_chats():
+    """List recently active chats with unread counts, e.g. ?active_since=2024-01-01T09:00:00&limit=20"""
+    try:
+        limit = request.args.get('limit', 100, type=int)
+        if limit < 1 or limit > 1000:
+            return jsonify({'error': 'Limit must be between 1 and 1000'}), 400
+        active_since = request.args.get('active_since')
+        if active_since:
+            try:
+                active_since = datetime.fromisoformat(active_since.replace('Z', '+00:00'))
+            except ValueError:
+                return jsonify({'error': 'Invalid active_since, expected an ISO 8601 timestamp'}), 400
+        
+        chats = list_chats(active_since, limit)
+        return jsonify({'chats': chats, 'count': len(chats)})
         
-        if success:
-            return jsonify({
-                'status': 'success',
-                'message': 'Reply sent successfully',
-                'reply': reply_text
-            })
-        else:
-            return jsonify({
-                'status': 'error',
-                'message': 'Failed to send reply'
-            }), 500
-            
     except Exception as e:
-        print(f"Error processing webhook: {e}")
-        return jsonify({'error': str(e)}), 500
-
-
-def generate_reply(message_text: str) -> str:
-    """
-    Generate a static reply based on the incoming message.
-    
-    Args:
-        message_text: The incoming message text (lowercase)
-        
-    Returns:
-        str: The reply text to send
-    """
-    # Check for specific keywords
-    for keyword, reply in STATIC_REPLIES.items():
-        if keyword != 'default' and keyword in message_text:
-            return reply
-    
-    # Default reply
-    return STATIC_REPLIES['default']
-
+        logger.error(f"Error listing chats: {e}")
+        return jsonify({'error': 'Internal server error'}), 500
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check endpoint."""
-    return jsonify({'status': 'healthy', 'service': 'whatsapp-ai-assistant'})
+def admin_error():
+    """Return an error response unless the request carries the ADMIN_TOKEN, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({'error': 'Admin endpoints are disabled; set ADMIN_TOKEN'}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({'error': 'Invalid admin token'}), 401
+    return None
+
+@app.route('/admin/backup', methods=['POST'])
+def start_backup():
+    """Start an online backup of every shard; poll GET /admin/backup for the result"""
+    error = admin_error()
+    if error:
+        return error
+    if not backup_managers:
+        return jsonify({'error': 'Backups are not enabled; set BACKUP_DIR'}), 409
+    for manager in backup_managers:
+        manager.trigger()
+    return jsonify({'status': 'started'}), 202
+
+@app.route('/admin/cache', methods=['GET'])
+def get_cache_stats():
+    """Hit/miss counters of the LLM response cache and the chat history cache, and coalesced LLM requests"""
+    error = admin_error()
+    if error:
+        return error
+    return jsonify({
+        'llm_responses': response_cache.stats() if response_cache else None,
+        'llm_requests': llm_flights.stats(),
+        'history': history_cache.stats() if history_cache else None
+    })
 
+@app.route('/admin/backup', methods=['GET'])
+def get_backup_status():
+    """Describe the last backup and the snapshots kept of each shard"""
+    error = admin_error()
+    if error:
+        return error
+    return jsonify({'databases': [manager.status() for manager in backup_managers or []]})
 
 @app.route('/send-message', methods=['POST'])
 def send_message_endpoint():
@@ -447,12 +688,19 @@ def send_message_endpoint():
         print(f"Error sending message: {e}")
         return jsonify({'error': str(e)}), 500
 
-
 if __name__ == '__main__':
-    port = int(os.getenv('PORT', 5000))
-    debug = os.getenv('DEBUG', 'False').lower() == 'true'
+    # Initialize database
+    init_database()
+    
+    for archiver in archivers or []:
+        archiver.start(ARCHIVE_INTERVAL_HOURS * 3600)
+    for retention in retention_managers or []:
+        retention.start(RETENTION_INTERVAL_HOURS * 3600)
+    for manager in backup_managers or []:
+        manager.start(BACKUP_INTERVAL_HOURS * 3600)
     
-    print(f"Starting WhatsApp AI Assistant on port {port}")
-    print(f"MCP Base URL: {mcp_client.base_url}")
+    # Get port from environment variable or default to 5000
+    port = int(os.getenv('PORT', 5000))
     
-    app.run(host='0.0.0.0', port=port, debug=debug)
+    # Run the app
+    app.run(host='0.0.0.0', port=port, debug=os.getenv('DEBUG', 'False').lower() == 'true')
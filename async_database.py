@@ -0,0 +1,213 @@
+"""
+Awaitable facade over database.py for async request handlers.
+
+Every database.py call blocks on SQLite. Called from an async def handler
+it stalls the event loop, and with it every other in-flight request. This
+module runs those calls on dedicated, bounded executors instead:
+
+- one writer thread, so writes are serialised onto one connection and
+  never contend with each other for the database lock
+- a small pool of reader threads, so reads run in parallel (WAL mode lets
+  them proceed while a write is in progress)
+
+The functions mirror database.py one for one and take the same arguments.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import database
+from database import MessageRecord
+from models import MessagePayload, StoredMessage
+from message_archive import MessageArchiver
+from retention import RetentionManager, RetentionPolicy
+from backup import BackupManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_READ_WORKERS = 4
+STREAM_CHUNK_ROWS = 200
+
+_write_executor: Optional[ThreadPoolExecutor] = None
+_read_executor: Optional[ThreadPoolExecutor] = None
+
+
+def start(read_workers: int = DEFAULT_READ_WORKERS) -> None:
+    """Create the DB executors; called on application startup"""
+    global _write_executor, _read_executor
+    if _write_executor is None:
+        _write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+    if _read_executor is None:
+        _read_executor = ThreadPoolExecutor(max_workers=read_workers, thread_name_prefix="db-reader")
+        logger.info(f"DB executors started (1 writer, {read_workers} readers)")
+
+
+def shutdown() -> None:
+    """Wait for queued DB calls to finish and stop the executors"""
+    global _write_executor, _read_executor
+    if _write_executor is not None:
+        _write_executor.shutdown(wait=True)
+        _write_executor = None
+    if _read_executor is not None:
+        _read_executor.shutdown(wait=True)
+        _read_executor = None
+
+
+async def _run_write(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking call on the writer thread"""
+    if _write_executor is None:
+        start()
+    return await asyncio.get_running_loop().run_in_executor(_write_executor, partial(func, *args, **kwargs))
+
+
+async def _run_read(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking call on the reader pool"""
+    if _read_executor is None:
+        start()
+    return await asyncio.get_running_loop().run_in_executor(_read_executor, partial(func, *args, **kwargs))
+
+
+async def enable_sharding(num_shards: int) -> None:
+    """Spread chats over num_shards database files, each with its own writer"""
+    await _run_write(database.enable_sharding, num_shards)
+
+
+async def init_database() -> None:
+    """Initialize the SQLite database and create tables"""
+    await _run_write(database.init_database)
+
+
+async def enable_write_behind(max_batch: int = 500, flush_interval_ms: int = 50) -> None:
+    """Batch message inserts into group commits instead of one commit per row"""
+    await _run_write(database.enable_write_behind, max_batch, flush_interval_ms)
+
+
+async def disable_write_behind() -> None:
+    """Flush queued inserts and return to one commit per row"""
+    await _run_write(database.disable_write_behind)
+
+
+async def enable_archiving(archive_dir: str, max_age_days: int = 90,
+                           interval_seconds: float = 86400) -> List[MessageArchiver]:
+    """Periodically move old messages into per-month archive files (one directory per shard)"""
+    return await _run_write(database.enable_archiving, archive_dir, max_age_days, interval_seconds)
+
+
+async def disable_archiving() -> None:
+    """Stop the background archiver"""
+    await _run_write(database.disable_archiving)
+
+
+async def enable_retention(max_age_days: Optional[float] = None, max_rows_per_chat: Optional[int] = None,
+                           chat_policies: Optional[Dict[str, RetentionPolicy]] = None,
+                           interval_seconds: float = 3600) -> List[RetentionManager]:
+    """Periodically delete messages beyond a maximum age and/or count per chat, in small batches"""
+    return await _run_write(database.enable_retention, max_age_days, max_rows_per_chat,
+                            chat_policies, interval_seconds)
+
+
+async def disable_retention() -> None:
+    """Stop the background retention jobs"""
+    await _run_write(database.disable_retention)
+
+
+async def enable_backups(backup_dir: str, interval_seconds: float = 86400, keep: int = 7,
+                         pages_per_step: int = 256) -> List[BackupManager]:
+    """Periodically take compressed online snapshots of every shard (interval 0: only on trigger_backup())"""
+    return await _run_write(database.enable_backups, backup_dir, interval_seconds, keep, pages_per_step)
+
+
+async def disable_backups() -> None:
+    """Stop the background backup jobs"""
+    await _run_write(database.disable_backups)
+
+
+def trigger_backup() -> bool:
+    """Start a backup of every shard in the background; False if backups are not enabled"""
+    # Only signals the backup threads, so it runs inline without waiting on an executor
+    return database.trigger_backup()
+
+
+def backup_status() -> List[Dict[str, Any]]:
+    """Describe the last backup and the snapshots on disk of every shard"""
+    return database.backup_status()
+
+
+async def is_duplicate(message: MessagePayload) -> bool:
+    """Check whether a message with the same chat_id and message_id is already stored"""
+    return await _run_read(database.is_duplicate, message)
+
+
+async def store_message(message: MessagePayload) -> Optional[int]:
+    """
+    Store a message and return its row ID, or None if it is a duplicate.
+
+    With write-behind enabled the writer thread only enqueues the row, and
+    the group commit is awaited here rather than on the writer thread.
+    """
+    future = await _run_write(database.submit_message, message)
+    return await asyncio.wrap_future(future)
+
+
+async def get_messages_by_chat(chat_id: str, limit: int = 50) -> List[StoredMessage]:
+    """Retrieve messages for a specific chat ID"""
+    return await _run_read(database.get_messages_by_chat, chat_id, limit)
+
+
+async def get_messages_page(chat_id: str, limit: int = 50,
+                            cursor: Optional[str] = None) -> Tuple[List[StoredMessage], Optional[str]]:
+    """Retrieve one page of messages for a chat, newest first, with the next cursor"""
+    return await _run_read(database.get_messages_page, chat_id, limit, cursor)
+
+
+async def get_message_records(chat_id: str, limit: int = 50,
+                              cursor: Optional[str] = None) -> Tuple[List[MessageRecord], Optional[str]]:
+    """Retrieve one page of messages as lightweight MessageRecords, with the next cursor"""
+    return await _run_read(database.get_message_records, chat_id, limit, cursor)
+
+
+async def get_messages_between(chat_id: str, since: datetime, until: Optional[datetime] = None,
+                               limit: Optional[int] = None) -> List[StoredMessage]:
+    """Retrieve a chat's messages timestamped in [since, until), oldest first"""
+    return await _run_read(database.get_messages_between, chat_id, since, until, limit)
+
+
+async def iter_messages_by_chat(chat_id: str, cursor: Optional[str] = None,
+                                limit: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+    """Stream messages for a chat newest-first, reading chunks of rows on the reader pool"""
+    rows = database.iter_messages_by_chat(chat_id, cursor, limit)
+    try:
+        while True:
+            chunk = await _run_read(lambda: list(islice(rows, STREAM_CHUNK_ROWS)))
+            for row in chunk:
+                yield row
+            if len(chunk) < STREAM_CHUNK_ROWS:
+                break
+    finally:
+        # Closes the generator's connection on the reader pool, not the event loop
+        await _run_read(rows.close)
+
+
+async def get_message_count() -> int:
+    """Get total count of messages in database"""
+    return await _run_read(database.get_message_count)
+
+
+async def get_chat_stats(limit: Optional[int] = 100) -> Dict[str, Any]:
+    """Get message totals plus per-chat breakdowns, most recently active first"""
+    return await _run_read(database.get_chat_stats, limit)
+
+
+async def list_chats(active_since: Optional[datetime] = None, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+    """List chats most recently active first, with message and unread counts"""
+    return await _run_read(database.list_chats, active_since, limit)
+
+
+async def search_messages(query: str, chat_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """Full-text search over message text, BM25-ranked with highlighted snippets"""
+    return await _run_read(database.search_messages, query, chat_id, limit)
@@ -0,0 +1,262 @@
+"""
+Online backups of the message database.
+
+BackupManager snapshots a live database with SQLite's online backup API
+(sqlite3.Connection.backup). Each snapshot is gzip-compressed into
+backup_dir as <db name>-<UTC time>.db.gz, written under a temporary name
+and renamed into place when complete, and only the newest `keep` snapshots
+of the database are kept.
+
+How the copy is made depends on the journal mode:
+
+- WAL (the app's databases): in one step. The copy reads a snapshot of the
+  database, which does not block writers, and writes made meanwhile are
+  simply not part of it.
+- Other modes: pages_per_step pages at a time with a short pause between
+  steps, so writers never wait long for the read lock. A write from another
+  connection restarts such a copy from the beginning, so after max_restarts
+  restarts it is finished in one step instead, holding the read lock until
+  done, rather than being overtaken by writes forever.
+
+To restore, stop the application and decompress a snapshot over the
+database file (gunzip -c messages-20240101T000000Z.db.gz > messages.db),
+removing any -wal and -shm files next to it.
+"""
+
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGES_PER_STEP = 256
+DEFAULT_STEP_PAUSE = 0.005
+DEFAULT_KEEP = 7
+DEFAULT_MAX_RESTARTS = 3
+
+_STAMP_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+class BackupCancelled(Exception):
+    """Raised inside a backup when stop() is called."""
+
+
+class _BackupRestarted(Exception):
+    """Raised inside a stepped backup that writes restarted too often."""
+
+
+class BackupManager:
+    """Takes rotated, compressed online snapshots of one database file."""
+
+    def __init__(
+        self,
+        db_path: str,
+        backup_dir: str,
+        keep: int = DEFAULT_KEEP,
+        pages_per_step: int = DEFAULT_PAGES_PER_STEP,
+        step_pause: float = DEFAULT_STEP_PAUSE,
+        max_restarts: int = DEFAULT_MAX_RESTARTS,
+    ):
+        """
+        Initialize the backup manager.
+
+        Args:
+            db_path: Path to the database to back up
+            backup_dir: Directory for the compressed snapshots
+            keep: Number of snapshots of this database to keep
+            pages_per_step: Database pages copied per backup step
+            step_pause: Seconds to pause between steps, leaving the database
+                (and the GIL) to request handlers
+            max_restarts: Restarts of a stepped copy caused by writes before
+                it is finished in one step
+        """
+        self.db_path = db_path
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_pause = step_pause
+        self.max_restarts = max_restarts
+        self.prefix = os.path.splitext(os.path.basename(db_path))[0] + "-"
+        self.last_backup: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[str] = None
+        self._last_attempt: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def list_backups(self) -> List[str]:
+        """Return this database's snapshot files, newest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = [
+            name for name in os.listdir(self.backup_dir)
+            if name.startswith(self.prefix) and name.endswith(".db.gz")
+        ]
+        # The UTC stamp in the name sorts chronologically
+        return [os.path.join(self.backup_dir, name) for name in sorted(names, reverse=True)]
+
+    def backup(self, now: Optional[datetime] = None) -> str:
+        """
+        Take a snapshot now and rotate old ones.
+
+        Only one backup of a database runs at a time; a concurrent call
+        waits for the running one and then takes its own.
+
+        Returns:
+            Path of the new snapshot
+        """
+        with self._lock:
+            now = now or datetime.now(timezone.utc)
+            os.makedirs(self.backup_dir, exist_ok=True)
+            path = os.path.join(self.backup_dir, f"{self.prefix}{now.strftime(_STAMP_FORMAT)}.db.gz")
+            copy_path = path[:-len(".gz")] + ".tmp"
+            gzip_path = path + ".tmp"
+            started = time.monotonic()
+            try:
+                pages, restarts = self._copy(copy_path)
+                with open(copy_path, "rb") as source, gzip.open(gzip_path, "wb", compresslevel=6) as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                os.replace(gzip_path, path)
+            except Exception as e:
+                self.last_error = str(e)
+                raise
+            finally:
+                for leftover in (copy_path, gzip_path):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+
+            self.last_backup = {
+                "path": path,
+                "pages": pages,
+                "restarts": restarts,
+                "bytes": os.path.getsize(path),
+                "seconds": round(time.monotonic() - started, 3),
+                "finished_at": datetime.now(timezone.utc).isoformat(),
+            }
+            self.last_error = None
+            self._rotate()
+            logger.info(f"Backed up {self.db_path} to {path} ({pages} pages in {self.last_backup['seconds']}s)")
+            return path
+
+    def _copy(self, copy_path: str) -> Tuple[int, int]:
+        """
+        Copy the database with the online backup API.
+
+        Returns:
+            (page count, restarts of a stepped copy caused by writes)
+        """
+        total_pages = 0
+        restarts = 0
+        last_remaining: Optional[int] = None
+
+        def progress(status: int, remaining: int, total: int) -> None:
+            nonlocal total_pages, restarts, last_remaining
+            total_pages = total
+            if self._stop.is_set():
+                raise BackupCancelled(f"Backup of {self.db_path} cancelled")
+            if last_remaining is not None and remaining > last_remaining:
+                # A write from another connection sent the copy back to page 1
+                restarts += 1
+                if restarts > self.max_restarts:
+                    raise _BackupRestarted()
+            last_remaining = remaining
+            if remaining and self.step_pause:
+                # sqlite3 only sleeps between steps when the source is busy
+                time.sleep(self.step_pause)
+
+        source = sqlite3.connect(self.db_path, timeout=30)
+        target = sqlite3.connect(copy_path)
+        try:
+            wal = source.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal"
+            if wal:
+                source.backup(target, pages=-1, progress=progress)
+            else:
+                try:
+                    source.backup(target, pages=self.pages_per_step, progress=progress)
+                except _BackupRestarted:
+                    logger.warning(
+                        f"Backup of {self.db_path} restarted by writes {restarts} times; "
+                        "finishing it in one step"
+                    )
+                    source.backup(target, pages=-1, progress=progress)
+        finally:
+            target.close()
+            source.close()
+        return total_pages, restarts
+
+    def _rotate(self) -> None:
+        """Delete all but the newest `keep` snapshots."""
+        for path in self.list_backups()[max(self.keep, 1):]:
+            os.remove(path)
+            logger.info(f"Removed old backup {path}")
+
+    def trigger(self) -> None:
+        """Ask the background thread to take a backup now, without waiting for it."""
+        if self._thread is None:
+            threading.Thread(target=self._run_once, name="database-backup", daemon=True).start()
+        else:
+            self._wake.set()
+
+    def _run_once(self) -> None:
+        self._last_attempt = time.time()
+        try:
+            self.backup()
+        except BackupCancelled:
+            pass
+        except Exception as e:
+            logger.error(f"Error backing up {self.db_path}: {e}")
+
+    def _next_delay(self, interval_seconds: float) -> Optional[float]:
+        """Seconds until the next scheduled backup, counting from the newest snapshot or attempt."""
+        if interval_seconds <= 0:
+            return None
+        backups = self.list_backups()
+        last = max(os.path.getmtime(backups[0]) if backups else 0, self._last_attempt or 0)
+        return max(0.0, interval_seconds - (time.time() - last))
+
+    def status(self) -> Dict[str, Any]:
+        """Describe the last backup and the snapshots on disk."""
+        return {
+            "db_path": self.db_path,
+            "running": self._lock.locked(),
+            "last_backup": self.last_backup,
+            "last_error": self.last_error,
+            "backups": [os.path.basename(path) for path in self.list_backups()],
+        }
+
+    def start(self, interval_seconds: float = 86400) -> None:
+        """
+        Back up in a background thread every interval_seconds and on trigger().
+
+        The schedule continues from the newest existing snapshot, so restarts
+        do not cause extra backups. An interval of 0 backs up only on trigger().
+        """
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                self._wake.wait(self._next_delay(interval_seconds))
+                self._wake.clear()
+                if self._stop.is_set():
+                    break
+                self._run_once()
+
+        self._thread = threading.Thread(target=run, name="database-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread started by start(), cancelling a running backup."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,54 @@
+"""
+In-memory Bloom filter for cheap "have we seen this key?" checks.
+
+A Bloom filter answers membership queries with no false negatives and a
+tunable false-positive rate, in a fixed amount of memory. Callers use it as
+a prefilter: a miss proves the key is new, so only hits need confirming
+against the authoritative store.
+"""
+
+import math
+import hashlib
+import threading
+from typing import Iterable
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over string keys."""
+
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        """
+        Initialize an empty filter.
+
+        Args:
+            capacity: Number of keys the filter is sized for; adding more
+                keeps working but raises the false-positive rate
+            error_rate: Target false-positive rate at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _positions(self, key: str) -> Iterable[int]:
+        """Derive the bit positions of a key by double hashing one digest."""
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key: str) -> None:
+        """Record a key."""
+        positions = list(self._positions(key))
+        with self._lock:
+            for pos in positions:
+                self._bits[pos >> 3] |= 1 << (pos & 7)
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        """Return False if the key was never added, True if it probably was."""
+        bits = self._bits
+        return all(bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
@@ -2,54 +2,75 @@
 SQLite chat history storage and retrieval module.
 
 This module provides functionality to store and retrieve WhatsApp chat messages
-using SQLite database with the following schema:
+using the shared messages schema (see schema.py), of which it uses:
 - chat_id: Identifier for the chat/conversation
 - sender: Message sender identifier  
 - timestamp: Message timestamp
 - content: Message text content
+- timestamp_ms: The timestamp as epoch milliseconds, used for ordering
 """
 
 import sqlite3
 import os
-from datetime import datetime
-from typing import List, Tuple, Optional
+import json
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Tuple, Optional
+
+import chat_stats
+import epoch_ms
+import message_bodies
+import message_search
+import schema
+from connection_manager import get_connection_manager
+from write_behind import WriteBehindQueue
+from message_archive import MessageArchiver
+from retention import RetentionManager, RetentionPolicy
+from rolling_summary import RollingSummarizer, delete_state
 
 
 class ChatHistoryDB:
     """SQLite database handler for chat message storage and retrieval."""
     
-    def __init__(self, db_path: str = "chat_history.db"):
+    INSERT_MESSAGE_SQL = f"""
+        INSERT INTO messages (chat_id, sender, timestamp, content, timestamp_ms)
+        VALUES (?1, ?2, ?3, ?4, {epoch_ms.epoch_ms_sql('?3')})
+    """
+    
+    IMPORT_MESSAGE_SQL = f"""
+        INSERT INTO messages (chat_id, sender, timestamp, content, created_at, timestamp_ms)
+        VALUES (?1, ?2, ?3, ?4, COALESCE(?5, CURRENT_TIMESTAMP), {epoch_ms.epoch_ms_sql('?3')})
+    """
+    
+    EXPORT_FIELDS = ("chat_id", "sender", "timestamp", "content", "created_at")
+    
+    def __init__(self, db_path: str = "chat_history.db", write_behind: bool = False,
+                 max_batch: int = 500, flush_interval_ms: int = 50):
         """
         Initialize the chat history database.
         
         Args:
             db_path: Path to the SQLite database file
+            write_behind: Buffer inserts and commit them in batches. Stored
+                messages become visible to reads after the next flush.
+            max_batch: Rows per group commit in write-behind mode
+            flush_interval_ms: Maximum delay before queued rows are committed
         """
         self.db_path = db_path
         self.init_database()
+        self.archiver: Optional[MessageArchiver] = None
+        self.retention: Optional[RetentionManager] = None
+        self._write_queue: Optional[WriteBehindQueue] = None
+        if write_behind:
+            self._write_queue = WriteBehindQueue(
+                get_connection_manager(db_path),
+                max_batch=max_batch,
+                flush_interval_ms=flush_interval_ms
+            )
     
     def init_database(self) -> None:
-        """Initialize the database and create the messages table if it doesn't exist."""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    chat_id TEXT NOT NULL,
-                    sender TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            # Create index for faster queries by chat_id
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_chat_id_timestamp 
-                ON messages(chat_id, timestamp DESC)
-            """)
-            
-            conn.commit()
+        """Create the messages table, or migrate an existing one to the shared schema."""
+        schema.initialize(self.db_path)
     
     def store_message(self, chat_id: str, sender: str, timestamp: str, content: str) -> bool:
         """
@@ -62,21 +83,39 @@ class ChatHistoryDB:
             content: Message text content
             
         Returns:
-            bool: True if message was stored successfully, False otherwise
+            bool: True if message was stored (or queued, in write-behind
+            mode) successfully, False otherwise
         """
+        params = (chat_id, sender, timestamp, content)
+        if self._write_queue is not None:
+            self._write_queue.submit(self.INSERT_MESSAGE_SQL, params)
+            return True
+        
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    INSERT INTO messages (chat_id, sender, timestamp, content)
-                    VALUES (?, ?, ?, ?)
-                """, (chat_id, sender, timestamp, content))
+                cursor.execute(self.INSERT_MESSAGE_SQL, params)
                 conn.commit()
                 return True
         except sqlite3.Error as e:
             print(f"Error storing message: {e}")
             return False
     
+    def flush(self) -> None:
+        """Commit any messages queued in write-behind mode."""
+        if self._write_queue is not None:
+            self._write_queue.flush()
+    
+    def close(self) -> None:
+        """Flush queued messages and stop the write-behind writer and background jobs."""
+        if self._write_queue is not None:
+            self._write_queue.close()
+            self._write_queue = None
+        if self.archiver is not None:
+            self.archiver.stop()
+        if self.retention is not None:
+            self.retention.stop()
+    
     def get_recent_messages(self, chat_id: str, limit: int = 50) -> List[Tuple[str, str, str, str]]:
         """
         Retrieve the most recent messages for a given chat_id.
@@ -92,18 +131,150 @@ class ChatHistoryDB:
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT sender, timestamp, content, id
+                cursor.execute(f"""
+                    SELECT sender, timestamp, {message_bodies.content_sql()}, id, timestamp_ms
                     FROM messages 
                     WHERE chat_id = ?
-                    ORDER BY timestamp DESC
+                    ORDER BY timestamp_ms DESC, id DESC
                     LIMIT ?
                 """, (chat_id, limit))
                 
-                return cursor.fetchall()
+                rows = cursor.fetchall()
+            
+            if self.archiver is not None and len(rows) < limit:
+                # History continues in the monthly archive files
+                older = (rows[-1][4], rows[-1][3]) if rows else None
+                rows += self.archiver.query_history(
+                    chat_id, limit - len(rows), older, columns="sender, timestamp, content, id, timestamp_ms"
+                )
+            return [row[:4] for row in rows]
         except sqlite3.Error as e:
             print(f"Error retrieving messages: {e}")
             return []
+
+    def get_messages_between(self, chat_id: str, since: datetime, until: Optional[datetime] = None,
+                             limit: Optional[int] = None) -> List[Tuple[str, str, str, str]]:
+        """
+        Retrieve the messages of a chat timestamped within a time window.
+
+        Args:
+            chat_id: Chat/conversation identifier
+            since: Start of the window (inclusive; naive datetimes are UTC)
+            until: End of the window (exclusive; default: now)
+            limit: Return only the newest `limit` messages of the window
+
+        Returns:
+            List of tuples containing (sender, timestamp, content, message_id)
+            ordered by timestamp (oldest first)
+        """
+        self.flush()
+        since_ms = epoch_ms.to_epoch_ms(since)
+        until_ms = epoch_ms.to_epoch_ms(until or datetime.now(timezone.utc))
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                sql = f"""
+                    SELECT sender, timestamp, {message_bodies.content_sql()}, id
+                    FROM messages
+                    WHERE chat_id = ? AND timestamp_ms >= ? AND timestamp_ms < ?
+                    ORDER BY timestamp_ms DESC, id DESC
+                """
+                params: tuple = (chat_id, since_ms, until_ms)
+                if limit is not None:
+                    sql += " LIMIT ?"
+                    params += (limit,)
+                rows = conn.execute(sql, params).fetchall()
+
+            if self.archiver is not None and (limit is None or len(rows) < limit):
+                # The window reaches back into the monthly archive files
+                for row in self.archiver.iter_range(chat_id, since_ms, until_ms,
+                                                    columns="sender, timestamp, content, id"):
+                    if limit is not None and len(rows) >= limit:
+                        break
+                    rows.append(row)
+            return [tuple(row) for row in reversed(rows)]
+        except sqlite3.Error as e:
+            print(f"Error retrieving messages: {e}")
+            return []
+
+    def enable_archiving(self, archive_dir: str, max_age_days: int = 90,
+                         interval_seconds: Optional[float] = None) -> MessageArchiver:
+        """
+        Tier messages older than max_age_days into per-month archive files.
+        
+        Once enabled, get_recent_messages continues into the archives when
+        the live table runs out of history for a chat.
+        
+        Args:
+            archive_dir: Directory for the messages-YYYY-MM.db archive files
+            max_age_days: Messages from days older than this are archived
+            interval_seconds: Archive in a background thread at this interval;
+                if None, call archive_old_messages() yourself
+            
+        Returns:
+            MessageArchiver: The archiver now attached to this database
+        """
+        if self.archiver is None:
+            self.archiver = MessageArchiver(self.db_path, archive_dir, max_age_days=max_age_days,
+                                            order_column="timestamp_ms")
+            self.archiver.upgrade()
+            if interval_seconds is not None:
+                self.archiver.start(interval_seconds)
+        return self.archiver
+    
+    def archive_old_messages(self) -> Dict[str, int]:
+        """
+        Move messages older than the archiving age into their monthly archive.
+        
+        Returns:
+            Dict mapping 'YYYY-MM' to the number of messages moved
+        """
+        if self.archiver is None:
+            return {}
+        self.flush()
+        return self.archiver.archive()
+    
+    def enable_retention(self, max_age_days: Optional[float] = None,
+                         max_rows_per_chat: Optional[int] = None,
+                         chat_policies: Optional[Dict[str, RetentionPolicy]] = None,
+                         interval_seconds: Optional[float] = None) -> RetentionManager:
+        """
+        Delete messages beyond a maximum age and/or count per chat.
+        
+        Deletes run in small batches and are followed by incremental vacuum
+        steps, so the file stays bounded without long lock pauses.
+        
+        Args:
+            max_age_days: Default maximum message age (None: no limit)
+            max_rows_per_chat: Default number of newest messages kept per chat
+            chat_policies: Per-chat RetentionPolicy overrides of the defaults
+            interval_seconds: Enforce in a background thread at this interval;
+                if None, call apply_retention() yourself
+            
+        Returns:
+            RetentionManager: The manager now attached to this database
+        """
+        if self.retention is None:
+            self.retention = RetentionManager(
+                self.db_path,
+                RetentionPolicy(max_age_days=max_age_days, max_rows=max_rows_per_chat),
+                chat_policies,
+                order_column="timestamp_ms"
+            )
+            if interval_seconds is not None:
+                self.retention.start(interval_seconds)
+        return self.retention
+    
+    def apply_retention(self) -> int:
+        """
+        Delete the messages outside the retention policy now.
+        
+        Returns:
+            int: Number of messages deleted
+        """
+        if self.retention is None:
+            return 0
+        self.flush()
+        return self.retention.enforce()
     
     def get_chat_message_count(self, chat_id: str) -> int:
         """
@@ -117,16 +288,199 @@ class ChatHistoryDB:
         """
         try:
             with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM messages WHERE chat_id = ?
-                """, (chat_id,))
-                
-                result = cursor.fetchone()
-                return result[0] if result else 0
+                return chat_stats.get_chat_count(conn, chat_id)
         except sqlite3.Error as e:
             print(f"Error counting messages: {e}")
             return 0
+
+    def list_chats(self, active_since: Optional[datetime] = None,
+                   limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """
+        List chats, most recently active first.
+
+        Args:
+            active_since: Only chats with a message at or after this time
+                (naive datetimes are taken as UTC)
+            limit: Maximum number of chats (default: 100)
+
+        Returns:
+            List of dicts with chat_id, last_message_at, last_message_ms,
+            last_sender, message_count and unread_count (messages since the
+            last bot reply)
+        """
+        self.flush()
+        since_ms = epoch_ms.to_epoch_ms(active_since) if active_since is not None else None
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                return chat_stats.list_active_chats(conn, since_ms, limit)
+        except sqlite3.Error as e:
+            print(f"Error listing chats: {e}")
+            return []
+
+    def search_messages(self, query: str, chat_id: Optional[str] = None,
+                        limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Full-text search over message content.
+        
+        Args:
+            query: Free-form search text; every word must match
+            chat_id: Restrict results to one chat (default: all chats)
+            limit: Maximum number of results (default: 20)
+            
+        Returns:
+            List of dicts with id, chat_id, sender, timestamp, snippet and
+            score, best matches (lowest BM25 score) first
+        """
+        try:
+            with sqlite3.connect(self.db_path) as conn:
+                return message_search.search(conn, query, chat_id, limit)
+        except sqlite3.Error as e:
+            print(f"Error searching messages: {e}")
+            return []
+    
+    def export_chat(self, chat_id: str) -> Iterator[str]:
+        """
+        Stream one chat's messages as NDJSON, oldest first.
+        
+        Args:
+            chat_id: Chat/conversation identifier
+            
+        Yields:
+            str: One JSON object per message, newline terminated
+        """
+        self.flush()
+        yield from self._export(
+            "WHERE chat_id = ? ORDER BY timestamp_ms, id", (chat_id,)
+        )
+    
+    def export_all(self) -> Iterator[str]:
+        """
+        Stream every stored message as NDJSON, in insertion order.
+        
+        Yields:
+            str: One JSON object per message, newline terminated
+        """
+        self.flush()
+        yield from self._export("ORDER BY id", ())
+    
+    def _export(self, clause: str, params: tuple) -> Iterator[str]:
+        """Yield NDJSON lines for the messages selected by a WHERE/ORDER BY clause."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # Rows are read from the cursor as they are written out, so the
+            # export never holds more than one row in memory
+            fields = [message_bodies.content_sql() if field == "content" else field
+                      for field in self.EXPORT_FIELDS]
+            cursor = conn.execute(f"SELECT {', '.join(fields)} FROM messages {clause}", params)
+            for row in cursor:
+                yield json.dumps(dict(zip(self.EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+        finally:
+            conn.close()
+    
+    def import_ndjson(self, path: str, batch_size: int = 50000) -> int:
+        """
+        Bulk-load messages from an NDJSON file.
+        
+        Each line is an object with chat_id, sender, timestamp and content
+        (created_at is optional), as written by export_chat/export_all.
+        The messages indexes and triggers are dropped for the duration of
+        the load and rebuilt once at the end, together with the chat_stats
+        counters and the full-text index. This is a maintenance operation:
+        run it while nothing else is writing to the database.
+        
+        Args:
+            path: NDJSON file to read
+            batch_size: Messages inserted per transaction
+            
+        Returns:
+            int: Number of messages imported
+            
+        Raises:
+            ValueError: If a line is not a valid message object; batches
+                before the bad line stay committed
+        """
+        self.flush()
+        imported = 0
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            deferred = conn.execute("""
+                SELECT type, name, sql FROM sqlite_master
+                WHERE tbl_name = 'messages' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            """).fetchall()
+            conn.execute("BEGIN IMMEDIATE")
+            for kind, name, _ in deferred:
+                conn.execute(f'DROP {kind.upper()} IF EXISTS "{name}"')
+            conn.execute("COMMIT")
+            
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    batch = []
+                    for line_number, line in enumerate(f, 1):
+                        if not line.strip():
+                            continue
+                        batch.append(self._parse_import_line(line, line_number))
+                        if len(batch) >= batch_size:
+                            imported += self._insert_batch(conn, batch)
+                            batch = []
+                    if batch:
+                        imported += self._insert_batch(conn, batch)
+            finally:
+                conn.execute("BEGIN IMMEDIATE")
+                for _, _, sql in deferred:
+                    conn.execute(sql)
+                chat_stats.rebuild(conn, sender_column="sender")
+                message_search.rebuild(conn)
+                conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return imported
+    
+    def _parse_import_line(self, line: str, line_number: int) -> Tuple[Any, ...]:
+        """Turn one NDJSON line into IMPORT_MESSAGE_SQL parameters."""
+        try:
+            record = json.loads(line)
+            return (record["chat_id"], record["sender"], record["timestamp"],
+                    record["content"], record.get("created_at"))
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid message on line {line_number}: {e}") from e
+    
+    def _insert_batch(self, conn: sqlite3.Connection, batch: List[Tuple[Any, ...]]) -> int:
+        """Insert a batch of parsed messages in one transaction."""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(self.IMPORT_MESSAGE_SQL, batch)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(batch)
+    
+    def summarize_chat(self, chat_id: str, summarizer: RollingSummarizer) -> Optional[str]:
+        """
+        Bring a chat's rolling summary up to date and return it.
+        
+        Only messages stored since the last summary are sent to the model
+        (see rolling_summary.py); with none, the stored summary is returned.
+        
+        Args:
+            chat_id: Chat/conversation identifier
+            summarizer: Generates and folds in the summaries
+            
+        Returns:
+            The summary, or None if the chat has no messages to summarize
+        """
+        self.flush()
+        return summarizer.summarize(chat_id, self._connection, self._connection)
+    
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        """Open a connection whose block commits on success and which is closed afterwards."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
     
     def delete_chat_history(self, chat_id: str) -> bool:
         """
@@ -139,11 +493,13 @@ class ChatHistoryDB:
             bool: True if deletion was successful, False otherwise
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
-                conn.commit()
-                return True
+            # Small batches, so other writers are never blocked for the whole chat
+            self.flush()
+            retention = self.retention or RetentionManager(self.db_path, order_column="timestamp_ms")
+            retention.delete_chat(chat_id)
+            with self._connection() as conn:
+                delete_state(conn, chat_id)
+            return True
         except sqlite3.Error as e:
             print(f"Error deleting chat history: {e}")
             return False
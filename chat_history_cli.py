@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Command-line bulk export and import for the chat history database.
+
+Examples:
+    python chat_history_cli.py export --output history.ndjson
+    python chat_history_cli.py export --chat-id group_123 > group_123.ndjson
+    python chat_history_cli.py import history.ndjson --db /path/to/chat_history.db
+"""
+
+import sys
+import argparse
+
+from chat_history import ChatHistoryDB
+
+
+def main(argv=None) -> int:
+    """Run the export/import command line."""
+    parser = argparse.ArgumentParser(description="Bulk NDJSON export/import for ChatHistoryDB")
+    parser.add_argument("--db", default="chat_history.db", help="Path to the SQLite database file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Write messages as NDJSON")
+    export_parser.add_argument("--chat-id", help="Export only this chat (default: all chats)")
+    export_parser.add_argument("--output", help="Output file (default: stdout)")
+
+    import_parser = commands.add_parser("import", help="Bulk-load messages from an NDJSON file")
+    import_parser.add_argument("path", help="NDJSON file to import")
+    import_parser.add_argument("--batch-size", type=int, default=50000, help="Messages per transaction")
+
+    args = parser.parse_args(argv)
+    db = ChatHistoryDB(args.db)
+
+    if args.command == "export":
+        lines = db.export_chat(args.chat_id) if args.chat_id else db.export_all()
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            count = 0
+            for line in lines:
+                out.write(line)
+                count += 1
+        finally:
+            if args.output:
+                out.close()
+        print(f"Exported {count} messages", file=sys.stderr)
+        return 0
+
+    try:
+        count = db.import_ndjson(args.path, batch_size=args.batch_size)
+    except (OSError, ValueError) as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Imported {count} messages", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""
+Per-chat message counters maintained by SQLite triggers.
+
+COUNT(*) over the messages table is linear in its size. Instead, a chat_stats
+table keeps one row per chat (message count, first/last timestamp and last
+sender) that triggers update inside the same transaction as every insert and
+delete, so counts are always exact and cost a primary-key lookup to read.
+Which message is first or last is decided by its epoch-ms instant
+(first_message_ms, last_message_ms), since the timestamp texts mix ISO-8601
+variants that do not sort chronologically.
+
+The same row tracks activity: the last message and last bot reply as epoch
+milliseconds, and how many messages arrived since that reply (unread_count).
+The chats view presents these for listing recently active chats, which
+list_active_chats() does through an index in O(limit). unread_count assumes
+messages are stored in timestamp order, as they arrive; deleting a chat's
+latest bot reply does not recount the messages before it.
+
+The storage modules used different sender column names, so install() takes
+the column to record as last_sender.
+"""
+
+import sqlite3
+from typing import Any, Dict, List, Optional
+
+from epoch_ms import epoch_ms_sql
+
+CHAT_STATS_COLUMNS = ["chat_id", "message_count", "first_timestamp", "last_timestamp", "last_sender",
+                      "first_message_ms", "last_message_ms", "last_bot_reply_ms", "unread_count"]
+
+CHATS_COLUMNS = ["chat_id", "last_message_at", "last_message_ms", "last_sender",
+                 "message_count", "unread_count"]
+
+# Sender recorded for the assistant's own replies (see app.py)
+BOT_SENDER = "bot"
+
+# Added after the table was first released; existing tables get them by ALTER TABLE
+_ACTIVITY_COLUMNS = {
+    "first_message_ms": "INTEGER",
+    "last_message_ms": "INTEGER",
+    "last_bot_reply_ms": "INTEGER",
+    "unread_count": "INTEGER NOT NULL DEFAULT 0",
+}
+
+
+def install(conn: sqlite3.Connection, sender_column: str = "sender") -> None:
+    """
+    Create the chat_stats table and its triggers on a messages table.
+
+    When the table is created for the first time it is backfilled from the
+    existing messages. A write transaction is opened if the caller has none,
+    so no insert can slip in between the backfill and the triggers; the
+    caller commits it.
+
+    Args:
+        conn: Open connection to the database holding the messages table
+        sender_column: Column of messages to record as last_sender
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_stats'"
+    ).fetchone()
+
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS chat_stats (
+            chat_id TEXT PRIMARY KEY,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            first_timestamp DATETIME,
+            last_timestamp DATETIME,
+            last_sender TEXT,
+            first_message_ms INTEGER,
+            last_message_ms INTEGER,
+            last_bot_reply_ms INTEGER,
+            unread_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_stats)")}
+    upgraded = not _ACTIVITY_COLUMNS.keys() <= columns
+    if upgraded:
+        for name, column_type in _ACTIVITY_COLUMNS.items():
+            if name not in columns:
+                conn.execute(f"ALTER TABLE chat_stats ADD COLUMN {name} {column_type}")
+        # Replaced below by triggers that maintain the new columns
+        conn.execute("DROP TRIGGER IF EXISTS trg_messages_chat_stats_insert")
+        conn.execute("DROP TRIGGER IF EXISTS trg_messages_chat_stats_delete")
+    # Chats are ordered by last_message_ms; the text timestamps do not sort chronologically
+    conn.execute("DROP INDEX IF EXISTS idx_chat_stats_last")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_stats_last_ms ON chat_stats(last_message_ms DESC)")
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS chats AS
+        SELECT chat_id, last_timestamp AS last_message_at, last_message_ms, last_sender,
+               message_count, unread_count
+        FROM chat_stats
+    """)
+
+    new_ms = epoch_ms_sql("NEW.timestamp")
+    # Timestamp texts mix ISO variants that do not sort chronologically; compare instants
+    older = "(first_message_ms IS NULL OR excluded.first_message_ms < first_message_ms)"
+    newer = "(last_message_ms IS NULL OR excluded.last_message_ms >= last_message_ms)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_chat_stats_insert
+        AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO chat_stats (chat_id, message_count, first_timestamp, last_timestamp, last_sender,
+                                    first_message_ms, last_message_ms, last_bot_reply_ms, unread_count)
+            VALUES (NEW.chat_id, 1, NEW.timestamp, NEW.timestamp, NEW.{sender_column}, {new_ms}, {new_ms},
+                    CASE WHEN NEW.{sender_column} = '{BOT_SENDER}' THEN {new_ms} END,
+                    NEW.{sender_column} != '{BOT_SENDER}')
+            ON CONFLICT(chat_id) DO UPDATE SET
+                message_count = message_count + 1,
+                first_timestamp = CASE WHEN {older} THEN excluded.first_timestamp ELSE first_timestamp END,
+                first_message_ms = CASE WHEN {older} THEN excluded.first_message_ms ELSE first_message_ms END,
+                last_sender = CASE WHEN {newer} THEN excluded.last_sender ELSE last_sender END,
+                last_timestamp = CASE WHEN {newer} THEN excluded.last_timestamp ELSE last_timestamp END,
+                last_message_ms = CASE WHEN {newer} THEN excluded.last_message_ms ELSE last_message_ms END,
+                unread_count = CASE
+                    WHEN excluded.last_bot_reply_ms IS NOT NULL THEN
+                        CASE WHEN excluded.last_bot_reply_ms >= COALESCE(last_bot_reply_ms, 0)
+                             THEN 0 ELSE unread_count END
+                    WHEN excluded.last_message_ms > COALESCE(last_bot_reply_ms, -1) THEN unread_count + 1
+                    ELSE unread_count END,
+                last_bot_reply_ms = MAX(COALESCE(last_bot_reply_ms, excluded.last_bot_reply_ms),
+                                        COALESCE(excluded.last_bot_reply_ms, last_bot_reply_ms));
+        END
+    """)
+
+    # Bounds are only recomputed (one index probe each) when the deleted row was on them
+    old_ms = epoch_ms_sql("OLD.timestamp")
+    newest = "FROM messages WHERE chat_id = OLD.chat_id ORDER BY timestamp_ms DESC, id DESC LIMIT 1"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_chat_stats_delete
+        AFTER DELETE ON messages
+        BEGIN
+            UPDATE chat_stats SET
+                message_count = message_count - 1,
+                unread_count = CASE WHEN OLD.{sender_column} != '{BOT_SENDER}'
+                                         AND {old_ms} > COALESCE(last_bot_reply_ms, -1)
+                                    THEN MAX(unread_count - 1, 0) ELSE unread_count END,
+                first_timestamp = CASE WHEN {old_ms} <= first_message_ms
+                    THEN (SELECT timestamp FROM messages WHERE chat_id = OLD.chat_id AND timestamp_ms IS NOT NULL
+                          ORDER BY timestamp_ms, id LIMIT 1)
+                    ELSE first_timestamp END,
+                first_message_ms = CASE WHEN {old_ms} <= first_message_ms
+                    THEN (SELECT MIN(timestamp_ms) FROM messages WHERE chat_id = OLD.chat_id)
+                    ELSE first_message_ms END,
+                last_timestamp = CASE WHEN {old_ms} >= last_message_ms
+                    THEN (SELECT timestamp {newest})
+                    ELSE last_timestamp END,
+                last_sender = CASE WHEN {old_ms} >= last_message_ms
+                    THEN (SELECT {sender_column} {newest})
+                    ELSE last_sender END,
+                last_message_ms = CASE WHEN {old_ms} >= last_message_ms
+                    THEN (SELECT MAX(timestamp_ms) FROM messages WHERE chat_id = OLD.chat_id)
+                    ELSE last_message_ms END
+            WHERE chat_id = OLD.chat_id;
+            DELETE FROM chat_stats WHERE chat_id = OLD.chat_id AND message_count <= 0;
+        END
+    """)
+
+    if not exists:
+        _backfill(conn, sender_column)
+    elif upgraded:
+        rebuild(conn, sender_column)
+
+
+def rebuild(conn: sqlite3.Connection, sender_column: str = "sender") -> None:
+    """
+    Recompute every chat_stats row from the messages table.
+
+    Used after bulk loads that ran with the triggers dropped. The caller
+    commits.
+
+    Args:
+        conn: Open connection to a database with chat_stats installed
+        sender_column: Column of messages to record as last_sender
+    """
+    conn.execute("DELETE FROM chat_stats")
+    _backfill(conn, sender_column)
+
+
+def _backfill(conn: sqlite3.Connection, sender_column: str) -> None:
+    """Insert a chat_stats row for every chat in the messages table."""
+    # timestamp_ms may not be backfilled yet, so instants are computed from the text
+    conn.execute(f"""
+        WITH m AS (
+            SELECT chat_id, timestamp, {sender_column} AS sender, ms,
+                   ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY ms IS NULL, ms, id) AS oldest,
+                   ROW_NUMBER() OVER (PARTITION BY chat_id ORDER BY ms DESC, id DESC) AS newest,
+                   MAX(CASE WHEN {sender_column} = '{BOT_SENDER}' THEN ms END)
+                       OVER (PARTITION BY chat_id) AS last_bot_reply_ms
+            FROM (SELECT *, {epoch_ms_sql('timestamp')} AS ms FROM messages)
+        )
+        INSERT INTO chat_stats (chat_id, message_count, first_timestamp, last_timestamp, last_sender,
+                                first_message_ms, last_message_ms, last_bot_reply_ms, unread_count)
+        SELECT chat_id, COUNT(*),
+               MAX(CASE WHEN oldest = 1 THEN timestamp END),
+               MAX(CASE WHEN newest = 1 THEN timestamp END),
+               MAX(CASE WHEN newest = 1 THEN sender END),
+               MIN(ms), MAX(ms), MAX(last_bot_reply_ms),
+               SUM(sender != '{BOT_SENDER}' AND ms > COALESCE(last_bot_reply_ms, -1))
+        FROM m
+        GROUP BY chat_id
+    """)
+
+
+def get_chat_count(conn: sqlite3.Connection, chat_id: str) -> int:
+    """Return the number of messages stored for a chat."""
+    row = conn.execute("SELECT message_count FROM chat_stats WHERE chat_id = ?", (chat_id,)).fetchone()
+    return row[0] if row else 0
+
+
+def get_total_count(conn: sqlite3.Connection) -> int:
+    """Return the number of messages across all chats."""
+    return conn.execute("SELECT COALESCE(SUM(message_count), 0) FROM chat_stats").fetchone()[0]
+
+
+def get_chat_total(conn: sqlite3.Connection) -> int:
+    """Return the number of chats with at least one message."""
+    return conn.execute("SELECT COUNT(*) FROM chat_stats").fetchone()[0]
+
+
+def list_chat_stats(conn: sqlite3.Connection, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Return per-chat stats, most recently active chats first."""
+    sql = f"SELECT {', '.join(CHAT_STATS_COLUMNS)} FROM chat_stats ORDER BY last_message_ms DESC"
+    params: tuple = ()
+    if limit is not None:
+        sql += " LIMIT ?"
+        params = (limit,)
+    return [dict(zip(CHAT_STATS_COLUMNS, row)) for row in conn.execute(sql, params)]
+
+
+def list_active_chats(conn: sqlite3.Connection, since_ms: Optional[int] = None,
+                      limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Return chats from the chats view, most recently active first.
+
+    Args:
+        conn: Open connection to a database with chat_stats installed
+        since_ms: Only chats with a message at or after this epoch-ms instant
+        limit: Maximum number of chats
+
+    Returns:
+        List of dicts with chat_id, last_message_at, last_message_ms,
+        last_sender, message_count and unread_count
+    """
+    sql = f"SELECT {', '.join(CHATS_COLUMNS)} FROM chats"
+    params: tuple = ()
+    if since_ms is not None:
+        sql += " WHERE last_message_ms >= ?"
+        params += (since_ms,)
+    sql += " ORDER BY last_message_ms DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params += (limit,)
+    return [dict(zip(CHATS_COLUMNS, row)) for row in conn.execute(sql, params)]
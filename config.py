@@ -35,6 +35,22 @@ class Config:
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
     OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
     
+    # Shared OpenAI connection pool (see llm_client.py)
+    LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv('LLM_MAX_CONCURRENT_REQUESTS', '8'))
+    LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+    LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', '60'))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+    
+    # Prompt token budget (see context_builder.py); LLM_MAX_TOKENS of it is reserved for the reply
+    LLM_CONTEXT_TOKENS = int(os.getenv('LLM_CONTEXT_TOKENS', '3000'))
+    LLM_MAX_TOKENS = int(os.getenv('LLM_MAX_TOKENS', '150'))
+    
+    # Response cache (see response_cache.py); 0 entries disables
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv('LLM_CACHE_MAX_ENTRIES', '1000'))
+    LLM_CACHE_TTL_SECONDS = float(os.getenv('LLM_CACHE_TTL_SECONDS', '3600'))
+    LLM_CACHE_DB_PATH = os.getenv('LLM_CACHE_DB_PATH') or None
+    LLM_CACHE_ROUTES = os.getenv('LLM_CACHE_ROUTES', 'chat,summary,simple')
+    
     # WhatsApp MCP Configuration  
     MCP_BASE_URL = os.getenv('MCP_BASE_URL', 'http://localhost:8000')
     MCP_API_KEY = os.getenv('MCP_API_KEY')
@@ -45,6 +61,7 @@ class Config:
     
     # Response Configuration
     MAX_SUMMARY_MESSAGES = int(os.getenv('MAX_SUMMARY_MESSAGES', '20'))
+    MAX_SUMMARY_WINDOW_MESSAGES = int(os.getenv('MAX_SUMMARY_WINDOW_MESSAGES', '200'))
     RESPONSE_DELAY = float(os.getenv('RESPONSE_DELAY', '1.0'))
 
 # Create global config instance
@@ -0,0 +1,177 @@
+"""
+Persistent SQLite connection management.
+
+Opening a SQLite connection per query costs a file open, schema parse and
+pragma setup on every call. This module keeps connections open for the
+lifetime of the process instead:
+
+- one shared writer connection, serialised by a lock, for all writes
+- a bounded pool of reader connections that are borrowed and returned, so
+  thread-per-request servers reuse connections instead of opening new ones
+
+Every connection is opened in WAL mode with synchronous=NORMAL, which lets
+readers run concurrently with the writer and avoids an fsync per commit.
+"""
+
+import queue
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_SIZE_KB = 8192
+DEFAULT_BUSY_TIMEOUT_MS = 5000
+DEFAULT_MAX_READERS = 8
+
+
+class ConnectionManager:
+    """Hands out long-lived, tuned SQLite connections for a single database file."""
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_size_kb: int = DEFAULT_CACHE_SIZE_KB,
+        busy_timeout_ms: int = DEFAULT_BUSY_TIMEOUT_MS,
+        max_readers: int = DEFAULT_MAX_READERS,
+        detect_types: int = 0,
+    ):
+        """
+        Initialize the connection manager.
+
+        Args:
+            db_path: Path to the SQLite database file
+            cache_size_kb: Page cache size per connection, in KiB
+            busy_timeout_ms: How long to wait on a locked database before failing
+            max_readers: Maximum number of reader connections kept open
+            detect_types: Passed through to sqlite3.connect
+        """
+        self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_readers = max_readers
+        self.detect_types = detect_types
+
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._write_depth = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            detect_types=self.detect_types,
+            check_same_thread=False,
+        )
+        self.configure(conn)
+        return conn
+
+    def configure(self, conn: sqlite3.Connection) -> None:
+        """Apply the performance pragmas to a freshly opened connection."""
+        # Only takes effect on a new database, and only before WAL is enabled
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow the shared writer connection.
+
+        The block runs as one transaction: it is committed when the outermost
+        writer() block exits normally and rolled back if it raises. Nested
+        writer() blocks on the same thread join the outer transaction.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            self._write_depth += 1
+            try:
+                yield conn
+                if self._write_depth == 1:
+                    conn.commit()
+            except Exception:
+                if self._write_depth == 1:
+                    conn.rollback()
+                raise
+            finally:
+                self._write_depth -= 1
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a reader connection from the pool.
+
+        A new connection is opened while fewer than max_readers exist;
+        after that callers wait for one to be returned.
+        """
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle_readers.put(conn)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        """Take an idle reader, opening a new one if the pool is not full."""
+        try:
+            return self._idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._readers_lock:
+            if len(self._readers) < self.max_readers:
+                conn = self._connect()
+                self._readers.append(conn)
+                return conn
+        return self._idle_readers.get()
+
+    def close(self) -> None:
+        """Close the writer and every reader connection opened so far."""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+            self._idle_readers = queue.LifoQueue()
+
+
+_managers: Dict[str, ConnectionManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_connection_manager(db_path: str, **kwargs) -> ConnectionManager:
+    """
+    Return the process-wide connection manager for a database file.
+
+    All callers that use the same path share one writer connection, which is
+    what keeps writers from contending for the database lock.
+    """
+    with _managers_lock:
+        manager = _managers.get(db_path)
+        if manager is None:
+            manager = ConnectionManager(db_path, **kwargs)
+            _managers[db_path] = manager
+            logger.info(f"Opened connection manager for {db_path}")
+        return manager
+
+
+def close_all() -> None:
+    """Close every connection manager created by get_connection_manager."""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+        _managers.clear()
@@ -0,0 +1,146 @@
+"""
+Token-budgeted prompt context.
+
+Taking a fixed number of recent messages makes prompt size depend on how
+long those messages happen to be: ten one-word replies waste the context
+window, and one pasted document blows up cost and latency. ContextBuilder
+fills a token budget instead:
+
+- the budget covers the whole request; max_completion_tokens of it are
+  reserved for the reply
+- the system prompt and the current message are always sent; a current
+  message that does not fit on its own is truncated
+- history is added newest first until the next turn no longer fits, so the
+  oldest turns are dropped first and short chats get more context
+
+Tokens are estimated locally with a regex heuristic tuned to overestimate
+slightly against OpenAI's tokenizers, so no tokenizer download or API call
+is needed. Per-message estimates are cached by text, so history sent with
+every reply is only counted once.
+"""
+
+import re
+import logging
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONTEXT_TOKENS = 3000
+DEFAULT_COMPLETION_TOKENS = 150
+# Role and separator tokens OpenAI adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tokens priming the assistant's reply
+REPLY_PRIMING_TOKENS = 3
+# Distinct message texts whose estimates are kept
+ESTIMATE_CACHE_SIZE = 10000
+
+TRUNCATION_MARKER = " […]"
+
+_PIECES = re.compile(r"[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]")
+
+
+def _estimate(text: str) -> int:
+    """Estimate the tokens of a text without caching."""
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        if piece[0].isascii():
+            # Common words are one token; long ones split every ~6 letters
+            tokens += (len(piece) + 5) // 6 if piece[0].isalpha() else 1
+        else:
+            # Accented letters ~1 token, CJK and emoji ~2
+            tokens += (len(piece.encode("utf-8")) + 1) // 2
+    return tokens
+
+
+@lru_cache(maxsize=ESTIMATE_CACHE_SIZE)
+def estimate_tokens(text: str) -> int:
+    """Estimate how many tokens a text costs, cached by text."""
+    return _estimate(text)
+
+
+def message_tokens(content: str) -> int:
+    """Estimate the tokens of a prompt message with the given content."""
+    return MESSAGE_OVERHEAD_TOKENS + estimate_tokens(content)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text so that it fits max_tokens, keeping its beginning.
+
+    Returns:
+        The text itself if it fits, else its longest fitting prefix
+        followed by TRUNCATION_MARKER
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - _estimate(TRUNCATION_MARKER)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if _estimate(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + TRUNCATION_MARKER
+
+
+class ContextBuilder:
+    """Builds chat completion messages that fit a token budget."""
+
+    def __init__(
+        self,
+        system_prompt: str,
+        max_context_tokens: int = DEFAULT_CONTEXT_TOKENS,
+        max_completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+    ):
+        """
+        Initialize the builder.
+
+        Args:
+            system_prompt: Instructions sent first in every request
+            max_context_tokens: Tokens of prompt and completion together
+            max_completion_tokens: Tokens of the budget reserved for the reply
+        """
+        if max_completion_tokens >= max_context_tokens:
+            raise ValueError("max_completion_tokens must be smaller than max_context_tokens")
+        self.system_prompt = system_prompt
+        self.max_context_tokens = max_context_tokens
+        self.max_completion_tokens = max_completion_tokens
+
+    @property
+    def prompt_budget(self) -> int:
+        """Tokens available to the prompt messages."""
+        return self.max_context_tokens - self.max_completion_tokens - REPLY_PRIMING_TOKENS
+
+    def build(self, history: Iterable[Tuple[str, str]], current_message: str) -> List[Dict[str, str]]:
+        """
+        Build the prompt for a reply to current_message.
+
+        Args:
+            history: (role, content) turns before the current message, oldest first
+            current_message: The message to reply to
+
+        Returns:
+            System prompt, as many of the newest turns as fit, and the current message
+        """
+        remaining = self.prompt_budget - message_tokens(self.system_prompt)
+        current = truncate_to_tokens(current_message, max(remaining - MESSAGE_OVERHEAD_TOKENS, 0))
+        if current is not current_message:
+            logger.info(f"Truncated a {estimate_tokens(current_message)}-token message to fit the context budget")
+        remaining -= message_tokens(current)
+
+        turns = []
+        for role, content in reversed(list(history)):
+            cost = message_tokens(content)
+            if cost > remaining:
+                break
+            turns.append({"role": role, "content": content})
+            remaining -= cost
+        turns.reverse()
+
+        return [
+            {"role": "system", "content": self.system_prompt},
+            *turns,
+            {"role": "user", "content": current},
+        ]
@@ -1,8 +1,23 @@
 import sqlite3
+import base64
+import json
 import logging
-from datetime import datetime
-from typing import List, Optional
+from concurrent.futures import Future
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from models import MessagePayload, StoredMessage
+from connection_manager import get_connection_manager
+import chat_stats
+import epoch_ms
+import message_bodies
+import message_search
+import schema
+from write_behind import WriteBehindQueue
+from message_archive import MessageArchiver
+from bloom_filter import BloomFilter
+from retention import RetentionManager, RetentionPolicy
+from backup import BackupManager
+from sharding import fan_out, shard_archive_dir, shard_path, shard_paths
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -10,62 +25,269 @@ logger = logging.getLogger(__name__)
 
 DATABASE_PATH = "messages.db"
 
+# Chats are hashed across this many database files (see sharding.py); set
+# with enable_sharding() before init_database()
+NUM_SHARDS = 1
+
+# Replays of a (chat_id, message_id) already stored are dropped by the unique index
+INSERT_MESSAGE_SQL = f"""
+    INSERT INTO messages (sender, chat_id, timestamp, content, message_id, timestamp_ms)
+    VALUES (?1, ?2, ?3, ?4, ?5, {epoch_ms.epoch_ms_sql('?3')})
+    ON CONFLICT DO NOTHING
+"""
+
+DEDUP_BLOOM_CAPACITY = 1_000_000
+
+# Set by enable_write_behind(), one per shard file; empty means every insert commits on its own
+_write_queues: Dict[str, WriteBehindQueue] = {}
+
+# Set by enable_archiving(), one per shard file; history reads continue into their monthly files
+_archivers: Dict[str, MessageArchiver] = {}
+
+# Set by enable_retention(), one per shard file
+_retention: Dict[str, RetentionManager] = {}
+
+# Set by enable_backups(), one per shard file
+_backups: Dict[str, BackupManager] = {}
+
+# (chat_id, message_id) keys seen so far; a miss proves a message is new
+_seen_messages = BloomFilter(DEDUP_BLOOM_CAPACITY)
+
+
+def enable_sharding(num_shards: int) -> None:
+    """Spread chats over num_shards database files, each with its own writer"""
+    global NUM_SHARDS
+    NUM_SHARDS = max(1, num_shards)
+    if NUM_SHARDS > 1:
+        logger.info(f"Sharding messages across {NUM_SHARDS} database files")
+
+
+def _shard_path(chat_id: str) -> str:
+    """Return the database file holding a chat"""
+    return shard_path(DATABASE_PATH, chat_id, NUM_SHARDS)
+
+
+def _shard_paths() -> List[str]:
+    """Return every shard's database file"""
+    return shard_paths(DATABASE_PATH, NUM_SHARDS)
+
 
 def init_database():
-    """Initialize the SQLite database and create tables"""
+    """Initialize the SQLite database (every shard) and create tables"""
+    global _seen_messages
+    _seen_messages = BloomFilter(DEDUP_BLOOM_CAPACITY)
+    for path in _shard_paths():
+        _init_shard(path)
+
+
+def _init_shard(path: str) -> None:
+    """Create or migrate the shared messages schema in one database file"""
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        # Same table, indexes and triggers as app.py and chat_history.py (see schema.py)
+        schema.initialize(path)
         
-        # Create messages table
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS messages (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sender_id TEXT NOT NULL,
-                chat_id TEXT NOT NULL,
-                timestamp DATETIME NOT NULL,
-                message_text TEXT NOT NULL,
-                message_id TEXT,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Create indexes for better query performance
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_id ON messages(chat_id)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_timestamp ON messages(timestamp)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_sender_id ON messages(sender_id)")
-        
-        conn.commit()
+        conn = sqlite3.connect(path)
+        _seed_seen_messages(conn)
         conn.close()
-        logger.info("Database initialized successfully")
+        
+        logger.info(f"Database {path} initialized successfully")
         
     except Exception as e:
         logger.error(f"Error initializing database: {e}")
         raise
 
 
-def store_message(message: MessagePayload) -> int:
-    """Store a message in the database and return the row ID"""
+def _dedup_key(chat_id: str, message_id: str) -> str:
+    """Build the Bloom filter key for a message"""
+    return f"{chat_id}\x00{message_id}"
+
+
+def _seed_seen_messages(conn: sqlite3.Connection) -> None:
+    """Load the message IDs already stored in one shard into the dedup Bloom filter"""
+    rows = conn.execute("SELECT chat_id, message_id FROM messages WHERE message_id IS NOT NULL")
+    for chat_id, message_id in rows:
+        _seen_messages.add(_dedup_key(chat_id, message_id))
+
+
+def is_duplicate(message: MessagePayload) -> bool:
+    """
+    Check whether a message with the same chat_id and message_id is already stored.
+    
+    The Bloom filter answers for new messages without touching SQLite; only
+    probable duplicates are confirmed against the unique index. Messages
+    without a message_id are never duplicates.
+    """
+    if not message.message_id:
+        return False
+    if _dedup_key(message.chat_id, message.message_id) not in _seen_messages:
+        return False
+    
+    conn = sqlite3.connect(_shard_path(message.chat_id))
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO messages (sender_id, chat_id, timestamp, message_text, message_id)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            message.sender_id,
-            message.chat_id,
-            message.timestamp,
-            message.message_text,
-            message.message_id
-        ))
-        
-        row_id = cursor.lastrowid
-        conn.commit()
+        row = conn.execute(
+            "SELECT 1 FROM messages WHERE chat_id = ? AND message_id = ?",
+            (message.chat_id, message.message_id)
+        ).fetchone()
+    finally:
         conn.close()
+    return row is not None
+
+
+def _mark_seen(message: MessagePayload) -> None:
+    """Record a message's ID in the dedup Bloom filter"""
+    if message.message_id:
+        _seen_messages.add(_dedup_key(message.chat_id, message.message_id))
+
+
+def enable_write_behind(max_batch: int = 500, flush_interval_ms: int = 50) -> None:
+    """Batch message inserts into group commits instead of one commit per row"""
+    if not _write_queues:
+        for path in _shard_paths():
+            _write_queues[path] = WriteBehindQueue(
+                get_connection_manager(path),
+                max_batch=max_batch,
+                flush_interval_ms=flush_interval_ms
+            )
+        logger.info(f"Write-behind enabled (batch={max_batch}, interval={flush_interval_ms}ms)")
+
+
+def disable_write_behind() -> None:
+    """Flush queued inserts and return to one commit per row"""
+    if _write_queues:
+        for queue in _write_queues.values():
+            queue.close()
+        _write_queues.clear()
+        logger.info("Write-behind disabled")
+
+
+def enable_archiving(archive_dir: str, max_age_days: int = 90,
+                     interval_seconds: float = 86400) -> List[MessageArchiver]:
+    """Periodically move old messages into per-month archive files (one directory per shard)"""
+    if not _archivers:
+        for path in _shard_paths():
+            archiver = MessageArchiver(path, shard_archive_dir(archive_dir, path, NUM_SHARDS),
+                                       max_age_days=max_age_days, order_column="timestamp_ms")
+            archiver.upgrade()
+            archiver.start(interval_seconds)
+            _archivers[path] = archiver
+        logger.info(f"Archiving messages older than {max_age_days} days to {archive_dir}")
+    return list(_archivers.values())
+
+
+def disable_archiving() -> None:
+    """Stop the background archivers"""
+    for archiver in _archivers.values():
+        archiver.stop()
+    _archivers.clear()
+
+
+def enable_retention(max_age_days: Optional[float] = None, max_rows_per_chat: Optional[int] = None,
+                     chat_policies: Optional[Dict[str, RetentionPolicy]] = None,
+                     interval_seconds: float = 3600) -> List[RetentionManager]:
+    """Periodically delete messages beyond a maximum age and/or count per chat, in small batches"""
+    if not _retention:
+        default_policy = RetentionPolicy(max_age_days=max_age_days, max_rows=max_rows_per_chat)
+        for path in _shard_paths():
+            manager = RetentionManager(path, default_policy, chat_policies, order_column="timestamp_ms")
+            manager.start(interval_seconds)
+            _retention[path] = manager
+        logger.info(f"Retention enabled (default {default_policy}, {len(chat_policies or {})} chat overrides)")
+    return list(_retention.values())
+
+
+def disable_retention() -> None:
+    """Stop the background retention jobs"""
+    for manager in _retention.values():
+        manager.stop()
+    _retention.clear()
+
+
+def enable_backups(backup_dir: str, interval_seconds: float = 86400, keep: int = 7,
+                   pages_per_step: int = 256) -> List[BackupManager]:
+    """Periodically take compressed online snapshots of every shard (interval 0: only on trigger_backup())"""
+    if not _backups:
+        for path in _shard_paths():
+            manager = BackupManager(path, backup_dir, keep=keep, pages_per_step=pages_per_step)
+            manager.start(interval_seconds)
+            _backups[path] = manager
+        logger.info(f"Backups enabled to {backup_dir} (every {interval_seconds}s, keeping {keep})")
+    return list(_backups.values())
+
+
+def disable_backups() -> None:
+    """Stop the background backup jobs, cancelling running backups"""
+    for manager in _backups.values():
+        manager.stop()
+    _backups.clear()
+
+
+def trigger_backup() -> bool:
+    """Start a backup of every shard in the background; False if backups are not enabled"""
+    for manager in _backups.values():
+        manager.trigger()
+    return bool(_backups)
+
+
+def backup_status() -> List[Dict[str, Any]]:
+    """Describe the last backup and the snapshots on disk of every shard"""
+    return [manager.status() for manager in _backups.values()]
+
+
+def _message_params(message: MessagePayload) -> tuple:
+    """Build the INSERT parameters for a message"""
+    return (
+        message.sender_id,
+        message.chat_id,
+        message.timestamp,
+        message.message_text,
+        message.message_id
+    )
+
+
+def submit_message(message: MessagePayload) -> Future:
+    """
+    Store a message and return a future resolving to its row ID.
+    
+    The future resolves to None if the message is a duplicate of one already
+    stored (same chat_id and message_id). With write-behind enabled the row
+    is committed with the next batch; otherwise it is stored immediately and
+    the future is already done.
+    """
+    write_queue = _write_queues.get(_shard_path(message.chat_id))
+    if write_queue is not None and not is_duplicate(message):
+        _mark_seen(message)
+        return write_queue.submit(INSERT_MESSAGE_SQL, _message_params(message), want_rowid=True)
+    
+    # Duplicates resolve to None here without being queued
+    future: Future = Future()
+    try:
+        future.set_result(store_message(message, write_behind=False))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def store_message(message: MessagePayload, write_behind: bool = True) -> Optional[int]:
+    """Store a message in the database and return the row ID, or None if it is a duplicate"""
+    if is_duplicate(message):
+        logger.info(f"Skipping duplicate message {message.message_id} in chat {message.chat_id}")
+        return None
+    path = _shard_path(message.chat_id)
+    if write_behind and path in _write_queues:
+        return submit_message(message).result()
+    
+    try:
+        # The shard's shared writer connection, so concurrent writers queue on
+        # its lock instead of contending for the database file lock
+        with get_connection_manager(path).writer() as conn:
+            cursor = conn.execute(INSERT_MESSAGE_SQL, _message_params(message))
+            row_id = cursor.lastrowid if cursor.rowcount else None
+        _mark_seen(message)
         
-        logger.info(f"Message stored successfully with ID: {row_id}")
+        if row_id is None:
+            logger.info(f"Skipping duplicate message {message.message_id} in chat {message.chat_id}")
+        else:
+            logger.info(f"Message stored successfully with ID: {row_id}")
         return row_id
         
     except Exception as e:
@@ -73,54 +295,350 @@ def store_message(message: MessagePayload) -> int:
         raise
 
 
+def encode_cursor(timestamp_ms: int, row_id: int) -> str:
+    """Build an opaque pagination cursor from a row's epoch-ms timestamp and ID"""
+    raw = json.dumps([timestamp_ms, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[int, int]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        timestamp_ms, row_id = json.loads(raw)
+        return int(timestamp_ms), int(row_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {token}") from e
+
+
+# In the order of StoredMessage/MessageRecord fields (sender_id, message_text in the API)
+_ARCHIVE_COLUMNS = "id, sender, chat_id, timestamp, content, message_id, created_at, timestamp_ms"
+# Hot rows may keep their text in message_bodies
+_MESSAGE_COLUMNS = _ARCHIVE_COLUMNS.replace("content", message_bodies.content_sql(), 1)
+
+
+def _select_chat_page(chat_id: str, before: Optional[Tuple[Any, int]], limit: Optional[int]) -> Tuple[str, tuple]:
+    """Build the newest-first keyset query for a chat"""
+    sql = f"SELECT {_MESSAGE_COLUMNS} FROM messages WHERE chat_id = ?"
+    params: tuple = (chat_id,)
+    if before is not None:
+        sql += " AND (timestamp_ms, id) < (?, ?)"
+        params += (before[0], before[1])
+    sql += " ORDER BY timestamp_ms DESC, id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params += (limit,)
+    return sql, params
+
+
+def _row_to_message(row: tuple) -> StoredMessage:
+    """Convert a messages row into a StoredMessage"""
+    return StoredMessage(
+        id=row[0],
+        sender_id=row[1],
+        chat_id=row[2],
+        timestamp=datetime.fromisoformat(row[3]) if isinstance(row[3], str) else row[3],
+        message_text=row[4],
+        message_id=row[5],
+        created_at=datetime.fromisoformat(row[6]) if isinstance(row[6], str) else row[6]
+    )
+
+
+class MessageRecord:
+    """
+    Lightweight read-only view of a messages row.
+    
+    Built without validation or datetime parsing: timestamps stay as stored
+    (ISO text plus the integer timestamp_ms), so large pages cost one small
+    object per row. Use StoredMessage where validated models are needed.
+    """
+    
+    __slots__ = ("id", "sender_id", "chat_id", "timestamp", "message_text",
+                 "message_id", "created_at", "timestamp_ms")
+    
+    def __init__(self, row: tuple):
+        (self.id, self.sender_id, self.chat_id, self.timestamp, self.message_text,
+         self.message_id, self.created_at, self.timestamp_ms) = row
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the record as a JSON-ready dict with ISO 8601 timestamps"""
+        return {
+            "id": self.id,
+            "sender_id": self.sender_id,
+            "chat_id": self.chat_id,
+            "timestamp": _iso(self.timestamp),
+            "timestamp_ms": self.timestamp_ms,
+            "message_text": self.message_text,
+            "message_id": self.message_id,
+            "created_at": _iso(self.created_at)
+        }
+
+
 def get_messages_by_chat(chat_id: str, limit: int = 50) -> List[StoredMessage]:
     """Retrieve messages for a specific chat ID"""
+    return get_messages_page(chat_id, limit)[0]
+
+
+def get_messages_page(chat_id: str, limit: int = 50,
+                      cursor: Optional[str] = None) -> Tuple[List[StoredMessage], Optional[str]]:
+    """
+    Retrieve one page of messages for a chat, newest first.
+    
+    Returns the messages and a cursor for the next (older) page, or None
+    when there are no more messages.
+    """
+    rows, next_cursor = _fetch_chat_page(chat_id, limit, cursor)
+    return [_row_to_message(row) for row in rows], next_cursor
+
+
+def get_message_records(chat_id: str, limit: int = 50,
+                        cursor: Optional[str] = None) -> Tuple[List[MessageRecord], Optional[str]]:
+    """
+    Retrieve one page of messages as MessageRecords, newest first.
+    
+    Same rows and cursor as get_messages_page, without building a Pydantic
+    model or parsing timestamps for each row.
+    """
+    rows, next_cursor = _fetch_chat_page(chat_id, limit, cursor)
+    return [MessageRecord(row) for row in rows], next_cursor
+
+
+def get_messages_between(chat_id: str, since: datetime, until: Optional[datetime] = None,
+                         limit: Optional[int] = None) -> List[StoredMessage]:
+    """
+    Retrieve a chat's messages timestamped in [since, until), oldest first.
+    
+    A range scan of the (chat_id, timestamp_ms) index, continuing into the
+    archive files the window reaches. With a limit, the newest `limit`
+    messages of the window are returned. Naive datetimes are taken as UTC.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        since_ms = epoch_ms.to_epoch_ms(since)
+        until_ms = epoch_ms.to_epoch_ms(until or datetime.now(timezone.utc))
+        path = _shard_path(chat_id)
+        conn = sqlite3.connect(path)
+        try:
+            sql = (f"SELECT {_MESSAGE_COLUMNS} FROM messages "
+                   "WHERE chat_id = ? AND timestamp_ms >= ? AND timestamp_ms < ? "
+                   "ORDER BY timestamp_ms DESC, id DESC")
+            params: tuple = (chat_id, since_ms, until_ms)
+            if limit is not None:
+                sql += " LIMIT ?"
+                params += (limit,)
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
         
-        cursor.execute("""
-            SELECT id, sender_id, chat_id, timestamp, message_text, message_id, created_at
-            FROM messages
-            WHERE chat_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        """, (chat_id, limit))
+        archiver = _archivers.get(path)
+        if archiver is not None and (limit is None or len(rows) < limit):
+            for row in archiver.iter_range(chat_id, since_ms, until_ms, columns=_ARCHIVE_COLUMNS):
+                if limit is not None and len(rows) >= limit:
+                    break
+                rows.append(row)
         
-        rows = cursor.fetchall()
-        conn.close()
+        return [_row_to_message(row) for row in reversed(rows)]
         
-        messages = []
-        for row in rows:
-            messages.append(StoredMessage(
-                id=row[0],
-                sender_id=row[1],
-                chat_id=row[2],
-                timestamp=datetime.fromisoformat(row[3]) if isinstance(row[3], str) else row[3],
-                message_text=row[4],
-                message_id=row[5],
-                created_at=datetime.fromisoformat(row[6]) if isinstance(row[6], str) else row[6]
-            ))
+    except Exception as e:
+        logger.error(f"Error retrieving messages between {since} and {until}: {e}")
+        raise
+
+
+def _fetch_chat_page(chat_id: str, limit: int, cursor: Optional[str]) -> Tuple[List[tuple], Optional[str]]:
+    """Read one newest-first page of raw rows, continuing into the archive if needed"""
+    try:
+        before = decode_cursor(cursor) if cursor else None
+        path = _shard_path(chat_id)
+        sql, params = _select_chat_page(chat_id, before, limit)
+        with get_connection_manager(path).reader() as conn:
+            rows = conn.execute(sql, params).fetchall()
         
-        return messages
+        archiver = _archivers.get(path)
+        if archiver is not None and len(rows) < limit:
+            older = (rows[-1][7], rows[-1][0]) if rows else before
+            rows += archiver.query_history(chat_id, limit - len(rows), older, columns=_ARCHIVE_COLUMNS)
+        
+        next_cursor = encode_cursor(rows[-1][7], rows[-1][0]) if len(rows) == limit else None
+        return rows, next_cursor
         
     except Exception as e:
         logger.error(f"Error retrieving messages: {e}")
         raise
 
 
+def iter_messages_by_chat(chat_id: str, cursor: Optional[str] = None,
+                          limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Stream messages for a chat newest-first, one dict per row.
+    
+    Rows are read straight off the SQLite cursor, so memory stays constant
+    however long the history is. Each row carries the cursor that resumes
+    the stream after it. Timestamps are returned in ISO format.
+    """
+    before = decode_cursor(cursor) if cursor else None
+    path = _shard_path(chat_id)
+    # The generator may be resumed from different worker threads
+    conn = sqlite3.connect(path, check_same_thread=False)
+    try:
+        sql, params = _select_chat_page(chat_id, before, limit)
+        rows: Iterator[tuple] = conn.execute(sql, params)
+        if path in _archivers:
+            rows = _with_archive(rows, _archivers[path], chat_id, before, limit)
+        for row in rows:
+            yield {
+                "id": row[0],
+                "sender_id": row[1],
+                "chat_id": row[2],
+                "timestamp": _iso(row[3]),
+                "message_text": row[4],
+                "message_id": row[5],
+                "created_at": _iso(row[6]),
+                "cursor": encode_cursor(row[7], row[0])
+            }
+    finally:
+        conn.close()
+
+
+def _with_archive(rows: Iterator[tuple], archiver: MessageArchiver, chat_id: str,
+                  before: Optional[Tuple[Any, int]], limit: Optional[int]) -> Iterator[tuple]:
+    """Continue a newest-first stream of hot rows into the archive files"""
+    count = 0
+    for row in rows:
+        count += 1
+        before = (row[7], row[0])
+        yield row
+    for row in archiver.iter_history(chat_id, before, columns=_ARCHIVE_COLUMNS):
+        if limit is not None and count >= limit:
+            return
+        count += 1
+        yield row
+
+
+def _iso(value: Any) -> Any:
+    """Render a stored SQLite datetime string ('YYYY-MM-DD HH:MM:SS') as ISO 8601"""
+    return value.replace(" ", "T", 1) if isinstance(value, str) else value
+
+
 def get_message_count() -> int:
-    """Get total count of messages in database"""
+    """Get total count of messages in database (summed over every shard)"""
+    try:
+        return sum(fan_out(_shard_paths(), _query_total_count))
+        
+    except Exception as e:
+        logger.error(f"Error getting message count: {e}")
+        raise
+
+
+def _query_total_count(path: str) -> int:
+    """Read one shard's message total"""
+    conn = sqlite3.connect(path)
+    try:
+        return chat_stats.get_total_count(conn)
+    finally:
+        conn.close()
+
+
+def get_chat_stats(limit: Optional[int] = 100) -> Dict[str, Any]:
+    """
+    Get message totals plus per-chat breakdowns, most recently active first.
+    
+    Shards are queried in parallel and merged; each shard returns at most
+    `limit` chats, which is enough to pick the global top `limit`.
+    """
     try:
-        conn = sqlite3.connect(DATABASE_PATH)
-        cursor = conn.cursor()
+        shard_stats = fan_out(_shard_paths(), lambda path: _query_chat_stats(path, limit))
+        chats = [chat for stats in shard_stats for chat in stats["chats"]]
+        if len(shard_stats) > 1:
+            chats.sort(key=lambda chat: chat["last_message_ms"] or 0, reverse=True)
+            if limit is not None:
+                chats = chats[:limit]
+        return {
+            "total_messages": sum(stats["total_messages"] for stats in shard_stats),
+            "total_chats": sum(stats["total_chats"] for stats in shard_stats),
+            "chats": chats
+        }
         
-        cursor.execute("SELECT COUNT(*) FROM messages")
-        count = cursor.fetchone()[0]
+    except Exception as e:
+        logger.error(f"Error getting chat stats: {e}")
+        raise
+
+
+def _query_chat_stats(path: str, limit: Optional[int]) -> Dict[str, Any]:
+    """Read one shard's totals and most recently active chats"""
+    conn = sqlite3.connect(path)
+    try:
+        return {
+            "total_messages": chat_stats.get_total_count(conn),
+            "total_chats": chat_stats.get_chat_total(conn),
+            "chats": chat_stats.list_chat_stats(conn, limit)
+        }
+    finally:
         conn.close()
+
+
+def list_chats(active_since: Optional[datetime] = None, limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+    """
+    List chats most recently active first, with message and unread counts.
+    
+    Reads the trigger-maintained chats view through its activity index, so
+    the cost grows with `limit`, not with the number of messages. Shards are
+    queried in parallel and merged.
+    """
+    try:
+        since_ms = epoch_ms.to_epoch_ms(active_since) if active_since is not None else None
+        paths = _shard_paths()
+        chats = [
+            chat
+            for shard_chats in fan_out(paths, lambda path: _query_chats(path, since_ms, limit))
+            for chat in shard_chats
+        ]
+        if len(paths) > 1:
+            chats.sort(key=lambda chat: chat["last_message_ms"] or 0, reverse=True)
+            if limit is not None:
+                chats = chats[:limit]
+        return chats
         
-        return count
+    except Exception as e:
+        logger.error(f"Error listing chats: {e}")
+        raise
+
+
+def _query_chats(path: str, since_ms: Optional[int], limit: Optional[int]) -> List[Dict[str, Any]]:
+    """Read one shard's most recently active chats"""
+    conn = sqlite3.connect(path)
+    try:
+        return chat_stats.list_active_chats(conn, since_ms, limit)
+    finally:
+        conn.close()
+
+
+def search_messages(query: str, chat_id: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Full-text search over message text, BM25-ranked with highlighted snippets.
+    
+    Without a chat_id every shard is searched in parallel and the matches
+    merged by score.
+    """
+    try:
+        paths = [_shard_path(chat_id)] if chat_id is not None else _shard_paths()
+        results = [
+            result
+            for shard_results in fan_out(paths, lambda path: _query_search(path, query, chat_id, limit))
+            for result in shard_results
+        ]
+        if len(paths) > 1:
+            results.sort(key=lambda result: result["score"])
+            results = results[:limit]
+        return results
         
     except Exception as e:
-        logger.error(f"Error getting message count: {e}")
-        raise
\ No newline at end of file
+        logger.error(f"Error searching messages: {e}")
+        raise
+
+
+def _query_search(path: str, query: str, chat_id: Optional[str], limit: int) -> List[Dict[str, Any]]:
+    """Run a full-text search against one shard"""
+    conn = sqlite3.connect(path)
+    try:
+        return message_search.search(conn, query, chat_id, limit)
+    finally:
+        conn.close()
@@ -0,0 +1,125 @@
+"""
+Integer epoch-millisecond ordering key for messages tables.
+
+Message timestamps are stored as TEXT in whatever ISO-8601 variant the
+sender used ('Z' or '+00:00', 'T' or ' ', with or without fractional
+seconds). Those strings do not sort chronologically, so this module adds a
+timestamp_ms INTEGER column holding the same instant as milliseconds since
+the Unix epoch (UTC; naive timestamps are taken as UTC) and makes it the
+ordering key.
+
+The value is computed in SQL with julianday(), which understands all of
+those variants, so writers, the insert trigger and the backfill always
+agree. install() is cheap on any table size; backfill() then fills existing
+rows in short batches so other writers are never blocked for long.
+"""
+
+import sqlite3
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+def epoch_ms_sql(value: str) -> str:
+    """Return the SQL expression converting an ISO-8601 text value to epoch milliseconds."""
+    return f"CAST(round((julianday({value}) - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def to_epoch_ms(value: datetime) -> int:
+    """Convert a datetime to epoch milliseconds; naive datetimes are taken as UTC, like in SQL."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
+
+
+def install(conn: sqlite3.Connection) -> None:
+    """
+    Add the timestamp_ms column, its indexes and triggers to a messages table.
+
+    Rows inserted or re-timestamped without a timestamp_ms get one from the
+    triggers; existing rows are filled by backfill(). The caller commits.
+
+    Args:
+        conn: Open connection to the database holding the messages table
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+    if "timestamp_ms" not in columns:
+        # Adding a nullable column only rewrites the schema, not the table
+        conn.execute("ALTER TABLE messages ADD COLUMN timestamp_ms INTEGER")
+        logger.info("Added timestamp_ms column to messages")
+
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_chat_timestamp_ms
+        ON messages(chat_id, timestamp_ms DESC, id DESC)
+    """)
+    # Holds only rows still waiting for a value, so backfill() never scans the table
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_timestamp_ms_pending
+        ON messages(id) WHERE timestamp_ms IS NULL
+    """)
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_timestamp_ms_insert
+        AFTER INSERT ON messages WHEN NEW.timestamp_ms IS NULL
+        BEGIN
+            UPDATE messages SET timestamp_ms = {epoch_ms_sql('NEW.timestamp')} WHERE id = NEW.id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_timestamp_ms_update
+        AFTER UPDATE OF timestamp ON messages
+        BEGIN
+            UPDATE messages SET timestamp_ms = {epoch_ms_sql('NEW.timestamp')} WHERE id = NEW.id;
+        END
+    """)
+
+
+def backfill(db_path: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Fill timestamp_ms for existing rows, one short transaction per batch.
+
+    Safe to run while the database is in use and to rerun after an
+    interruption. Rows whose timestamp cannot be parsed stay NULL and sort
+    after every dated message.
+
+    Args:
+        db_path: Path to a database on which install() has been run
+        batch_size: Rows updated per transaction
+
+    Returns:
+        int: Number of rows given a timestamp_ms
+    """
+    filled = 0
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        last_id = 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                ids = [row[0] for row in conn.execute(
+                    "SELECT id FROM messages WHERE timestamp_ms IS NULL AND id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size)
+                )]
+                if ids:
+                    placeholders = ",".join("?" * len(ids))
+                    filled += conn.execute(
+                        f"UPDATE messages SET timestamp_ms = {epoch_ms_sql('timestamp')} "
+                        f"WHERE id IN ({placeholders}) AND julianday(timestamp) IS NOT NULL",
+                        ids
+                    ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if len(ids) < batch_size:
+                break
+            last_id = ids[-1]
+    finally:
+        conn.close()
+
+    if filled:
+        logger.info(f"Backfilled timestamp_ms for {filled} messages in {db_path}")
+    return filled
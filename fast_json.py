@@ -0,0 +1,24 @@
+"""
+JSON encoding straight to bytes for hot response paths.
+
+Uses orjson when it is installed, which encodes several times faster than
+the standard library, and falls back to a compact json encoder otherwise.
+Both produce UTF-8 without ASCII escaping, so output is the same either way.
+"""
+
+import json
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode dicts, lists, strings, numbers, booleans and None as JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return _encoder.encode(obj).encode("utf-8")
@@ -1,23 +1,42 @@
 """OpenAI GPT client with streaming capabilities."""
 
 import asyncio
-import openai
 import logging
 from typing import AsyncGenerator, List, Dict, Any
 from config import Config
+from llm_client import get_llm_client_manager
+from response_cache import cache_key, get_response_cache, parse_routes
+from single_flight import AsyncSingleFlight
 
 logger = logging.getLogger(__name__)
 
+# Identical requests in flight at the same time share one API call or stream, across all clients
+_flights = AsyncSingleFlight()
+
 class StreamingGPTClient:
     """Client for streaming GPT responses."""
     
     def __init__(self):
+        # Shared by every client in the process
+        self.cache = get_response_cache(
+            Config.LLM_CACHE_DB_PATH,
+            max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+            ttl_seconds=Config.LLM_CACHE_TTL_SECONDS,
+            routes=parse_routes(Config.LLM_CACHE_ROUTES)
+        ) if Config.LLM_CACHE_MAX_ENTRIES > 0 else None
         if not Config.OPENAI_API_KEY:
             logger.warning("OPENAI_API_KEY not set. GPT client will not be initialized.")
             self.client = None
             self.model = Config.OPENAI_MODEL
             return
-        self.client = openai.AsyncOpenAI(api_key=Config.OPENAI_API_KEY)
+        # Pooled connections and request slots shared by every client in the process
+        self.client = get_llm_client_manager(
+            Config.OPENAI_API_KEY,
+            max_concurrent=Config.LLM_MAX_CONCURRENT_REQUESTS,
+            connect_timeout=Config.LLM_CONNECT_TIMEOUT,
+            read_timeout=Config.LLM_READ_TIMEOUT,
+            max_connections=Config.LLM_MAX_CONNECTIONS
+        )
         self.model = Config.OPENAI_MODEL
     
     async def stream_completion(
@@ -25,16 +44,30 @@ class StreamingGPTClient:
         messages: List[Dict[str, str]], 
         **kwargs
     ) -> AsyncGenerator[str, None]:
-        """Stream completion from GPT model."""
+        """
+        Stream completion from GPT model.
+        
+        Concurrent identical requests share one upstream stream; each
+        consumer receives every chunk of it.
+        """
         if not self.client:
             yield "Error: OpenAI client not initialized. Please set OPENAI_API_KEY."
             return
-            
+        
+        key = cache_key(self.model, messages, **kwargs)
+        async for text in _flights.stream(key, lambda: self._stream_text(messages, **kwargs)):
+            yield text
+    
+    async def _stream_text(
+        self, 
+        messages: List[Dict[str, str]], 
+        **kwargs
+    ) -> AsyncGenerator[str, None]:
+        """Stream the text of a completion, ending with an error text on failure."""
         try:
-            response = await self.client.chat.completions.create(
+            response = self.client.astream_chat_completion(
                 model=self.model,
                 messages=messages,
-                stream=True,
                 **kwargs
             )
             
@@ -49,19 +82,39 @@ class StreamingGPTClient:
     async def get_completion(
         self, 
         messages: List[Dict[str, str]], 
+        route: str = "simple",
         **kwargs
     ) -> str:
-        """Get complete response from GPT model."""
+        """
+        Get complete response from GPT model.
+        
+        Responses are served from and stored in the response cache when
+        `route` is one of LLM_CACHE_ROUTES. Concurrent identical requests
+        share one API call.
+        """
         if not self.client:
             return "Error: OpenAI client not initialized. Please set OPENAI_API_KEY."
             
         try:
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                **kwargs
-            )
-            return response.choices[0].message.content
+            key = cache_key(self.model, messages, **kwargs)
+            cached_route = self.cache is not None and self.cache.enabled_for(route)
+            if cached_route:
+                cached = await self.cache.aget(key)
+                if cached is not None:
+                    return cached
+            
+            async def request():
+                response = await self.client.acreate_chat_completion(
+                    model=self.model,
+                    messages=messages,
+                    **kwargs
+                )
+                content = response.choices[0].message.content
+                if cached_route and content is not None:
+                    await self.cache.aput(key, content)
+                return content
+            
+            return await _flights.do(key, request)
         except Exception as e:
             logger.error(f"Error getting GPT completion: {e}")
             return "Error: Unable to generate response"
\ No newline at end of file
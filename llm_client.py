@@ -0,0 +1,192 @@
+"""
+Process-wide, pooled OpenAI clients.
+
+Building an openai.OpenAI client per request also builds a new HTTP
+connection pool, so every reply pays for a TCP connect and TLS handshake to
+the API. LLMClientManager keeps one client per process instead:
+
+- a keep-alive httpx connection pool shared by all requests, so replies
+  reuse warm connections
+- explicit connect and read timeouts, so a stalled connection fails fast
+  instead of holding a request thread for the library default (10 minutes)
+- a cap on concurrent API requests; callers beyond it wait for a slot
+  rather than opening ever more connections and hitting rate limits
+
+Synchronous callers (app.py) share one openai.OpenAI client guarded by a
+thread semaphore. Async callers (gpt_client.py) get an openai.AsyncOpenAI
+client and asyncio semaphore per event loop, since httpx async pools cannot
+be shared across loops.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+import httpx
+import openai
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_CONCURRENT = 8
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_KEEPALIVE_EXPIRY = 30.0
+DEFAULT_MAX_RETRIES = 2
+
+
+class LLMClientManager:
+    """Shares pooled OpenAI clients and limits concurrent API requests."""
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        max_concurrent: int = DEFAULT_MAX_CONCURRENT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        read_timeout: float = DEFAULT_READ_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        keepalive_expiry: float = DEFAULT_KEEPALIVE_EXPIRY,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ):
+        """
+        Initialize the client manager; clients are created on first use.
+
+        Args:
+            api_key: OpenAI API key
+            max_concurrent: API requests in flight at once (per event loop
+                for async callers); further callers wait for a slot
+            connect_timeout: Seconds to establish a connection
+            read_timeout: Seconds to wait for each chunk of a response
+            max_connections: Size of the HTTP connection pool
+            keepalive_expiry: Seconds an idle pooled connection is kept open
+            max_retries: Retries of failed requests by the openai library
+        """
+        self.api_key = api_key
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_retries = max_retries
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._lock = threading.Lock()
+        self._client: Optional[openai.OpenAI] = None
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        # Event loop -> (async client, request slots); dropped with the loop
+        self._async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    @property
+    def client(self) -> openai.OpenAI:
+        """The shared synchronous client."""
+        with self._lock:
+            if self._client is None:
+                self._client = openai.OpenAI(
+                    api_key=self.api_key,
+                    timeout=self.timeout,
+                    max_retries=self.max_retries,
+                    http_client=httpx.Client(limits=self.limits, timeout=self.timeout),
+                )
+            return self._client
+
+    def _async_client(self) -> Tuple[openai.AsyncOpenAI, asyncio.Semaphore]:
+        """Return the running event loop's async client and request slots."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._async_clients.get(loop)
+            if entry is None:
+                entry = (
+                    openai.AsyncOpenAI(
+                        api_key=self.api_key,
+                        timeout=self.timeout,
+                        max_retries=self.max_retries,
+                        http_client=httpx.AsyncClient(limits=self.limits, timeout=self.timeout),
+                    ),
+                    asyncio.Semaphore(self.max_concurrent),
+                )
+                self._async_clients[loop] = entry
+            return entry
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """The running event loop's async client."""
+        return self._async_client()[0]
+
+    @contextmanager
+    def slot(self) -> Iterator[openai.OpenAI]:
+        """Hold one of the max_concurrent request slots and yield the sync client."""
+        with self._slots:
+            yield self.client
+
+    @asynccontextmanager
+    async def async_slot(self) -> AsyncIterator[openai.AsyncOpenAI]:
+        """Hold one of the running loop's request slots and yield its async client."""
+        client, slots = self._async_client()
+        async with slots:
+            yield client
+
+    def create_chat_completion(self, **params: Any) -> Any:
+        """Run chat.completions.create on the shared client within the concurrency limit."""
+        with self.slot() as client:
+            return client.chat.completions.create(**params)
+
+    async def acreate_chat_completion(self, **params: Any) -> Any:
+        """Await chat.completions.create on the loop's client within the concurrency limit."""
+        async with self.async_slot() as client:
+            return await client.chat.completions.create(**params)
+
+    async def astream_chat_completion(self, **params: Any) -> AsyncIterator[Any]:
+        """
+        Stream chat completion chunks within the concurrency limit.
+
+        The request slot is held until the stream is exhausted or closed.
+        """
+        async with self.async_slot() as client:
+            stream = await client.chat.completions.create(stream=True, **params)
+            async for chunk in stream:
+                yield chunk
+
+    def close(self) -> None:
+        """Close the synchronous client's connection pool."""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self) -> None:
+        """Close the running event loop's async client."""
+        with self._lock:
+            entry = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if entry is not None:
+            await entry[0].close()
+
+
+_managers: Dict[Optional[str], LLMClientManager] = {}
+_managers_lock = threading.Lock()
+
+
+def get_llm_client_manager(api_key: Optional[str], **kwargs: Any) -> LLMClientManager:
+    """
+    Return the process-wide client manager for an API key.
+
+    The first call for a key creates the manager with the given settings;
+    later calls share it, and with it the connection pool and request slots.
+    """
+    with _managers_lock:
+        manager = _managers.get(api_key)
+        if manager is None:
+            manager = LLMClientManager(api_key, **kwargs)
+            _managers[api_key] = manager
+            logger.info(f"Created LLM client manager (max {manager.max_concurrent} concurrent requests)")
+        return manager
+
+
+def close_all() -> None:
+    """Close every client manager created by get_llm_client_manager."""
+    with _managers_lock:
+        for manager in _managers.values():
+            manager.close()
+        _managers.clear()
@@ -4,6 +4,7 @@ import asyncio
 import logging
 from typing import List, Dict
 from config import Config
+from context_builder import ContextBuilder
 from typing_simulator import TypingSimulator
 from whatsapp_client import WhatsAppMCPClient
 
@@ -19,26 +20,20 @@ class WhatsAppAIAssistant:
     
     def __init__(self):
         self.typing_simulator = TypingSimulator()
+        self.context_builder = ContextBuilder(
+            "You are a helpful AI assistant for WhatsApp. Provide clear, concise, and friendly responses. Keep your responses conversational and appropriate for messaging.",
+            max_context_tokens=Config.LLM_CONTEXT_TOKENS,
+            max_completion_tokens=Config.LLM_MAX_TOKENS
+        )
     
     def create_message_context(self, user_message: str, chat_history: List[str] = None) -> List[Dict[str, str]]:
-        """Create conversation context for GPT."""
-        messages = [
-            {
-                "role": "system",
-                "content": "You are a helpful AI assistant for WhatsApp. Provide clear, concise, and friendly responses. Keep your responses conversational and appropriate for messaging."
-            }
+        """Create conversation context for GPT, keeping as much recent history as fits the token budget."""
+        # History alternates assistant/user turns, starting with the assistant
+        history = [
+            ("assistant" if i % 2 == 0 else "user", msg)
+            for i, msg in enumerate(chat_history or [])
         ]
-        
-        # Add chat history if available
-        if chat_history:
-            for i, msg in enumerate(chat_history[-10:]):  # Last 10 messages for context
-                role = "assistant" if i % 2 == 0 else "user"
-                messages.append({"role": role, "content": msg})
-        
-        # Add current user message
-        messages.append({"role": "user", "content": user_message})
-        
-        return messages
+        return self.context_builder.build(history, user_message)
     
     async def handle_message(
         self, 
@@ -191,12 +186,25 @@ def main():
 
 if __name__ == "__main__":
     main()
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
 from contextlib import asynccontextmanager
+from typing import Optional
+import hmac
 import logging
+import os
+import fast_json
 from datetime import datetime
 from models import MessagePayload, StoredMessage
-from database import init_database, store_message, get_messages_by_chat, get_message_count
+from database import decode_cursor
+import async_database
+from async_database import (
+    enable_sharding, init_database, store_message, get_message_records, iter_messages_by_chat,
+    get_chat_stats, list_chats, search_messages, enable_write_behind, disable_write_behind,
+    enable_archiving, disable_archiving, enable_retention, disable_retention,
+    enable_backups, disable_backups, trigger_backup, backup_status
+)
+from retention import parse_chat_policies
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -207,9 +215,47 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Initialize database on startup"""
     logger.info("Starting WhatsApp AI Assistant webhook listener...")
-    init_database()
+    # SQLite calls run on these executors so they never block the event loop
+    async_database.start(read_workers=int(os.getenv("DB_READ_WORKERS", "4")))
+    await enable_sharding(int(os.getenv("DB_SHARDS", "1")))
+    await init_database()
+    if os.getenv("WRITE_BEHIND", "False").lower() == "true":
+        await enable_write_behind(
+            max_batch=int(os.getenv("WRITE_BEHIND_BATCH", "500")),
+            flush_interval_ms=int(os.getenv("WRITE_BEHIND_INTERVAL_MS", "50"))
+        )
+    archive_after_days = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+    if archive_after_days > 0:
+        await enable_archiving(
+            os.getenv("ARCHIVE_DIR", "archive"),
+            max_age_days=archive_after_days,
+            interval_seconds=float(os.getenv("ARCHIVE_INTERVAL_HOURS", "24")) * 3600
+        )
+    retention_max_age = float(os.getenv("RETENTION_MAX_AGE_DAYS", "0"))
+    retention_max_rows = int(os.getenv("RETENTION_MAX_ROWS_PER_CHAT", "0"))
+    retention_chats = parse_chat_policies(os.getenv("RETENTION_CHAT_POLICIES"))
+    if retention_max_age > 0 or retention_max_rows > 0 or retention_chats:
+        await enable_retention(
+            max_age_days=retention_max_age or None,
+            max_rows_per_chat=retention_max_rows or None,
+            chat_policies=retention_chats,
+            interval_seconds=float(os.getenv("RETENTION_INTERVAL_HOURS", "1")) * 3600
+        )
+    backup_dir = os.getenv("BACKUP_DIR")
+    if backup_dir:
+        await enable_backups(
+            backup_dir,
+            interval_seconds=float(os.getenv("BACKUP_INTERVAL_HOURS", "24")) * 3600,
+            keep=int(os.getenv("BACKUP_KEEP", "7")),
+            pages_per_step=int(os.getenv("BACKUP_PAGES_PER_STEP", "256"))
+        )
     yield
     logger.info("Shutting down...")
+    await disable_backups()
+    await disable_retention()
+    await disable_archiving()
+    await disable_write_behind()
+    async_database.shutdown()
 
 
 app = FastAPI(
@@ -231,19 +277,70 @@ async def root():
 
 
 @app.get("/stats")
-async def get_stats():
-    """Get basic statistics about stored messages"""
+async def get_stats(limit: int = 100):
+    """Get message totals and per-chat breakdowns (up to `limit` most recently active chats)"""
     try:
-        total_messages = get_message_count()
+        if limit < 0 or limit > 1000:
+            raise HTTPException(status_code=400, detail="Limit must be between 0 and 1000")
+        
+        stats = await get_chat_stats(limit)
         return {
-            "total_messages": total_messages,
+            **stats,
             "timestamp": datetime.now().isoformat()
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
+@app.get("/chats")
+async def get_chats(active_since: Optional[datetime] = None, limit: int = 100):
+    """List chats most recently active first, optionally only those active since an ISO 8601 time"""
+    try:
+        if limit < 1 or limit > 1000:
+            raise HTTPException(status_code=400, detail="Limit must be between 1 and 1000")
+        
+        chats = await list_chats(active_since, limit)
+        return {
+            "chats": chats,
+            "count": len(chats),
+            "active_since": active_since.isoformat() if active_since else None,
+            "timestamp": datetime.now().isoformat()
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing chats: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+def require_admin(token: Optional[str]) -> None:
+    """Reject admin requests unless ADMIN_TOKEN is set and matches the X-Admin-Token header"""
+    admin_token = os.getenv("ADMIN_TOKEN")
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN")
+    if not token or not hmac.compare_digest(token, admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@app.post("/admin/backup", status_code=202)
+async def start_backup(x_admin_token: Optional[str] = Header(None)):
+    """Start an online backup of the message database; poll GET /admin/backup for the result"""
+    require_admin(x_admin_token)
+    if not trigger_backup():
+        raise HTTPException(status_code=409, detail="Backups are not enabled; set BACKUP_DIR")
+    return {"status": "started", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/admin/backup")
+async def get_backup_status(x_admin_token: Optional[str] = Header(None)):
+    """Describe the last backup and the snapshots kept of each database file"""
+    require_admin(x_admin_token)
+    return {"databases": backup_status(), "timestamp": datetime.now().isoformat()}
+
+
 @app.post("/webhook/message")
 async def receive_message(request: Request):
     """
@@ -291,8 +388,17 @@ async def receive_message(request: Request):
         # Create and validate message payload
         message = MessagePayload(**message_data)
         
-        # Store message to database
-        message_id = store_message(message)
+        # Store message to database (awaiting the group commit when write-behind is on).
+        # MCP retries and tunnel replays resolve to None and stop here.
+        message_id = await store_message(message)
+        if message_id is None:
+            logger.info(f"Ignoring duplicate message {message.message_id} in chat {message.chat_id}")
+            return {
+                "status": "duplicate",
+                "message": "Message already received",
+                "message_id": None,
+                "timestamp": datetime.now().isoformat()
+            }
         
         logger.info(f"Successfully processed message from {message.sender_id} in chat {message.chat_id}")
         
@@ -312,23 +418,72 @@ async def receive_message(request: Request):
 
 
 @app.get("/messages/{chat_id}")
-async def get_chat_messages(chat_id: str, limit: int = 50):
-    """Get messages for a specific chat ID"""
+async def get_chat_messages(chat_id: str, limit: Optional[int] = None,
+                            cursor: Optional[str] = None, format: str = "json"):
+    """
+    Get messages for a specific chat ID, newest first
+    
+    Pass the returned next_cursor as ?cursor= to fetch the next older page.
+    With ?format=ndjson the whole history older than the cursor (or up to
+    ?limit rows) is streamed as one JSON object per line.
+    """
     try:
+        if format not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail="Format must be json or ndjson")
+        if cursor:
+            try:
+                decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+        
+        if format == "ndjson":
+            if limit is not None and limit < 1:
+                raise HTTPException(status_code=400, detail="Limit must be positive")
+            lines = (fast_json.dumps(row) + b"\n" async for row in iter_messages_by_chat(chat_id, cursor, limit))
+            return StreamingResponse(lines, media_type="application/x-ndjson")
+        
+        if limit is None:
+            limit = 50
         if limit < 1 or limit > 1000:
             raise HTTPException(status_code=400, detail="Limit must be between 1 and 1000")
         
-        messages = get_messages_by_chat(chat_id, limit)
+        # Rows go straight from SQLite to JSON bytes, skipping model validation
+        records, next_cursor = await get_message_records(chat_id, limit, cursor)
+        return Response(content=fast_json.dumps({
+            "chat_id": chat_id,
+            "messages": [record.to_dict() for record in records],
+            "count": len(records),
+            "next_cursor": next_cursor,
+            "timestamp": datetime.now().isoformat()
+        }), media_type="application/json")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving messages for chat {chat_id}: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@app.get("/search")
+async def search(q: str, chat_id: Optional[str] = None, limit: int = 20):
+    """Full-text search over stored messages, best (BM25) matches first"""
+    try:
+        if not q.strip():
+            raise HTTPException(status_code=400, detail="Query must not be empty")
+        if limit < 1 or limit > 100:
+            raise HTTPException(status_code=400, detail="Limit must be between 1 and 100")
+        
+        results = await search_messages(q, chat_id, limit)
         return {
+            "query": q,
             "chat_id": chat_id,
-            "messages": messages,
-            "count": len(messages),
+            "results": results,
+            "count": len(results),
             "timestamp": datetime.now().isoformat()
         }
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error retrieving messages for chat {chat_id}: {e}")
+        logger.error(f"Error searching messages for '{q}': {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
 
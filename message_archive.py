@@ -0,0 +1,330 @@
+"""
+Time-partitioned archive tiering for old messages.
+
+MessageArchiver moves messages older than max_age_days out of the hot
+messages table into one SQLite file per calendar month
+(archive_dir/messages-YYYY-MM.db). The hot table, its indexes and the main
+database file then stay proportional to the retention window rather than to
+the lifetime of the deployment.
+
+History queries that run past the start of the hot table continue into the
+archive files, newest month first, opening each one read-only only when it
+is needed.
+
+Archiving deletes from the hot table, so trigger-maintained data on it
+(chat_stats counters, the messages_fts search index) describes hot messages
+only. The archiver only relies on the id, chat_id, timestamp and
+timestamp_ms columns of the messages table: expired rows are found with a
+range scan of timestamp_ms, and files are split by the month in the ISO-8601
+timestamp text. Columns later
+added to or renamed in the hot table (see schema.py) are brought over to
+archive files as they are written to, or by upgrade().
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from epoch_ms import epoch_ms_sql, to_epoch_ms
+from message_bodies import content_sql
+from schema import RENAMED_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+_ARCHIVE_FILE_RE = re.compile(r"^messages-(\d{4}-\d{2})\.db$")
+
+
+class MessageArchiver:
+    """Moves old messages into per-month archive files and reads them back."""
+
+    def __init__(self, db_path: str, archive_dir: str, max_age_days: int = 90, batch_size: int = 1000,
+                 order_column: str = "timestamp"):
+        """
+        Initialize the archiver.
+
+        Args:
+            db_path: Path to the database holding the hot messages table
+            archive_dir: Directory for the per-month archive files
+            max_age_days: Messages from days older than this are archived
+            batch_size: Rows moved per transaction, which bounds how long
+                writers on the hot database are blocked
+            order_column: Column history reads are ordered and keyed by,
+                'timestamp' or the integer 'timestamp_ms'
+        """
+        self.db_path = db_path
+        self.archive_dir = archive_dir
+        self.max_age_days = max_age_days
+        self.batch_size = batch_size
+        self.order_column = order_column
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def archive_path(self, month: str) -> str:
+        """Return the archive file for a 'YYYY-MM' month."""
+        return os.path.join(self.archive_dir, f"messages-{month}.db")
+
+    def list_months(self) -> List[str]:
+        """Return the months that have archive files, newest first."""
+        if not os.path.isdir(self.archive_dir):
+            return []
+        months = []
+        for name in os.listdir(self.archive_dir):
+            match = _ARCHIVE_FILE_RE.match(name)
+            if match:
+                months.append(match.group(1))
+        return sorted(months, reverse=True)
+
+    def archive(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Move messages from before the cutoff day into their month's archive.
+
+        Each batch is copied and deleted in its own short transaction. The
+        copy ignores rows already present in the archive, so rerunning after
+        an interruption never duplicates or loses messages.
+
+        Returns:
+            Number of messages moved per 'YYYY-MM' month
+        """
+        now = now or datetime.now()
+        cutoff = (now - timedelta(days=self.max_age_days)).strftime("%Y-%m-%d")
+        cutoff_ms = to_epoch_ms(datetime.strptime(cutoff, "%Y-%m-%d"))
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        moved: Dict[str, int] = {}
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            while not self._stop.is_set():
+                # Range scan of idx_messages_timestamp_ms; moved rows are deleted,
+                # so every batch starts at the oldest message left
+                rows = conn.execute(
+                    "SELECT id, substr(timestamp, 1, 7) FROM messages "
+                    "WHERE timestamp_ms < ? ORDER BY timestamp_ms LIMIT ?",
+                    (cutoff_ms, self.batch_size)
+                ).fetchall()
+                if not rows:
+                    break
+
+                by_month: Dict[str, List[int]] = {}
+                for row_id, month in rows:
+                    by_month.setdefault(month, []).append(row_id)
+                for month, ids in by_month.items():
+                    self._move(conn, month, ids)
+                    moved[month] = moved.get(month, 0) + len(ids)
+        finally:
+            conn.close()
+
+        if moved:
+            logger.info(f"Archived {sum(moved.values())} messages older than {cutoff}: {moved}")
+        return moved
+
+    def upgrade(self) -> None:
+        """Add hot-table columns missing from existing archive files, e.g. timestamp_ms."""
+        if not self.list_months():
+            return
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            for month in self.list_months():
+                conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path(month),))
+                try:
+                    self._prepare_archive(conn)
+                finally:
+                    conn.execute("DETACH DATABASE archive")
+        finally:
+            conn.close()
+
+    def _prepare_archive(self, conn: sqlite3.Connection) -> List[str]:
+        """
+        Create or align the attached archive's messages table with the hot one.
+
+        Returns:
+            The hot table's column names, in order
+        """
+        conn.execute("CREATE TABLE IF NOT EXISTS archive.messages AS SELECT * FROM main.messages WHERE 0")
+        columns = [(row[1], row[2]) for row in conn.execute("PRAGMA main.table_info(messages)")]
+        archived = {row[1] for row in conn.execute("PRAGMA archive.table_info(messages)")}
+        for old, new in RENAMED_COLUMNS.items():
+            # Files archived before the schemas were unified (see schema.py)
+            if old in archived and new not in archived:
+                conn.execute(f"ALTER TABLE archive.messages RENAME COLUMN {old} TO {new}")
+                archived = (archived - {old}) | {new}
+        for name, column_type in columns:
+            if name not in archived:
+                conn.execute(f"ALTER TABLE archive.messages ADD COLUMN {name} {column_type}")
+                if name == "timestamp_ms":
+                    conn.execute(f"UPDATE archive.messages SET timestamp_ms = {epoch_ms_sql('timestamp')}")
+
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_archive_id ON messages(id)")
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS archive.idx_archive_chat_{self.order_column} "
+            f"ON messages(chat_id, {self.order_column} DESC, id DESC)"
+        )
+        if self.order_column != "timestamp_ms" and any(name == "timestamp_ms" for name, _ in columns):
+            # Time-window reads (iter_range) are keyed by timestamp_ms
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS archive.idx_archive_chat_timestamp_ms "
+                "ON messages(chat_id, timestamp_ms DESC, id DESC)"
+            )
+        return [name for name, _ in columns]
+
+    def _move(self, conn: sqlite3.Connection, month: str, ids: List[int]) -> None:
+        """Copy rows into a month's archive file and delete them from the hot table."""
+        conn.execute("ATTACH DATABASE ? AS archive", (self.archive_path(month),))
+        try:
+            columns = self._prepare_archive(conn)
+            column_list = ", ".join(columns)
+            if "body_id" in columns:
+                # Archive files have no message_bodies table; copy shared text inline
+                select_list = ", ".join(
+                    content_sql() if name == "content" else "NULL" if name == "body_id" else name
+                    for name in columns
+                )
+            else:
+                select_list = column_list
+
+            placeholders = ",".join("?" * len(ids))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    f"INSERT OR IGNORE INTO archive.messages ({column_list}) "
+                    f"SELECT {select_list} FROM main.messages WHERE id IN ({placeholders})",
+                    ids
+                )
+                conn.execute(f"DELETE FROM main.messages WHERE id IN ({placeholders})", ids)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.execute("DETACH DATABASE archive")
+
+    def iter_history(
+        self,
+        chat_id: str,
+        before: Optional[Tuple[Any, int]] = None,
+        columns: str = "*",
+    ) -> Iterator[Sequence[Any]]:
+        """
+        Yield a chat's archived messages newest first.
+
+        Args:
+            chat_id: Chat to read
+            before: Optional (order_column value, id) keyset cursor; only
+                older rows are yielded
+            columns: Column list to select
+
+        Yields:
+            Row tuples in the requested column order
+        """
+        before_month = self._cursor_month(before[0]) if before is not None else None
+        for month in self.list_months():
+            if before_month is not None and month > before_month:
+                continue
+
+            conn = sqlite3.connect(f"file:{self.archive_path(month)}?mode=ro", uri=True)
+            try:
+                sql = f"SELECT {columns} FROM messages WHERE chat_id = ?"
+                params: tuple = (chat_id,)
+                if before is not None:
+                    sql += f" AND ({self.order_column}, id) < (?, ?)"
+                    params += (before[0], before[1])
+                sql += f" ORDER BY {self.order_column} DESC, id DESC"
+                for row in conn.execute(sql, params):
+                    yield row
+            finally:
+                conn.close()
+
+    def iter_range(
+        self,
+        chat_id: str,
+        since_ms: int,
+        until_ms: int,
+        columns: str = "*",
+    ) -> Iterator[Sequence[Any]]:
+        """
+        Yield a chat's archived messages in [since_ms, until_ms) newest first.
+
+        Only the monthly files that can overlap the window are opened.
+
+        Args:
+            chat_id: Chat to read
+            since_ms: Start of the window, epoch milliseconds (inclusive)
+            until_ms: End of the window, epoch milliseconds (exclusive)
+            columns: Column list to select
+
+        Yields:
+            Row tuples in the requested column order
+        """
+        newest = self._cursor_month(until_ms)
+        # Same day of slack as _cursor_month, in the other direction
+        oldest = datetime.fromtimestamp(since_ms / 1000 - 86400, tz=timezone.utc).strftime("%Y-%m")
+        for month in self.list_months():
+            if month > newest:
+                continue
+            if month < oldest:
+                break
+
+            conn = sqlite3.connect(f"file:{self.archive_path(month)}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(
+                    f"SELECT {columns} FROM messages WHERE chat_id = ? "
+                    f"AND timestamp_ms >= ? AND timestamp_ms < ? ORDER BY timestamp_ms DESC, id DESC",
+                    (chat_id, since_ms, until_ms)
+                )
+                for row in rows:
+                    yield row
+            finally:
+                conn.close()
+
+    def _cursor_month(self, value: Any) -> str:
+        """Return the newest archive month that can hold rows older than a cursor value."""
+        if isinstance(value, int):
+            # Files are split by the local date in the timestamp text; a day of
+            # slack covers any UTC offset
+            moment = datetime.fromtimestamp(value / 1000 + 86400, tz=timezone.utc)
+            return moment.strftime("%Y-%m")
+        return str(value)[:7]
+
+    def query_history(
+        self,
+        chat_id: str,
+        limit: int,
+        before: Optional[Tuple[Any, int]] = None,
+        columns: str = "*",
+    ) -> List[Sequence[Any]]:
+        """Return up to `limit` archived messages of a chat, newest first."""
+        rows: List[Sequence[Any]] = []
+        if limit <= 0:
+            return rows
+        for row in self.iter_history(chat_id, before, columns):
+            rows.append(row)
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def start(self, interval_seconds: float = 3600) -> None:
+        """Run archive() in a background thread every interval_seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.archive()
+                except Exception as e:
+                    logger.error(f"Error archiving messages: {e}")
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=run, name="message-archiver", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread started by start()."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,151 @@
+"""
+Content-addressed storage of repeated message bodies.
+
+Bot replies repeat verbatim: the help text, "AI service not configured",
+error replies. Stored inline, every copy costs table pages and page cache.
+message_bodies keeps one row per distinct body, keyed by its SHA-256; a
+messages row whose body repeats stores an empty content and points at the
+body through body_id. Triggers keep a reference count per body and delete a
+body together with its last referencing message (retention, chat deletion).
+
+BodyInterner decides which bodies to share. A body is interned the second
+time it is seen, so one-off replies stay inline and cost nothing extra;
+short bodies are never interned, since a reference would save little.
+
+Readers select content_sql() instead of the content column to get the text
+back. The full-text index only covers inline content, so shared bodies are
+not searchable. MessageArchiver copies the resolved text into archive
+files, which have no message_bodies table.
+"""
+
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from connection_manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIN_BYTES = 32
+DEFAULT_REMEMBER = 10_000
+
+
+def install(conn: sqlite3.Connection) -> None:
+    """
+    Create the message_bodies table, the messages.body_id column and the
+    reference-counting triggers. The caller commits.
+
+    Args:
+        conn: Open connection to the database holding the messages table
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS message_bodies (
+            id INTEGER PRIMARY KEY,
+            hash BLOB NOT NULL UNIQUE,
+            content TEXT NOT NULL,
+            ref_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+    if "body_id" not in columns:
+        conn.execute("ALTER TABLE messages ADD COLUMN body_id INTEGER")
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_body_insert
+        AFTER INSERT ON messages WHEN NEW.body_id IS NOT NULL
+        BEGIN
+            UPDATE message_bodies SET ref_count = ref_count + 1 WHERE id = NEW.body_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_body_delete
+        AFTER DELETE ON messages WHEN OLD.body_id IS NOT NULL
+        BEGIN
+            UPDATE message_bodies SET ref_count = ref_count - 1 WHERE id = OLD.body_id;
+            DELETE FROM message_bodies WHERE id = OLD.body_id AND ref_count <= 0;
+        END
+    """)
+
+
+def content_sql(alias: str = "") -> str:
+    """Return the SQL expression selecting a message's text, shared or inline."""
+    prefix = f"{alias}." if alias else ""
+    return (
+        f"CASE WHEN {prefix}body_id IS NULL THEN {prefix}content "
+        f"ELSE (SELECT b.content FROM message_bodies b WHERE b.id = {prefix}body_id) END"
+    )
+
+
+def insert_values_sql(content_param: str, body_param: str) -> str:
+    """
+    Return the content and body_id VALUES expressions for an INSERT.
+
+    The content parameter always carries the full text. If the referenced
+    body was deleted after it was interned (its last reference went in the
+    meantime), the message is stored inline instead of pointing nowhere.
+    """
+    exists = f"EXISTS (SELECT 1 FROM message_bodies WHERE id = {body_param})"
+    return f"CASE WHEN {exists} THEN '' ELSE {content_param} END, CASE WHEN {exists} THEN {body_param} END"
+
+
+def body_hash(content: str) -> bytes:
+    """Return the key a body is stored under."""
+    return hashlib.sha256(content.encode("utf-8")).digest()
+
+
+class BodyInterner:
+    """Shares the bodies of repeated messages in one database file."""
+
+    def __init__(self, manager: ConnectionManager, min_bytes: int = DEFAULT_MIN_BYTES,
+                 remember: int = DEFAULT_REMEMBER):
+        """
+        Initialize the interner.
+
+        Args:
+            manager: Connection manager of the database holding message_bodies
+            min_bytes: Bodies shorter than this (UTF-8) are always stored inline
+            remember: Number of recent once-seen body hashes kept in memory
+        """
+        self.manager = manager
+        self.min_bytes = min_bytes
+        self.remember = remember
+        self._seen: "OrderedDict[bytes, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def intern(self, content: str) -> Optional[int]:
+        """
+        Return the body_id to store a message under, or None to store it inline.
+
+        Args:
+            content: The message text
+
+        Returns:
+            The message_bodies id of the text, if it repeats
+        """
+        if len(content.encode("utf-8")) < self.min_bytes:
+            return None
+        digest = body_hash(content)
+        with self.manager.reader() as conn:
+            row = conn.execute("SELECT id FROM message_bodies WHERE hash = ?", (digest,)).fetchone()
+        if row:
+            return row[0]
+
+        with self._lock:
+            if digest not in self._seen:
+                self._seen[digest] = None
+                if len(self._seen) > self.remember:
+                    self._seen.popitem(last=False)
+                return None
+            del self._seen[digest]
+
+        with self.manager.writer() as conn:
+            conn.execute(
+                "INSERT INTO message_bodies (hash, content) VALUES (?, ?) ON CONFLICT(hash) DO NOTHING",
+                (digest, content)
+            )
+            body_id = conn.execute("SELECT id FROM message_bodies WHERE hash = ?", (digest,)).fetchone()[0]
+        logger.info(f"Interned repeated message body {body_id} ({len(content)} chars)")
+        return body_id
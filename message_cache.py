@@ -0,0 +1,193 @@
+"""
+In-memory cache of the most recent messages per chat.
+
+Every AI reply reads the chat's recent history. RecentMessageCache keeps the
+newest messages of each active chat in a bounded ring buffer so those reads
+never touch SQLite:
+
+- store paths append to the buffer (write-through) for chats already cached,
+  inside writing() so a warm-up overlapping the write is discarded rather
+  than installed next to the appended copy of the same message
+- a read miss is warmed from SQLite once, then served from memory
+- chats are evicted least-recently-used first once the approximate memory
+  held by all buffers exceeds max_bytes
+"""
+
+import logging
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PER_CHAT = 50
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Rough fixed cost of one cached message dict on top of its strings
+_MESSAGE_OVERHEAD_BYTES = 400
+
+
+def _message_size(message: Dict[str, Any]) -> int:
+    """Approximate the memory held by one cached message."""
+    return _MESSAGE_OVERHEAD_BYTES + sum(len(v) for v in message.values() if isinstance(v, str))
+
+
+class _ChatBuffer:
+    """Ring buffer of one chat's newest messages, oldest first."""
+
+    __slots__ = ("messages", "complete", "size")
+
+    def __init__(self, per_chat: int, messages: List[Dict[str, Any]], complete: bool):
+        self.messages: Deque[Dict[str, Any]] = deque(messages[-per_chat:], maxlen=per_chat)
+        # True when the buffer holds the chat's entire history
+        self.complete = complete and len(messages) <= per_chat
+        self.size = sum(_message_size(m) for m in self.messages)
+
+
+class RecentMessageCache:
+    """LRU collection of per-chat ring buffers with a global memory cap."""
+
+    def __init__(self, per_chat: int = DEFAULT_PER_CHAT, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Initialize the cache.
+
+        Args:
+            per_chat: Number of newest messages kept for each chat
+            max_bytes: Approximate memory budget across all chats
+        """
+        self.per_chat = per_chat
+        self.max_bytes = max_bytes
+        self._chats: "OrderedDict[str, _ChatBuffer]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # chat_id -> [warms in flight, written to since the warm started]
+        self._warming: Dict[str, List[Any]] = {}
+        # chat_id -> stores between the database write and the append
+        self._writing: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, chat_id: str, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """
+        Return the newest `limit` messages of a chat, oldest first.
+
+        Returns None on a miss: the chat is not cached, or more messages were
+        asked for than the buffer can prove it holds.
+        """
+        with self._lock:
+            buffer = self._chats.get(chat_id)
+            if buffer is None or (limit > len(buffer.messages) and not buffer.complete):
+                self.misses += 1
+                return None
+            self._chats.move_to_end(chat_id)
+            self.hits += 1
+            messages = list(buffer.messages)
+        return messages[-limit:] if limit > 0 else []
+
+    def append(self, chat_id: str, message: Dict[str, Any]) -> None:
+        """Record a newly stored message; uncached chats are left to warm on read."""
+        with self._lock:
+            buffer = self._chats.get(chat_id)
+            if buffer is None:
+                warming = self._warming.get(chat_id)
+                if warming is not None:
+                    warming[1] = True
+                return
+
+            if len(buffer.messages) == buffer.messages.maxlen:
+                evicted = buffer.messages[0]
+                buffer.size -= _message_size(evicted)
+                self._bytes -= _message_size(evicted)
+                buffer.complete = False
+            buffer.messages.append(message)
+            size = _message_size(message)
+            buffer.size += size
+            self._bytes += size
+            self._chats.move_to_end(chat_id)
+            self._evict()
+
+    @contextmanager
+    def writing(self, chat_id: str) -> Iterator[None]:
+        """
+        Bracket storing a message: the database write, then append().
+
+        A warm-up finishing inside the bracket may already have read the
+        new row, so it is discarded instead of installed.
+        """
+        with self._lock:
+            self._writing[chat_id] = self._writing.get(chat_id, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._writing[chat_id] -= 1
+                if not self._writing[chat_id]:
+                    del self._writing[chat_id]
+
+    def begin_warm(self, chat_id: str) -> None:
+        """Mark that a warm-up read for a chat is about to hit the database."""
+        with self._lock:
+            warming = self._warming.setdefault(chat_id, [0, False])
+            warming[0] += 1
+
+    def finish_warm(self, chat_id: str, messages: List[Dict[str, Any]], complete: bool) -> None:
+        """
+        Install messages read from the database after begin_warm().
+
+        The result is discarded if the chat was written to while the read
+        was in flight, or a write is still in progress, since it may be
+        missing that message or hold it before append() adds it again.
+
+        Args:
+            chat_id: Chat that was read
+            messages: Newest messages of the chat, oldest first
+            complete: True if the chat has no messages older than these
+        """
+        with self._lock:
+            warming = self._warming.get(chat_id)
+            stale = (warming is not None and warming[1]) or chat_id in self._writing
+            if warming is not None:
+                warming[0] -= 1
+                if warming[0] <= 0:
+                    del self._warming[chat_id]
+            if stale or chat_id in self._chats:
+                return
+
+            buffer = _ChatBuffer(self.per_chat, messages, complete)
+            self._chats[chat_id] = buffer
+            self._bytes += buffer.size
+            self._evict()
+
+    def invalidate(self, chat_id: str) -> None:
+        """Drop a chat's buffer, e.g. after its messages were deleted; warm-ups in flight are discarded."""
+        with self._lock:
+            warming = self._warming.get(chat_id)
+            if warming is not None:
+                warming[1] = True
+            buffer = self._chats.pop(chat_id, None)
+            if buffer is not None:
+                self._bytes -= buffer.size
+
+    def clear(self) -> None:
+        """Drop every cached chat."""
+        with self._lock:
+            self._chats.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache occupancy and hit/miss counters."""
+        with self._lock:
+            return {
+                "chats": len(self._chats),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict(self) -> None:
+        """Evict least-recently-used chats until under the memory cap. Caller holds the lock."""
+        while self._bytes > self.max_bytes and len(self._chats) > 1:
+            chat_id, buffer = self._chats.popitem(last=False)
+            self._bytes -= buffer.size
+            logger.debug(f"Evicted chat {chat_id} from message cache")
@@ -3,11 +3,14 @@
 import re
 import time
 import logging
-from typing import Optional, Dict, Any, List
+from datetime import datetime, timezone
+from typing import Callable, Optional, Dict, Any, List
 from dataclasses import dataclass
 
 from config import config
 from responses import PredefinedResponses
+from chat_history import ChatHistoryDB
+from rolling_summary import RollingSummarizer
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -32,9 +35,23 @@ class TriggerResponse:
 class MessageHandler:
     """Handles incoming messages and generates appropriate responses."""
     
-    def __init__(self):
-        """Initialize the message handler."""
+    def __init__(self, history: Optional[ChatHistoryDB] = None,
+                 generate: Optional[Callable[[str], str]] = None):
+        """
+        Initialize the message handler.
+        
+        Args:
+            history: Chat history to summarize; summaries are placeholders without it
+            generate: Sends a prompt to the model and returns its reply
+                (raising on failure); summaries are placeholders without it
+        """
         self.predefined_responses = PredefinedResponses()
+        self.history = history
+        self.summarizer = RollingSummarizer(
+            generate,
+            max_new_messages=config.MAX_SUMMARY_MESSAGES,
+            is_command=lambda text: self.detect_trigger(text) == "summary"
+        ) if history is not None and generate is not None else None
         
     def detect_trigger(self, message_content: str) -> Optional[str]:
         """
@@ -99,7 +116,11 @@ class MessageHandler:
     
     def generate_summary_response(self, message: Message) -> TriggerResponse:
         """
-        Generate a summary response (placeholder for GPT integration).
+        Generate a summary response.
+        
+        With a history and model configured, the chat's rolling summary is
+        brought up to date with the messages since the last summary (see
+        rolling_summary.py). Otherwise a placeholder is returned.
         
         Args:
             message: The incoming message
@@ -109,7 +130,23 @@ class MessageHandler:
         """
         logger.info(f"Generating summary response for chat {message.chat_id}")
         
-        # For now, return a placeholder response
+        if self.summarizer is not None:
+            try:
+                summary = self.history.summarize_chat(message.chat_id, self.summarizer)
+            except Exception as e:
+                logger.error(f"Error summarizing chat {message.chat_id}: {e}")
+                return TriggerResponse(
+                    response_text=PredefinedResponses.get_error_response(),
+                    requires_gpt=True,
+                    response_type="summary"
+                )
+            return TriggerResponse(
+                response_text=f"📊 **Chat Summary**\n\n{summary or 'No messages to summarize yet.'}",
+                requires_gpt=True,
+                response_type="summary"
+            )
+        
+        # Without a history and model, return a placeholder response
         # In a full implementation, this would:
         # 1. Fetch recent messages from database
         # 2. Send to GPT for summarization
@@ -190,9 +227,16 @@ To enable full functionality, configure:
 class AutoReplyBot:
     """Main bot class that orchestrates auto-reply functionality."""
     
-    def __init__(self):
-        """Initialize the auto-reply bot."""
-        self.message_handler = MessageHandler()
+    def __init__(self, history: Optional[ChatHistoryDB] = None,
+                 generate: Optional[Callable[[str], str]] = None):
+        """
+        Initialize the auto-reply bot.
+        
+        Args:
+            history: Stores incoming messages so summaries can cover them
+            generate: Sends a prompt to the model and returns its reply
+        """
+        self.message_handler = MessageHandler(history, generate)
         
     def handle_incoming_message(self, message_data: Dict[str, Any]) -> Optional[str]:
         """
@@ -224,6 +268,13 @@ class AutoReplyBot:
                 logger.warning("Message has no content, skipping")
                 return None
             
+            if self.message_handler.history is not None:
+                self.message_handler.history.store_message(
+                    message.chat_id, message.sender_id,
+                    datetime.fromtimestamp(message.timestamp, tz=timezone.utc).isoformat(),
+                    message.content
+                )
+            
             # Check if we should respond to this message
             if not self.message_handler.should_respond_to_message(message):
                 return None
@@ -0,0 +1,149 @@
+"""
+Full-text search over stored messages with SQLite FTS5.
+
+install() adds an external-content FTS5 index (messages_fts) over the text
+column of a messages table plus triggers that keep it in sync on insert,
+update and delete. Since the index references messages by rowid, message
+text is not stored twice. search() returns BM25-ranked matches with a
+highlighted snippet.
+
+The storage modules use different column names, so both install() and
+search() take the text and sender columns to use.
+"""
+
+import re
+import sqlite3
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def is_available(conn: sqlite3.Connection) -> bool:
+    """Return True if the SQLite library was compiled with FTS5."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def install(conn: sqlite3.Connection, text_column: str = "content") -> bool:
+    """
+    Create the messages_fts index and its sync triggers.
+
+    The index is built from existing messages the first time it is created.
+
+    Args:
+        conn: Open connection to the database holding the messages table
+        text_column: Column of messages to index
+
+    Returns:
+        bool: False if FTS5 is not available in this SQLite build
+    """
+    if not is_available(conn):
+        logger.warning("SQLite FTS5 extension not available; message search disabled")
+        return False
+
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    ).fetchone()
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts
+        USING fts5({text_column}, content='messages', content_rowid='id')
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_insert AFTER INSERT ON messages
+        BEGIN
+            INSERT INTO messages_fts(rowid, {text_column}) VALUES (NEW.id, NEW.{text_column});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_delete AFTER DELETE ON messages
+        BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, {text_column})
+            VALUES ('delete', OLD.id, OLD.{text_column});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_fts_update AFTER UPDATE OF {text_column} ON messages
+        BEGIN
+            INSERT INTO messages_fts(messages_fts, rowid, {text_column})
+            VALUES ('delete', OLD.id, OLD.{text_column});
+            INSERT INTO messages_fts(rowid, {text_column}) VALUES (NEW.id, NEW.{text_column});
+        END
+    """)
+
+    if not exists:
+        conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+        logger.info("Built full-text index over existing messages")
+    return True
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    """Rebuild messages_fts from the messages table, if it is installed."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages_fts'"
+    ).fetchone()
+    if exists:
+        conn.execute("INSERT INTO messages_fts(messages_fts) VALUES ('rebuild')")
+
+
+def to_match_query(text: str) -> str:
+    """
+    Turn free-form user input into a safe FTS5 MATCH expression.
+
+    Every word becomes a quoted term and all terms must match, so operators
+    and punctuation in user input can never cause a query syntax error.
+    """
+    return " ".join(f'"{token}"' for token in _TOKEN_RE.findall(text))
+
+
+def search(
+    conn: sqlite3.Connection,
+    query: str,
+    chat_id: Optional[str] = None,
+    limit: int = 20,
+    text_column: str = "content",
+    sender_column: str = "sender",
+) -> List[Dict[str, Any]]:
+    """
+    Search message text, best matches first.
+
+    Args:
+        conn: Open connection to a database with messages_fts installed
+        query: Free-form search text
+        chat_id: Restrict results to one chat
+        limit: Maximum number of results
+        text_column: Indexed text column of messages
+        sender_column: Column of messages to return as sender
+
+    Returns:
+        List of dicts with id, chat_id, sender, timestamp, snippet and score
+        (BM25; lower is more relevant)
+    """
+    match = to_match_query(query)
+    if not match:
+        return []
+
+    sql = f"""
+        SELECT m.id, m.chat_id, m.{sender_column}, m.timestamp,
+               snippet(messages_fts, 0, '[', ']', '...', 12),
+               bm25(messages_fts) AS score
+        FROM messages_fts
+        JOIN messages m ON m.id = messages_fts.rowid
+        WHERE messages_fts MATCH ?
+    """
+    params: tuple = (match,)
+    if chat_id is not None:
+        sql += " AND m.chat_id = ?"
+        params += (chat_id,)
+    sql += " ORDER BY score LIMIT ?"
+    params += (limit,)
+
+    columns = ["id", "chat_id", "sender", "timestamp", "snippet", "score"]
+    return [dict(zip(columns, row)) for row in conn.execute(sql, params)]
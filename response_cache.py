@@ -0,0 +1,278 @@
+"""
+Cache of LLM responses keyed by normalised prompts.
+
+Greetings, "what can you do" and other FAQ-style questions reach the model
+over and over with the same prompt. ResponseCache answers repeats from
+memory instead of making an API round-trip:
+
+- keys hash the model, generation parameters and every prompt message
+  (system prompt, context window and user message) after normalisation:
+  case, surrounding whitespace and punctuation, and runs of whitespace are
+  ignored, so "Hello!" and "hello" share an entry
+- entries expire after ttl_seconds; the memory tier keeps at most
+  max_entries, evicting least-recently-used first
+- an optional SQLite file adds a larger, restart-proof tier behind memory;
+  disk hits are promoted back into memory
+- disk-tier I/O never holds the lock guarding memory, and coroutines use
+  aget()/aput(), which run it in the default executor, so a slow disk
+  neither blocks the event loop nor serialises other threads' lookups
+- caching is opt-in per route (call site), so replies that must not repeat,
+  such as urgent-message handling, can bypass it
+
+Only successful model responses should be stored; callers keep their
+error-fallback texts out of the cache.
+"""
+
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_TTL_SECONDS = 3600
+# Expired disk rows are purged once every this many stores
+_PURGE_EVERY = 500
+
+_STRIP_CHARS = " \t\r\n.,!?;:¡¿…'\"`~*_-"
+
+
+def normalize_text(text: str) -> str:
+    """Fold a prompt text to its cache form: NFKC, casefolded, trimmed, single-spaced."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return " ".join(text.split()).strip(_STRIP_CHARS)
+
+
+def cache_key(model: str, messages: List[Dict[str, str]], **params: Any) -> str:
+    """
+    Build the cache key of a chat completion request.
+
+    Args:
+        model: Model name
+        messages: Prompt messages with role and content
+        **params: Generation parameters that change the answer, e.g. max_tokens
+
+    Returns:
+        Hex SHA-256 of the normalised request
+    """
+    normalized = [[m.get("role"), normalize_text(m.get("content", ""))] for m in messages]
+    payload = json.dumps([model, normalized, sorted(params.items())], separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """TTL + LRU cache of model responses with an optional SQLite tier."""
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        db_path: Optional[str] = None,
+        routes: Optional[Iterable[str]] = None,
+    ):
+        """
+        Initialize the cache.
+
+        Args:
+            max_entries: Responses kept in memory
+            ttl_seconds: Seconds a response stays valid
+            db_path: Optional SQLite file for the on-disk tier
+            routes: Routes that may use the cache; None allows every route
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self.routes = None if routes is None else frozenset(routes)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Guards the memory tier and counters only; disk I/O runs outside it
+        self._lock = threading.Lock()
+        # One disk-tier connection per thread, so lookups never queue behind each other
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._closed = False
+        self._stores = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        if db_path:
+            self._connection().execute("""
+                CREATE TABLE IF NOT EXISTS llm_response_cache (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def enabled_for(self, route: str) -> bool:
+        """Return whether a route has opted in to the cache."""
+        return self.routes is None or route in self.routes
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None on a miss or expired entry."""
+        now = time.time()
+        response = self._memory_get(key, now)
+        if response is not None or not self.db_path:
+            return response
+        return self._disk_get(key, now)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Like get(), for coroutines: the disk tier is read in the default executor."""
+        now = time.time()
+        response = self._memory_get(key, now)
+        if response is not None or not self.db_path:
+            return response
+        return await asyncio.get_running_loop().run_in_executor(None, self._disk_get, key, now)
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response in memory and, if configured, on disk."""
+        expires_at = self._memory_put(key, response)
+        if self.db_path:
+            self._disk_put(key, response, expires_at)
+
+    async def aput(self, key: str, response: str) -> None:
+        """Like put(), for coroutines: the disk tier is written in the default executor."""
+        expires_at = self._memory_put(key, response)
+        if self.db_path:
+            await asyncio.get_running_loop().run_in_executor(None, self._disk_put, key, response, expires_at)
+
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        """Look a key up in memory; counts a miss here only if there is no disk tier to try."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+            if not self.db_path:
+                self.misses += 1
+            return None
+
+    def _memory_put(self, key: str, response: str) -> float:
+        """Store a response in memory; returns its expiry time."""
+        expires_at = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, expires_at, response)
+        return expires_at
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        """Look a key up on disk and promote a hit into memory."""
+        conn = self._connection()
+        row = conn.execute(
+            "SELECT response, expires_at FROM llm_response_cache WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone() if conn is not None else None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[1], row[0])
+            self.hits += 1
+            self.disk_hits += 1
+        return row[0]
+
+    def _disk_put(self, key: str, response: str, expires_at: float) -> None:
+        """Store a response on disk, purging expired rows every _PURGE_EVERY stores."""
+        conn = self._connection()
+        if conn is None:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_response_cache (key, response, expires_at) VALUES (?, ?, ?)",
+            (key, response, expires_at)
+        )
+        with self._lock:
+            self._stores += 1
+            purge = self._stores % _PURGE_EVERY == 0
+        if purge:
+            conn.execute("DELETE FROM llm_response_cache WHERE expires_at <= ?", (time.time(),))
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """Return this thread's disk-tier connection, or None once closed."""
+        if self._closed:
+            return None
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                if self._closed:
+                    return None
+                # Autocommit; busy writers wait rather than fail
+                conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=5)
+                self._connections.append(conn)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, expires_at: float, response: str) -> None:
+        """Insert into the memory tier and evict beyond max_entries. Caller holds the lock."""
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop every cached response from both tiers."""
+        with self._lock:
+            self._entries.clear()
+        conn = self._connection() if self.db_path else None
+        if conn is not None:
+            conn.execute("DELETE FROM llm_response_cache")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy and hit/miss counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def close(self) -> None:
+        """Close the on-disk tier; later lookups use memory only."""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+def parse_routes(text: Optional[str]) -> Optional[List[str]]:
+    """Parse a comma-separated route list; '*' means every route (None)."""
+    if text is None or text.strip() == "*":
+        return None
+    return [route.strip() for route in text.split(",") if route.strip()]
+
+
+_caches: Dict[Optional[str], ResponseCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_response_cache(db_path: Optional[str] = None, **kwargs: Any) -> ResponseCache:
+    """
+    Return the process-wide response cache for an on-disk path (or memory only).
+
+    The first call creates the cache with the given settings; later calls share it.
+    """
+    with _caches_lock:
+        cache = _caches.get(db_path)
+        if cache is None:
+            cache = ResponseCache(db_path=db_path, **kwargs)
+            _caches[db_path] = cache
+        return cache
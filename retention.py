@@ -0,0 +1,281 @@
+"""
+Message retention with batched deletes and incremental vacuum.
+
+RetentionManager enforces a default policy plus per-chat overrides, each a
+maximum message age and/or a maximum number of messages kept per chat.
+Expired rows are deleted a small batch at a time, each batch in its own
+transaction, so other writers wait at most one batch for the lock. After
+each batch, on_delete is called with the chats it touched so copies of their
+messages held elsewhere (app.py's history cache) can be dropped.
+
+Deleted pages go to SQLite's freelist; they are only returned to the file
+system when the database uses auto_vacuum=INCREMENTAL, in which case every
+run ends with bounded PRAGMA incremental_vacuum steps. New databases get
+that mode from enable_incremental_vacuum(); existing ones need a one-off
+VACUUM to switch, which locks the database for its duration and is left to
+the operator.
+
+Like MessageArchiver, this works with any of the messages schemas in this
+project: it relies on the id and chat_id columns and an ordering column,
+either the ISO-8601 'timestamp' text or the integer 'timestamp_ms'.
+"""
+
+import json
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from epoch_ms import to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_VACUUM_PAGES = 1000
+
+# PRAGMA auto_vacuum values
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+@dataclass
+class RetentionPolicy:
+    """How much of a chat's history to keep; None means no limit."""
+    max_age_days: Optional[float] = None
+    max_rows: Optional[int] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RetentionPolicy":
+        """Build a policy from a dict with optional max_age_days and max_rows keys."""
+        return cls(max_age_days=data.get("max_age_days"), max_rows=data.get("max_rows"))
+
+
+def parse_chat_policies(text: Optional[str]) -> Dict[str, RetentionPolicy]:
+    """
+    Parse per-chat policies from JSON, e.g. '{"chat_1": {"max_age_days": 7}}'.
+
+    Raises:
+        ValueError: If the text is not a JSON object of policy objects
+    """
+    if not text:
+        return {}
+    data = json.loads(text)
+    if not isinstance(data, dict) or not all(isinstance(v, dict) for v in data.values()):
+        raise ValueError("Chat retention policies must be a JSON object of policy objects")
+    return {chat_id: RetentionPolicy.from_dict(policy) for chat_id, policy in data.items()}
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """
+    Request auto_vacuum=INCREMENTAL on a connection.
+
+    Takes effect immediately on a database with no tables yet, so call it
+    before creating the schema.
+
+    Returns:
+        bool: True if the database is now in incremental mode
+    """
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    enabled = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == AUTO_VACUUM_INCREMENTAL
+    if not enabled:
+        logger.info("Database predates auto_vacuum=INCREMENTAL; run VACUUM once to reclaim space")
+    return enabled
+
+
+class RetentionManager:
+    """Deletes messages outside their retention policy and reclaims the space."""
+
+    def __init__(
+        self,
+        db_path: str,
+        default_policy: Optional[RetentionPolicy] = None,
+        chat_policies: Optional[Dict[str, RetentionPolicy]] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        vacuum_pages: int = DEFAULT_VACUUM_PAGES,
+        order_column: str = "timestamp",
+        on_delete: Optional[Callable[[str], None]] = None,
+    ):
+        """
+        Initialize the retention manager.
+
+        Args:
+            db_path: Path to the database holding the messages table
+            default_policy: Policy for chats without an override
+            chat_policies: Per-chat policies, replacing the default for those chats
+            batch_size: Rows deleted per transaction
+            vacuum_pages: Freelist pages released per incremental_vacuum step
+            order_column: 'timestamp' (ISO text) or 'timestamp_ms' (integer)
+            on_delete: Called with each chat_id after a batch deleted some of its
+                messages, e.g. to drop copies cached in memory
+        """
+        self.db_path = db_path
+        self.default_policy = default_policy or RetentionPolicy()
+        self.chat_policies = dict(chat_policies or {})
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.order_column = order_column
+        self.on_delete = on_delete
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit, so every batch below is its own short transaction
+        return sqlite3.connect(self.db_path, isolation_level=None, timeout=30)
+
+    def _cutoff(self, max_age_days: float, now: datetime) -> Any:
+        """Return the order_column value before which messages are expired."""
+        moment = now - timedelta(days=max_age_days)
+        if self.order_column == "timestamp_ms":
+            return to_epoch_ms(moment)
+        return moment.strftime("%Y-%m-%d")
+
+    def enforce(self, now: Optional[datetime] = None) -> int:
+        """
+        Delete every message outside its chat's policy, then release free pages.
+
+        Returns:
+            int: Number of messages deleted
+        """
+        now = now or datetime.now()
+        deleted = 0
+        conn = self._connect()
+        try:
+            overrides = list(self.chat_policies)
+            if self.default_policy.max_age_days is not None:
+                deleted += self._delete_older(
+                    conn, self._cutoff(self.default_policy.max_age_days, now), exclude=overrides
+                )
+            if self.default_policy.max_rows is not None:
+                for chat_id in self._chats_over(conn, self.default_policy.max_rows, exclude=overrides):
+                    deleted += self._trim_chat(conn, chat_id, self.default_policy.max_rows)
+
+            for chat_id, policy in self.chat_policies.items():
+                if self._stop.is_set():
+                    break
+                if policy.max_age_days is not None:
+                    deleted += self._delete_older(conn, self._cutoff(policy.max_age_days, now), chat_id=chat_id)
+                if policy.max_rows is not None:
+                    deleted += self._trim_chat(conn, chat_id, policy.max_rows)
+
+            if deleted:
+                logger.info(f"Retention deleted {deleted} messages from {self.db_path}")
+            self._vacuum(conn)
+        finally:
+            conn.close()
+        return deleted
+
+    def delete_chat(self, chat_id: str) -> int:
+        """
+        Delete all of a chat's messages in batches.
+
+        Returns:
+            int: Number of messages deleted
+        """
+        conn = self._connect()
+        try:
+            deleted = self._delete_batches(conn, "chat_id = ?", (chat_id,), interruptible=False)
+            self._vacuum(conn, interruptible=False)
+            return deleted
+        finally:
+            conn.close()
+
+    def _delete_older(self, conn: sqlite3.Connection, cutoff: Any,
+                      chat_id: Optional[str] = None, exclude: Optional[List[str]] = None) -> int:
+        """Delete messages older than cutoff, for one chat or all chats not excluded."""
+        where = f"{self.order_column} < ?"
+        params: tuple = (cutoff,)
+        if chat_id is not None:
+            where += " AND chat_id = ?"
+            params += (chat_id,)
+        elif exclude:
+            where += f" AND chat_id NOT IN ({','.join('?' * len(exclude))})"
+            params += tuple(exclude)
+        return self._delete_batches(conn, where, params)
+
+    def _chats_over(self, conn: sqlite3.Connection, max_rows: int, exclude: List[str]) -> List[str]:
+        """Return the chats holding more than max_rows messages."""
+        has_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_stats'"
+        ).fetchone()
+        if has_stats:
+            # Trigger-maintained counters, so no scan of messages
+            sql = "SELECT chat_id FROM chat_stats WHERE message_count > ?"
+        else:
+            sql = "SELECT chat_id FROM messages GROUP BY chat_id HAVING COUNT(*) > ?"
+        return [row[0] for row in conn.execute(sql, (max_rows,)) if row[0] not in exclude]
+
+    def _trim_chat(self, conn: sqlite3.Connection, chat_id: str, max_rows: int) -> int:
+        """Delete a chat's oldest messages beyond its newest max_rows."""
+        if max_rows <= 0:
+            return self._delete_batches(conn, "chat_id = ?", (chat_id,))
+        oldest_kept = conn.execute(
+            f"SELECT {self.order_column}, id FROM messages WHERE chat_id = ? "
+            f"ORDER BY {self.order_column} DESC, id DESC LIMIT 1 OFFSET ?",
+            (chat_id, max_rows - 1)
+        ).fetchone()
+        if oldest_kept is None:
+            return 0
+        return self._delete_batches(
+            conn, f"chat_id = ? AND ({self.order_column}, id) < (?, ?)", (chat_id, *oldest_kept)
+        )
+
+    def _delete_batches(self, conn: sqlite3.Connection, where: str, params: tuple,
+                        interruptible: bool = True) -> int:
+        """Delete matching rows batch_size at a time, one transaction per batch."""
+        deleted = 0
+        while not (interruptible and self._stop.is_set()):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = conn.execute(
+                    f"SELECT id, chat_id FROM messages WHERE {where} LIMIT ?", params + (self.batch_size,)
+                ).fetchall()
+                conn.executemany("DELETE FROM messages WHERE id = ?", [(row[0],) for row in rows])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            deleted += len(rows)
+            if self.on_delete:
+                for chat_id in {row[1] for row in rows}:
+                    self.on_delete(chat_id)
+            if len(rows) < self.batch_size:
+                break
+        return deleted
+
+    def _vacuum(self, conn: sqlite3.Connection, interruptible: bool = True) -> int:
+        """Return free pages to the file system in bounded steps; no-op unless incremental."""
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            return 0
+        released = 0
+        while not (interruptible and self._stop.is_set()):
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if free == 0:
+                break
+            conn.execute(f"PRAGMA incremental_vacuum({min(free, self.vacuum_pages)})").fetchall()
+            released += min(free, self.vacuum_pages)
+        return released
+
+    def start(self, interval_seconds: float = 3600) -> None:
+        """Run enforce() in a background thread every interval_seconds."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    self.enforce()
+                except Exception as e:
+                    logger.error(f"Error enforcing message retention: {e}")
+                self._stop.wait(interval_seconds)
+
+        self._thread = threading.Thread(target=run, name="message-retention", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread started by start()."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
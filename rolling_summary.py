@@ -0,0 +1,193 @@
+"""
+Incremental per-chat summaries.
+
+Summarising a chat by re-sending its last N messages costs the same tokens
+on every request and still forgets anything older. RollingSummarizer keeps
+a summary per chat instead, in the summary_state table:
+
+    summary_state(chat_id, summary, last_message_id, updated_at)
+
+Each request reads only the messages stored after last_message_id and asks
+the model to fold them into the stored summary, so latency and token cost
+stay flat however busy a chat is. A request with nothing new (summary
+commands and the bot's own summary replies do not count) returns the stored
+summary without calling the model.
+
+The model is called with no database connection held: messages are read on
+one connection, the summary is generated, and the result is written on
+another. The write only moves last_message_id forward, so of two racing
+requests the one covering more messages wins.
+"""
+
+import logging
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, ContextManager, List, Optional, Tuple
+
+from message_bodies import content_sql
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_NEW_MESSAGES = 20
+
+SUMMARY_PROMPT = """Here is the summary of a WhatsApp conversation so far:
+{summary}
+
+{skipped}New messages since then:
+{conversation}
+
+Update the summary so it also covers the new messages. Reply with the summary only, in 2-3 sentences."""
+
+FIRST_SUMMARY_PROMPT = "Summarize this conversation in 2-3 sentences:\n{conversation}"
+
+
+def install(conn: sqlite3.Connection) -> None:
+    """Create the summary_state table and the index new messages are read by. The caller commits."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS summary_state (
+            chat_id TEXT PRIMARY KEY,
+            summary TEXT NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    # "Messages of this chat after id N" without walking the chat's whole history
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_id ON messages(chat_id, id)")
+
+
+@dataclass
+class SummaryState:
+    """A chat's stored summary and the newest message it covers."""
+    summary: str
+    last_message_id: int
+
+
+def load_state(conn: sqlite3.Connection, chat_id: str) -> Optional[SummaryState]:
+    """Return a chat's stored summary, or None if it has none."""
+    row = conn.execute(
+        "SELECT summary, last_message_id FROM summary_state WHERE chat_id = ?", (chat_id,)
+    ).fetchone()
+    return SummaryState(row[0], row[1]) if row else None
+
+
+def save_state(conn: sqlite3.Connection, chat_id: str, summary: str, last_message_id: int) -> None:
+    """Store a chat's summary unless a newer one (covering later messages) is already stored."""
+    conn.execute("""
+        INSERT INTO summary_state (chat_id, summary, last_message_id) VALUES (?, ?, ?)
+        ON CONFLICT(chat_id) DO UPDATE SET
+            summary = excluded.summary,
+            last_message_id = excluded.last_message_id,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE excluded.last_message_id >= summary_state.last_message_id
+    """, (chat_id, summary, last_message_id))
+
+
+def delete_state(conn: sqlite3.Connection, chat_id: str) -> None:
+    """Forget a chat's summary, e.g. after its history was deleted."""
+    conn.execute("DELETE FROM summary_state WHERE chat_id = ?", (chat_id,))
+
+
+class RollingSummarizer:
+    """Folds each chat's new messages into its stored summary."""
+
+    def __init__(
+        self,
+        generate: Callable[[str], str],
+        max_new_messages: int = DEFAULT_MAX_NEW_MESSAGES,
+        is_command: Optional[Callable[[str], bool]] = None,
+        bot_sender: str = "bot",
+    ):
+        """
+        Initialize the summarizer.
+
+        Args:
+            generate: Sends a prompt to the model and returns its reply;
+                raises on failure, so error texts are never stored
+            max_new_messages: Most new messages folded in per request; the
+                newest are kept when more arrived since the last summary
+            is_command: Returns True for message texts that are summary
+                commands, which are not summarised
+            bot_sender: Sender of the bot's replies; a reply repeating the
+                stored summary is not summarised again
+        """
+        self.generate = generate
+        self.max_new_messages = max_new_messages
+        self.is_command = is_command or (lambda text: False)
+        self.bot_sender = bot_sender
+
+    def read(self, conn: sqlite3.Connection, chat_id: str) -> Tuple[Optional[SummaryState], List[tuple], bool]:
+        """
+        Read a chat's summary state and the messages stored after it.
+
+        Returns:
+            (state, messages, skipped): state or None, up to max_new_messages
+            (id, sender, content) rows oldest first, and whether older
+            unsummarised messages were left out
+        """
+        state = load_state(conn, chat_id)
+        rows = conn.execute(
+            f"SELECT id, sender, {content_sql()} FROM messages "
+            "WHERE chat_id = ? AND id > ? ORDER BY id DESC LIMIT ?",
+            (chat_id, state.last_message_id if state else 0, self.max_new_messages + 1)
+        ).fetchall()
+        skipped = len(rows) > self.max_new_messages
+        return state, rows[:self.max_new_messages][::-1], skipped
+
+    def fold(self, state: Optional[SummaryState], rows: List[tuple], skipped: bool) -> Optional[SummaryState]:
+        """
+        Fold new messages into a summary, calling the model only if there is something new.
+
+        Returns:
+            The new state, or None if the chat has nothing to summarise
+        """
+        if not rows:
+            return state
+        new = [
+            (sender, content) for _, sender, content in rows
+            if not self.is_command(content)
+            and not (state and sender == self.bot_sender and content == state.summary)
+        ]
+        last_message_id = rows[-1][0]
+        if not new:
+            # Only commands and summary replies since last time: nothing to ask the model
+            return SummaryState(state.summary, last_message_id) if state else None
+
+        conversation = "\n".join(f"{sender}: {content}" for sender, content in new)
+        if state is None:
+            prompt = FIRST_SUMMARY_PROMPT.format(conversation=conversation)
+        else:
+            prompt = SUMMARY_PROMPT.format(
+                summary=state.summary,
+                skipped="(Some earlier messages were skipped.)\n" if skipped else "",
+                conversation=conversation
+            )
+        return SummaryState(self.generate(prompt).strip(), last_message_id)
+
+    def summarize(
+        self,
+        chat_id: str,
+        reader: Callable[[], ContextManager[sqlite3.Connection]],
+        writer: Callable[[], ContextManager[sqlite3.Connection]],
+    ) -> Optional[str]:
+        """
+        Bring a chat's summary up to date and return it.
+
+        Args:
+            chat_id: Chat to summarise
+            reader: Returns a context manager yielding a connection to read with
+            writer: Returns a context manager yielding a connection to store
+                the summary with; its block must commit
+
+        Returns:
+            The summary, or None if the chat has no messages to summarise
+        """
+        with reader() as conn:
+            state, rows, skipped = self.read(conn, chat_id)
+        new_state = self.fold(state, rows, skipped)
+        if new_state is None:
+            return None
+        if new_state != state:
+            with writer() as conn:
+                save_state(conn, chat_id, new_state.summary, new_state.last_message_id)
+            logger.info(f"Summary of chat {chat_id} now covers messages up to {new_state.last_message_id}")
+        return new_state.summary
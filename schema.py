@@ -0,0 +1,275 @@
+"""
+Canonical messages schema and migration runner shared by every storage module.
+
+app.py, database.py and chat_history.py each used to create their own
+messages table (sender/content/message_type, sender_id/message_text/
+message_id, sender/content/created_at), so entry points pointed at the same
+file found a table in someone else's shape. All three now call initialize(),
+which creates the table below and brings older databases up to it:
+
+    messages(id, chat_id, sender, timestamp, timestamp_ms, content,
+             message_type, message_id, created_at, body_id)
+
+Changes are applied as numbered migrations, each in its own transaction;
+PRAGMA user_version records how many have run, so every migration runs once
+per file. The epoch-ms ordering key, dedup index, chat_stats counters,
+full-text index, shared message bodies (see message_bodies.py) and rolling
+summary state (see rolling_summary.py) are installed by migrations too, so
+every entry point gets the same indexes and triggers.
+"""
+
+import sqlite3
+import logging
+from typing import Callable, List
+
+import chat_stats
+import epoch_ms
+import message_bodies
+import message_search
+import rolling_summary
+from retention import enable_incremental_vacuum
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_COLUMNS = [
+    "id", "chat_id", "sender", "timestamp", "timestamp_ms", "content",
+    "message_type", "message_id", "created_at", "body_id",
+]
+
+MESSAGES_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        chat_id TEXT NOT NULL,
+        sender TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        timestamp_ms INTEGER,
+        content TEXT NOT NULL,
+        message_type TEXT NOT NULL DEFAULT 'text',
+        message_id TEXT,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        body_id INTEGER
+    )
+"""
+
+# Column names used by database.py before the schemas were unified
+RENAMED_COLUMNS = {"sender_id": "sender", "message_text": "content"}
+
+# Columns older tables may lack, as ALTER TABLE ADD COLUMN can add them
+ADDED_COLUMNS = {
+    "message_type": "TEXT NOT NULL DEFAULT 'text'",
+    "message_id": "TEXT",
+    "created_at": "DATETIME",
+    "body_id": "INTEGER",
+}
+
+
+def _chat_timestamp_index(conn: sqlite3.Connection) -> None:
+    """History reads in app.py filter on chat_id and walk timestamp newest-first."""
+    # Originally app.py's migration 1; kept first so databases it ran on line up
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_chat_timestamp
+        ON messages(chat_id, timestamp DESC, id DESC)
+    """)
+
+
+def _unify_columns(conn: sqlite3.Connection) -> None:
+    """
+    Bring a messages table created by an older module to the canonical columns.
+
+    Columns are renamed and added in place, which only rewrites the schema,
+    so this is quick on any table size; the column order may differ from a
+    new table's. timestamp_ms is added by the next migration and filled by
+    epoch_ms.backfill(), and created_at of existing rows by
+    _backfill_created_at(), both in short batches.
+    """
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(messages)")]
+    present = set(columns)
+    for old, new in RENAMED_COLUMNS.items():
+        if old in present and new not in present:
+            # Indexes and triggers on the column follow the rename
+            conn.execute(f"ALTER TABLE messages RENAME COLUMN {old} TO {new}")
+            present = (present - {old}) | {new}
+    for name, definition in ADDED_COLUMNS.items():
+        if name not in present:
+            conn.execute(f"ALTER TABLE messages ADD COLUMN {name} {definition}")
+            present.add(name)
+            if name == "created_at":
+                _install_created_at(conn)
+
+    unknown = present - set(MESSAGE_COLUMNS)
+    if unknown:
+        logger.warning(f"Keeping unknown messages columns: {sorted(unknown)}")
+    if present != set(columns):
+        logger.info(f"Migrated messages table to the unified columns (was: {', '.join(columns)})")
+
+
+def _install_created_at(conn: sqlite3.Connection) -> None:
+    """Stamp new rows of a table whose created_at was added without a default, and mark old rows for backfill."""
+    # ADD COLUMN cannot default to CURRENT_TIMESTAMP
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_messages_created_at_insert
+        AFTER INSERT ON messages WHEN NEW.created_at IS NULL
+        BEGIN
+            UPDATE messages SET created_at = CURRENT_TIMESTAMP WHERE id = NEW.id;
+        END
+    """)
+    # Rows still to backfill; dropped by _backfill_created_at() once empty
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_messages_created_at_pending
+        ON messages(id) WHERE created_at IS NULL
+    """)
+
+
+def _backfill_created_at(db_path: str, batch_size: int = epoch_ms.DEFAULT_BATCH_SIZE) -> int:
+    """
+    Set created_at of rows stored before the column was added, one short transaction per batch.
+
+    app.py stamped messages with the time they were stored, so that time is
+    used. Does nothing unless _install_created_at() left rows pending.
+
+    Returns:
+        int: Number of rows filled
+    """
+    filled = 0
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        pending = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_messages_created_at_pending'"
+        ).fetchone()
+        if not pending:
+            return 0
+        while True:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                count = conn.execute("""
+                    UPDATE messages SET created_at = timestamp
+                    WHERE id IN (SELECT id FROM messages WHERE created_at IS NULL ORDER BY id LIMIT ?)
+                """, (batch_size,)).rowcount
+                if count < batch_size:
+                    conn.execute("DROP INDEX idx_messages_created_at_pending")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            filled += count
+            if count < batch_size:
+                break
+    finally:
+        conn.close()
+    if filled:
+        logger.info(f"Backfilled created_at for {filled} messages")
+    return filled
+
+
+def _indexes(conn: sqlite3.Connection) -> None:
+    """Create the indexes every read and write path relies on."""
+    _chat_timestamp_index(conn)
+    # Integer ordering key for history pages and keyset cursors
+    epoch_ms.install(conn)
+    # Range scans of archiving and retention across all chats
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp_ms ON messages(timestamp_ms)")
+
+    # Webhook replays of a (chat_id, message_id) are dropped by this index;
+    # databases written before it existed may hold some, so keep the first copy
+    removed = conn.execute("""
+        DELETE FROM messages
+        WHERE message_id IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM messages WHERE message_id IS NOT NULL GROUP BY chat_id, message_id
+        )
+    """).rowcount
+    if removed:
+        logger.info(f"Removed {removed} duplicate messages before creating the dedup index")
+    conn.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_chat_message_id
+        ON messages(chat_id, message_id) WHERE message_id IS NOT NULL
+    """)
+
+
+def _derived_tables(conn: sqlite3.Connection) -> None:
+    """Install the chat_stats counters and the full-text index with their triggers."""
+    chat_stats.install(conn, sender_column="sender")
+    message_search.install(conn, text_column="content")
+
+
+def _shared_bodies(conn: sqlite3.Connection) -> None:
+    """Store repeated bodies (canned bot replies) once, referenced by body_id."""
+    message_bodies.install(conn)
+
+
+def _chat_activity(conn: sqlite3.Connection) -> None:
+    """Track last activity and unread messages per chat, behind the chats view."""
+    # Adds the columns, view and triggers to chat_stats tables from migration 4
+    chat_stats.install(conn, sender_column="sender")
+
+
+def _chat_stats_by_instant(conn: sqlite3.Connection) -> None:
+    """Pick each chat's first and last message by timestamp_ms instead of timestamp text."""
+    # Adds first_message_ms, replaces the triggers and recomputes the stats
+    chat_stats.install(conn, sender_column="sender")
+
+
+def _summary_state(conn: sqlite3.Connection) -> None:
+    """Store each chat's rolling summary and the last message it covers."""
+    rolling_summary.install(conn)
+
+
+# Applied in order; PRAGMA user_version records how many have run
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _chat_timestamp_index,
+    _unify_columns,
+    _indexes,
+    _derived_tables,
+    _shared_bodies,
+    _chat_activity,
+    _summary_state,
+    _chat_stats_by_instant,
+]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """
+    Apply the migrations a database has not seen yet.
+
+    Each migration runs in its own write transaction together with the
+    user_version bump, so a failed migration is retried on the next start
+    and two processes starting at once never apply the same one twice.
+
+    Args:
+        conn: Connection in autocommit mode (isolation_level=None)
+
+    Returns:
+        int: The schema version the database is now at
+    """
+    for number, migration in enumerate(MIGRATIONS, start=1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < number:
+                logger.info(f"Applying database migration {number} ({migration.__name__.lstrip('_')})")
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {number}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    return len(MIGRATIONS)
+
+
+def initialize(db_path: str) -> None:
+    """
+    Create or upgrade the messages schema in a database file.
+
+    Args:
+        db_path: Path to the SQLite database file
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    try:
+        # Must precede table creation; lets retention return freed pages to the OS
+        enable_incremental_vacuum(conn)
+        conn.execute(MESSAGES_TABLE_SQL.format(name="messages"))
+        migrate(conn)
+    finally:
+        conn.close()
+
+    # Fill the ordering key and created_at for rows stored before they existed, in short batches
+    epoch_ms.backfill(db_path)
+    _backfill_created_at(db_path)
@@ -0,0 +1,101 @@
+"""
+Chat-id sharding of message storage across several SQLite files.
+
+SQLite allows one writer per database file, so a single messages.db caps
+write throughput at one transaction at a time however many cores and disks
+the host has. In sharded mode each chat_id is hashed (CRC-32) to one of N
+files, and every file gets its own connection manager and writer:
+
+    messages.db, 4 shards -> messages-shard0.db ... messages-shard3.db
+
+All of a chat's messages live in one shard, so per-chat reads and writes
+touch a single file. Global queries (stats, search) fan out to every
+shard in parallel and merge the results.
+
+The shard count is part of the storage layout: changing it re-routes chats
+to different files, so export and re-import the history when resharding.
+With one shard the original database path is used unchanged.
+"""
+
+import os
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
+from connection_manager import ConnectionManager, get_connection_manager
+
+T = TypeVar("T")
+
+
+def shard_index(chat_id: str, num_shards: int) -> int:
+    """Return the shard a chat belongs to; stable across processes and restarts."""
+    if num_shards <= 1:
+        return 0
+    return zlib.crc32(chat_id.encode("utf-8")) % num_shards
+
+
+def shard_paths(db_path: str, num_shards: int) -> List[str]:
+    """Return the database file of every shard, in shard order."""
+    if num_shards <= 1:
+        return [db_path]
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}-shard{i}{ext or '.db'}" for i in range(num_shards)]
+
+
+def shard_path(db_path: str, chat_id: str, num_shards: int) -> str:
+    """Return the database file holding a chat."""
+    return shard_paths(db_path, num_shards)[shard_index(chat_id, num_shards)]
+
+
+def shard_archive_dir(archive_dir: str, path: str, num_shards: int) -> str:
+    """Return the archive directory for one shard's database file."""
+    if num_shards <= 1:
+        return archive_dir
+    return os.path.join(archive_dir, os.path.splitext(os.path.basename(path))[0])
+
+
+def fan_out(paths: List[str], query: Callable[[str], T]) -> List[T]:
+    """
+    Run a query against every shard in parallel.
+
+    Args:
+        paths: Shard database files
+        query: Called with each path; runs on its own thread
+
+    Returns:
+        The query results, in shard order
+    """
+    if len(paths) == 1:
+        return [query(paths[0])]
+    with ThreadPoolExecutor(max_workers=len(paths), thread_name_prefix="shard-query") as pool:
+        return list(pool.map(query, paths))
+
+
+class ShardSet:
+    """The connection managers of a sharded database, one writer per shard."""
+
+    def __init__(self, db_path: str, num_shards: int = 1, **manager_kwargs):
+        """
+        Initialize the shard set.
+
+        Args:
+            db_path: Database path; shard files are derived from it
+            num_shards: Number of shard files (1 disables sharding)
+            **manager_kwargs: Passed to get_connection_manager for each shard
+        """
+        self.num_shards = max(1, num_shards)
+        self.paths = shard_paths(db_path, self.num_shards)
+        self.managers: List[ConnectionManager] = [
+            get_connection_manager(path, **manager_kwargs) for path in self.paths
+        ]
+
+    def __len__(self) -> int:
+        return self.num_shards
+
+    def index(self, chat_id: str) -> int:
+        """Return the shard a chat belongs to."""
+        return shard_index(chat_id, self.num_shards)
+
+    def manager(self, chat_id: str) -> ConnectionManager:
+        """Return the connection manager of a chat's shard."""
+        return self.managers[self.index(chat_id)]
@@ -0,0 +1,227 @@
+"""
+Single-flight coalescing of identical concurrent LLM requests.
+
+When several group members send /summary within a second, each webhook
+builds the same prompt and would pay for the same completion. A single
+flight lets the first caller with a given request fingerprint make the call
+while concurrent duplicates wait for it and share its result (or its
+exception). Once the call finishes the key is free again: this is not a
+cache, only calls overlapping in time are merged.
+
+- SingleFlight: for threads (app.py's Flask handlers)
+- AsyncSingleFlight: for coroutines (gpt_client.py), including streams,
+  where one upstream stream is fanned out to every consumer. Consumers that
+  join late first replay the chunks already received, so each still gets
+  the whole response.
+
+Async flights are tracked per event loop, since futures and tasks cannot be
+shared across loops.
+"""
+
+import asyncio
+import logging
+import threading
+import weakref
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    """A synchronous call in flight."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Merges concurrent calls with the same key across threads."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn, or wait for the call already running under the same key.
+
+        Args:
+            key: Request fingerprint
+            fn: Makes the request; called by the first caller only
+
+        Returns:
+            fn's result, shared by every caller of the flight
+
+        Raises:
+            Whatever fn raised, in every caller of the flight
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+        else:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls were made and how many were merged into one."""
+        with self._lock:
+            return {"in_flight": len(self._calls), "calls": self.calls, "coalesced": self.coalesced}
+
+
+class _Broadcast:
+    """One upstream stream and the chunks it has produced so far."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+
+    def notify(self) -> None:
+        """Wake consumers waiting for the next chunk."""
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class AsyncSingleFlight:
+    """Merges concurrent coroutine calls and streams with the same key."""
+
+    def __init__(self):
+        """Initialize with no calls in flight."""
+        # Event loop -> key -> call task or stream broadcast; dropped with the loop
+        self._flights: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self.calls = 0
+        self.coalesced = 0
+
+    def _in_flight(self) -> Dict[Hashable, Any]:
+        """Return the running event loop's flights."""
+        return self._flights.setdefault(asyncio.get_running_loop(), {})
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn(), or the call already running under the same key.
+
+        The call runs as a task of its own, so a cancelled caller does not
+        cancel it for the others.
+
+        Args:
+            key: Request fingerprint
+            fn: Returns the awaitable making the request; called by the first caller only
+
+        Returns:
+            The awaitable's result, shared by every caller of the flight
+        """
+        flights = self._in_flight()
+        task = flights.get(("call", key))
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = flights[("call", key)] = asyncio.ensure_future(fn())
+            self.calls += 1
+            task.add_done_callback(lambda done: self._finish(flights, ("call", key), done))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _finish(flights: Dict[Hashable, Any], key: Hashable, task: asyncio.Future) -> None:
+        """Free a finished call's key; later requests start a new call."""
+        if flights.get(key) is task:
+            del flights[key]
+        # Mark the exception retrieved even if every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def stream(self, key: Hashable, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Iterate fn()'s stream, or join the stream already running under the same key.
+
+        The upstream stream is consumed by a background task and every
+        consumer gets all of its chunks. It is cancelled once no consumer is
+        left.
+
+        Args:
+            key: Request fingerprint
+            fn: Returns the async iterator making the request; called by the first caller only
+
+        Yields:
+            The upstream stream's chunks
+        """
+        flights = self._in_flight()
+        broadcast = flights.get(("stream", key))
+        if broadcast is not None:
+            self.coalesced += 1
+        else:
+            broadcast = flights[("stream", key)] = _Broadcast()
+            self.calls += 1
+            broadcast.task = asyncio.get_running_loop().create_task(self._pump(key, broadcast, fn))
+
+        broadcast.subscribers += 1
+        try:
+            position = 0
+            while True:
+                if position < len(broadcast.chunks):
+                    yield broadcast.chunks[position]
+                    position += 1
+                elif broadcast.done:
+                    break
+                else:
+                    await broadcast.changed.wait()
+            if broadcast.error is not None:
+                raise broadcast.error
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.done:
+                # Nobody is reading: stop the request, and let the next caller start afresh
+                if flights.get(("stream", key)) is broadcast:
+                    del flights[("stream", key)]
+                broadcast.task.cancel()
+
+    async def _pump(self, key: Hashable, broadcast: _Broadcast, fn: Callable[[], AsyncIterator[Any]]) -> None:
+        """Read the upstream stream into a broadcast until it ends, fails or is cancelled."""
+        flights = self._in_flight()
+        try:
+            # Closed straight away on cancellation, releasing the request's connection
+            async with aclosing(fn()) as upstream:
+                async for chunk in upstream:
+                    broadcast.chunks.append(chunk)
+                    broadcast.notify()
+        except asyncio.CancelledError:
+            logger.debug(f"Stream {key!r} cancelled: no consumers left")
+        except Exception as e:
+            broadcast.error = e
+        finally:
+            # Later requests start a new stream
+            if flights.get(("stream", key)) is broadcast:
+                del flights[("stream", key)]
+            broadcast.done = True
+            broadcast.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls and streams were made and how many were merged into one."""
+        return {"calls": self.calls, "coalesced": self.coalesced}
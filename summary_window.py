@@ -0,0 +1,76 @@
+"""
+Time windows for summary commands.
+
+Turns the argument of a summary command into the (since, until) range of
+messages to summarise:
+
+    /summary 24h            the last 24 hours
+    /summary last 2 days    the last 2 days (m, h, d and w units)
+    /summary since 9am      since 9:00 today, or yesterday if it is not 9 yet
+    /summary since 21:30    24-hour clock
+    /summary today          since midnight
+    /summary since yesterday
+
+Times are wall-clock times in the same (naive) time base as `now`.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+_DURATION_RE = re.compile(
+    r"^(?:last\s+|past\s+)?(\d+)\s*"
+    r"(m|mins?|minutes?|h|hrs?|hours?|d|days?|w|wks?|weeks?)$"
+)
+_CLOCK_RE = re.compile(r"^(?:since\s+)?(\d{1,2})(?::(\d{2}))?\s*(am|pm)?$")
+
+_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_summary_window(text: str, now: Optional[datetime] = None) -> Optional[Tuple[datetime, datetime]]:
+    """
+    Parse a summary command argument into a time window.
+
+    Args:
+        text: Argument after the command, e.g. "24h" or "since 9am"
+        now: End of the window (default: datetime.now())
+
+    Returns:
+        (since, until) datetimes, or None if the argument is empty
+
+    Raises:
+        ValueError: If the argument is not a recognised time range
+    """
+    text = " ".join(text.lower().split())
+    if not text:
+        return None
+    now = now or datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    match = _DURATION_RE.match(text)
+    if match:
+        amount, unit = int(match.group(1)), match.group(2)
+        if amount <= 0:
+            raise ValueError(f"Time range must be positive: {text}")
+        return now - timedelta(**{_UNITS[unit[0]]: amount}), now
+
+    if text in ("today", "since today", "since midnight"):
+        return midnight, now
+    if text in ("yesterday", "since yesterday"):
+        return midnight - timedelta(days=1), now
+
+    match = _CLOCK_RE.match(text)
+    if match and (text.startswith("since") or match.group(3)):
+        hour, minute, meridiem = int(match.group(1)), int(match.group(2) or 0), match.group(3)
+        if meridiem:
+            if not 1 <= hour <= 12:
+                raise ValueError(f"Invalid time: {text}")
+            hour = hour % 12 + (12 if meridiem == "pm" else 0)
+        if hour > 23 or minute > 59:
+            raise ValueError(f"Invalid time: {text}")
+        since = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if since > now:
+            since -= timedelta(days=1)
+        return since, now
+
+    raise ValueError(f"Unrecognised time range: {text}")
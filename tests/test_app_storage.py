@@ -0,0 +1,139 @@
+"""Tests for app.py's message storage and history reads."""
+
+import os
+import sys
+import importlib
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+class TestAppStorage(unittest.TestCase):
+    """Test cases for store_message and get_recent_messages against a temporary database."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Import app.py configured for a temporary database and no API key."""
+        cls.tmpdir = tempfile.TemporaryDirectory()
+        env = {
+            "DATABASE_PATH": os.path.join(cls.tmpdir.name, "messages.db"),
+            "DB_SHARDS": "1",
+            "WRITE_BEHIND": "False",
+            "HISTORY_CACHE_PER_CHAT": "5",
+            "ARCHIVE_AFTER_DAYS": "0",
+            # Only enforced when a test calls enforce()
+            "RETENTION_MAX_ROWS_PER_CHAT": "3",
+            "BACKUP_DIR": "",
+            "OPENAI_API_KEY": "",
+        }
+        sys.modules.pop("app", None)
+        with patch.dict(os.environ, env):
+            cls.app = importlib.import_module("app")
+        cls.app.init_database()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Close the app's connections and remove the temporary database."""
+        for manager in cls.app.shards.managers:
+            manager.close()
+        sys.modules.pop("app", None)
+        cls.tmpdir.cleanup()
+
+    def store(self, chat_id, count, sender="alice"):
+        for i in range(count):
+            self.app.store_message(chat_id, sender, f"message {i}")
+
+    def test_recent_messages_oldest_first(self):
+        """Test that the newest messages are returned oldest first, with their ids."""
+        self.store("recent", 4)
+
+        messages = self.app.get_recent_messages("recent", limit=3)
+
+        self.assertEqual([m["content"] for m in messages], ["message 1", "message 2", "message 3"])
+        self.assertEqual({m["sender"] for m in messages}, {"alice"})
+        self.assertTrue(all(m["id"] is not None for m in messages))
+        self.assertEqual(self.app.get_recent_messages("unknown"), [])
+
+    def test_cached_reads_match_the_database(self):
+        """Test that writes after a warm-up are appended once and agree with SQLite."""
+        self.store("cached", 3)
+        self.app.get_recent_messages("cached", limit=2)
+        self.store("cached", 2, sender="bob")
+
+        cached = self.app.get_recent_messages("cached", limit=5)
+
+        self.assertEqual(
+            [m["content"] for m in cached],
+            ["message 0", "message 1", "message 2", "message 0", "message 1"]
+        )
+        stored = self.app._select_messages("cached", 5)
+        self.assertEqual([(m["sender"], m["content"], m["id"]) for m in cached],
+                         [(m["sender"], m["content"], m["id"]) for m in stored])
+        self.assertGreater(self.app.history_cache.stats()["hits"], 0)
+
+    def test_before_cursor_pages_back(self):
+        """Test that a (timestamp_ms, id) cursor returns the page before it."""
+        self.store("paged", 5)
+        newest = self.app.get_recent_messages("paged", limit=2)
+
+        cursor = self.app.parse_before_cursor(f"{newest[0]['timestamp_ms']},{newest[0]['id']}")
+        older = self.app.get_recent_messages("paged", limit=2, before=cursor)
+
+        self.assertEqual([m["content"] for m in older], ["message 1", "message 2"])
+
+    def test_other_writers_timestamps_order_by_instant(self):
+        """Test that rows stored by database.py, with ISO 'T'/'+00:00' text, interleave by instant."""
+        with self.app.shards.manager("mixed").writer() as conn:
+            for timestamp, content in [
+                ("2024-01-01 10:30:00.000000", "app, 10:30"),
+                ("2024-01-01T10:00:00+00:00", "webhook, 10:00"),
+                ("2024-01-01T11:00:00+00:00", "webhook, 11:00"),
+            ]:
+                conn.execute(
+                    "INSERT INTO messages (chat_id, sender, timestamp, content) VALUES (?, ?, ?, ?)",
+                    ("mixed", "alice", timestamp, content)
+                )
+
+        messages = self.app.get_recent_messages("mixed", limit=3)
+        self.assertEqual([m["content"] for m in messages], ["webhook, 10:00", "app, 10:30", "webhook, 11:00"])
+
+        older = self.app.get_recent_messages("mixed", limit=3, before=(messages[1]["timestamp_ms"], messages[1]["id"]))
+        self.assertEqual([m["content"] for m in older], ["webhook, 10:00"])
+
+    def test_bot_replies_read_back_in_full(self):
+        """Test that interned bot replies are returned with their text."""
+        self.store("bot", 2, sender="bot")
+        self.app.store_message("bot", "bot", "message 0")
+
+        messages = self.app._select_messages("bot", 10)
+
+        self.assertEqual([m["content"] for m in messages], ["message 0", "message 1", "message 0"])
+
+    def test_retention_drops_cached_messages(self):
+        """Test that messages deleted by retention are no longer served from the cache."""
+        self.store("retained", 12)
+        self.assertEqual(len(self.app.get_recent_messages("retained", limit=5)), 5)
+
+        self.assertGreaterEqual(self.app.retention_managers[0].enforce(), 9)
+
+        # Within the 5 messages the cache holds for the chat
+        messages = self.app.get_recent_messages("retained", limit=5)
+        self.assertEqual([m["content"] for m in messages], ["message 9", "message 10", "message 11"])
+
+    def test_summary_without_api_key(self):
+        """Test that /summary answers with the configuration message and stores both turns."""
+        response = self.app.process_message("summary", "alice", "/summary")
+
+        self.assertTrue(response.startswith("AI service not configured"))
+        messages = self.app.get_recent_messages("summary")
+        self.assertEqual([(m["sender"], m["content"]) for m in messages],
+                         [("alice", "/summary"), ("bot", response)])
+
+
+if __name__ == "__main__":
+    unittest.main()
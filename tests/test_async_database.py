@@ -0,0 +1,77 @@
+"""Tests for the awaitable database facade."""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import async_database
+import database
+from models import MessagePayload
+
+
+class TestAsyncDatabase(unittest.IsolatedAsyncioTestCase):
+    """Test cases for async_database.py."""
+
+    async def asyncSetUp(self):
+        """Point the module at a temporary database and start the executors."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(database, "DATABASE_PATH", os.path.join(self.tmpdir.name, "messages.db"))
+        self.patcher.start()
+        async_database.start(read_workers=2)
+        await async_database.init_database()
+
+    async def asyncTearDown(self):
+        """Stop the executors and remove the temporary database."""
+        async_database.shutdown()
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def message(self, i):
+        return MessagePayload(
+            sender_id="alice",
+            chat_id="chat",
+            timestamp=datetime(2024, 1, 1, 10, 0) + timedelta(minutes=i),
+            message_text=f"message {i}",
+            message_id=f"chat-{i}"
+        )
+
+    async def test_round_trip(self):
+        """Test that awaited writes are visible to awaited reads."""
+        ids = [await async_database.store_message(self.message(i)) for i in range(5)]
+        self.assertEqual(len(set(ids)), 5)
+        self.assertIsNone(await async_database.store_message(self.message(0)))
+
+        page, cursor = await async_database.get_messages_page("chat", 3)
+        self.assertEqual([m.message_text for m in page], ["message 4", "message 3", "message 2"])
+        rows = [row async for row in async_database.iter_messages_by_chat("chat", cursor)]
+        self.assertEqual([row["message_text"] for row in rows], ["message 1", "message 0"])
+        self.assertEqual(await async_database.get_message_count(), 5)
+
+    async def test_writes_run_on_one_thread_off_the_loop(self):
+        """Test that every write runs on the single writer thread."""
+        threads = set()
+        original = database.submit_message
+
+        def record(message):
+            threads.add(threading.current_thread().name)
+            return original(message)
+
+        with patch.object(database, "submit_message", record):
+            for i in range(3):
+                await async_database.store_message(self.message(i))
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(next(iter(threads)).startswith("db-writer"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""Tests for online database backups."""
+
+import os
+import sys
+import gzip
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backup import BackupManager
+from chat_history import ChatHistoryDB
+
+
+class TestBackupManager(unittest.TestCase):
+    """Test cases for BackupManager."""
+
+    def setUp(self):
+        """Set up a database with enough messages to take several backup steps."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "messages.db")
+        self.backup_dir = os.path.join(self.tmpdir.name, "backups")
+        self.db = ChatHistoryDB(self.db_path)
+        for i in range(200):
+            self.db.store_message("chat", "alice", f"2024-01-01T10:00:{i % 60:02d}Z", f"message {i} " + "x" * 200)
+        self.db.flush()
+        self.manager = BackupManager(self.db_path, self.backup_dir, keep=2, pages_per_step=4, step_pause=0)
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.manager.stop()
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def restore(self, path):
+        """Decompress a snapshot and return the messages stored in it."""
+        restored = os.path.join(self.tmpdir.name, "restored.db")
+        with gzip.open(path, "rb") as source, open(restored, "wb") as target:
+            target.write(source.read())
+        with sqlite3.connect(restored) as conn:
+            self.assertEqual(conn.execute("PRAGMA integrity_check").fetchone()[0], "ok")
+            return conn.execute("SELECT content FROM messages ORDER BY id").fetchall()
+
+    def test_snapshot_restores_every_message(self):
+        """Test that a snapshot is a complete, consistent copy of the database."""
+        path = self.manager.backup(now=datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc))
+
+        self.assertEqual(os.path.basename(path), "messages-20240102T030405Z.db.gz")
+        self.assertEqual(len(self.restore(path)), 200)
+        self.assertGreater(self.manager.last_backup["pages"], 4)
+        self.assertEqual(os.listdir(self.backup_dir), [os.path.basename(path)])
+
+    def test_rotation_keeps_newest(self):
+        """Test that only the newest `keep` snapshots remain."""
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        paths = [self.manager.backup(now=start + timedelta(days=day)) for day in range(4)]
+
+        self.assertEqual(self.manager.list_backups(), paths[:1:-1])
+
+    def test_wal_backup_finishes_under_constant_writes(self):
+        """Test that a WAL backup completes while another connection keeps writing, without blocking it."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+        stop = threading.Event()
+        written = []
+        errors = []
+
+        def write_continuously():
+            with sqlite3.connect(self.db_path, timeout=0) as conn:
+                while not stop.is_set():
+                    try:
+                        conn.execute(
+                            "INSERT INTO messages (chat_id, sender, timestamp, content) "
+                            "VALUES ('chat', 'bob', '2024-01-01T11:00:00Z', 'late')"
+                        )
+                        conn.commit()
+                        written.append(1)
+                    except sqlite3.OperationalError as e:
+                        errors.append(e)
+
+        writer = threading.Thread(target=write_continuously)
+        writer.start()
+        try:
+            paths = [self.manager.backup(now=datetime(2024, 1, 1, i, tzinfo=timezone.utc)) for i in range(3)]
+        finally:
+            stop.set()
+            writer.join()
+
+        self.assertEqual(errors, [])
+        self.assertGreater(len(written), 0)
+        self.assertEqual(self.manager.last_backup["restarts"], 0)
+        self.assertGreaterEqual(len(self.restore(paths[-1])), 200)
+
+    def test_stepped_backup_falls_back_after_restarts(self):
+        """Test that a rollback-journal backup overtaken by writes on every step still finishes."""
+        self.db.close()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        steps = []
+
+        def insert_between_steps(seconds):
+            steps.append(seconds)
+            # The backup is paused between steps, holding no lock; this write restarts it
+            with sqlite3.connect(self.db_path, timeout=0) as conn:
+                conn.execute(
+                    "INSERT INTO messages (chat_id, sender, timestamp, content) "
+                    "VALUES ('chat', 'bob', '2024-01-01T11:00:00Z', 'late')"
+                )
+
+        self.manager.step_pause = 0.01
+        with patch("backup.time.sleep", side_effect=insert_between_steps):
+            path = self.manager.backup()
+
+        rows = self.restore(path)
+        self.assertEqual(self.manager.last_backup["restarts"], self.manager.max_restarts + 1)
+        self.assertEqual(len(rows), 200 + len(steps))
+        self.assertEqual(rows[-1], ("late",))
+
+    def test_trigger_runs_in_background(self):
+        """Test that trigger() starts a backup on the scheduler thread without waiting."""
+        done = threading.Event()
+        original = self.manager.backup
+
+        def backup_and_signal(*args, **kwargs):
+            try:
+                return original(*args, **kwargs)
+            finally:
+                done.set()
+
+        self.manager.backup = backup_and_signal
+        self.manager.start(interval_seconds=0)
+        self.manager.trigger()
+
+        self.assertTrue(done.wait(10))
+        status = self.manager.status()
+        self.assertEqual(len(status["backups"]), 1)
+        self.assertIsNone(status["last_error"])
+
+    def test_schedule_continues_from_newest_snapshot(self):
+        """Test that a recent snapshot postpones the first scheduled backup."""
+        self.assertEqual(self.manager._next_delay(3600), 0)
+        self.manager.backup()
+        self.assertGreater(self.manager._next_delay(3600), 3500)
+        self.assertIsNone(self.manager._next_delay(0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Tests for ChatHistoryDB bulk NDJSON export and import."""
+
+import os
+import sys
+import json
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from chat_history import ChatHistoryDB
+
+
+class TestChatHistoryIO(unittest.TestCase):
+    """Test cases for export_chat, export_all and import_ndjson."""
+
+    def setUp(self):
+        """Set up a source database with a few messages."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.source = ChatHistoryDB(os.path.join(self.tmpdir.name, "source.db"))
+        self.source.store_message("team", "alice", "2024-01-15T09:00:00Z", "Standup at noon")
+        self.source.store_message("family", "carol", "2024-01-15T10:00:00Z", "Dinner at seven")
+        self.source.store_message("team", "bob", "2024-01-15T09:01:00Z", "Which room? ☕")
+
+    def tearDown(self):
+        """Remove the temporary databases."""
+        self.tmpdir.cleanup()
+
+    def write_export(self, lines):
+        path = os.path.join(self.tmpdir.name, "export.ndjson")
+        with open(path, "w", encoding="utf-8") as f:
+            f.writelines(lines)
+        return path
+
+    def test_export_chat_is_chronological(self):
+        """Test that a chat export holds only that chat, oldest first."""
+        records = [json.loads(line) for line in self.source.export_chat("team")]
+        self.assertEqual([r["sender"] for r in records], ["alice", "bob"])
+        self.assertEqual(records[1]["content"], "Which room? ☕")
+        self.assertIn("created_at", records[0])
+
+    def test_round_trip_rebuilds_indexes_and_triggers(self):
+        """Test that an import restores messages, counters, search and triggers."""
+        path = self.write_export(self.source.export_all())
+        target = ChatHistoryDB(os.path.join(self.tmpdir.name, "target.db"))
+
+        self.assertEqual(target.import_ndjson(path, batch_size=2), 3)
+        self.assertEqual(target.get_chat_message_count("team"), 2)
+        self.assertEqual([m[0] for m in target.get_recent_messages("team")], ["bob", "alice"])
+        self.assertEqual(len(target.search_messages("dinner")), 1)
+
+        with sqlite3.connect(target.db_path) as conn:
+            names = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE tbl_name = 'messages'"
+            )}
+        self.assertIn("idx_messages_chat_timestamp_ms", names)
+        self.assertIn("trg_messages_chat_stats_insert", names)
+
+        target.store_message("team", "dave", "2024-01-16T08:00:00Z", "Morning")
+        self.assertEqual(target.get_chat_message_count("team"), 3)
+
+    def test_malformed_line_reports_line_number(self):
+        """Test that a bad line aborts the import but leaves the schema intact."""
+        path = self.write_export(list(self.source.export_all()) + ['{"chat_id": "team"}\n'])
+        target = ChatHistoryDB(os.path.join(self.tmpdir.name, "target.db"))
+
+        with self.assertRaisesRegex(ValueError, "line 4"):
+            target.import_ndjson(path, batch_size=2)
+        self.assertEqual(target.get_chat_message_count("team"), 1)
+        self.assertEqual(len(target.search_messages("standup")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
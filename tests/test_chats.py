@@ -0,0 +1,134 @@
+"""Tests for the active-chat index behind the chats view."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import chat_stats
+import database
+import schema
+from chat_history import ChatHistoryDB
+from models import MessagePayload
+
+
+class TestChats(unittest.TestCase):
+    """Test cases for listing chats by recent activity."""
+
+    def setUp(self):
+        """Set up three chats with interleaved user messages and bot replies."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "history.db")
+        self.db = ChatHistoryDB(self.db_path)
+        for chat_id, sender, timestamp in [
+            ("old", "alice", "2024-01-01T08:00:00Z"),
+            ("busy", "bob", "2024-01-02T09:00:00Z"),
+            ("busy", "bot", "2024-01-02T09:00:05Z"),
+            ("busy", "bob", "2024-01-02T09:10:00Z"),
+            ("busy", "carol", "2024-01-02T09:11:00Z"),
+            ("answered", "dave", "2024-01-02T08:00:00Z"),
+            ("answered", "bot", "2024-01-02T08:00:02Z"),
+        ]:
+            self.db.store_message(chat_id, sender, timestamp, f"{sender} in {chat_id}")
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def test_chats_listed_by_activity_with_unread_counts(self):
+        """Test that chats come newest first with messages counted since the last bot reply."""
+        chats = self.db.list_chats()
+
+        self.assertEqual([c["chat_id"] for c in chats], ["busy", "answered", "old"])
+        self.assertEqual([c["unread_count"] for c in chats], [2, 0, 1])
+        self.assertEqual(chats[0]["message_count"], 4)
+        self.assertEqual(chats[0]["last_sender"], "carol")
+        self.assertEqual(chats[0]["last_message_at"], "2024-01-02T09:11:00Z")
+
+    def test_active_since_and_limit(self):
+        """Test that active_since and limit select the most recently active chats."""
+        since = self.db.list_chats(active_since=datetime(2024, 1, 2))
+        self.assertEqual([c["chat_id"] for c in since], ["busy", "answered"])
+        self.assertEqual([c["chat_id"] for c in self.db.list_chats(limit=1)], ["busy"])
+
+    def test_bot_reply_and_deletes_update_unread(self):
+        """Test that a bot reply clears unread messages and deleting one decrements them."""
+        self.db.store_message("busy", "bot", "2024-01-02T09:12:00Z", "reply")
+        self.db.store_message("old", "alice", "2024-01-03T08:00:00Z", "again")
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM messages WHERE chat_id = 'old' AND timestamp LIKE '2024-01-03%'")
+
+        chats = {c["chat_id"]: c for c in self.db.list_chats()}
+        self.assertEqual(chats["busy"]["unread_count"], 0)
+        self.assertEqual(chats["old"]["unread_count"], 1)
+        self.assertEqual(chats["old"]["last_message_at"], "2024-01-01T08:00:00Z")
+
+    def test_mixed_timestamp_formats_order_by_instant(self):
+        """Test that first/last message and chat order follow the instant, not the timestamp text."""
+        # " 11:00" sorts before "T10:00" as text but is an hour later
+        self.db.store_message("mixed", "alice", "2024-01-03T10:00:00Z", "first")
+        self.db.store_message("mixed", "bob", "2024-01-03 11:00:00", "last")
+        self.db.store_message("middle", "carol", "2024-01-03T10:30:00+00:00", "between")
+
+        def stats():
+            with sqlite3.connect(self.db_path) as conn:
+                return {chat["chat_id"]: chat for chat in chat_stats.list_chat_stats(conn, limit=2)}
+
+        chats = stats()
+        self.assertEqual(list(chats), ["mixed", "middle"])
+        self.assertEqual(chats["mixed"]["first_timestamp"], "2024-01-03T10:00:00Z")
+        self.assertEqual(chats["mixed"]["last_timestamp"], "2024-01-03 11:00:00")
+        self.assertEqual(chats["mixed"]["last_sender"], "bob")
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DELETE FROM messages WHERE content = 'last'")
+            stored = conn.execute("SELECT * FROM chat_stats WHERE chat_id = 'mixed'").fetchone()
+            chat_stats.rebuild(conn)
+            self.assertEqual(conn.execute("SELECT * FROM chat_stats WHERE chat_id = 'mixed'").fetchone(), stored)
+        chats = stats()
+        self.assertEqual(list(chats), ["middle", "mixed"])
+        self.assertEqual(chats["mixed"]["last_sender"], "alice")
+
+    def test_existing_stats_are_upgraded(self):
+        """Test that a database from before the activity columns gets them filled in."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("DROP VIEW chats")
+            conn.execute("DROP TABLE chat_stats")
+            conn.execute("""
+                CREATE TABLE chat_stats (
+                    chat_id TEXT PRIMARY KEY, message_count INTEGER NOT NULL DEFAULT 0,
+                    first_timestamp DATETIME, last_timestamp DATETIME, last_sender TEXT
+                )
+            """)
+            conn.execute(f"PRAGMA user_version = {schema.MIGRATIONS.index(schema._chat_activity)}")
+
+        schema.initialize(self.db_path)
+
+        self.assertEqual([c["unread_count"] for c in self.db.list_chats()], [2, 0, 1])
+
+    def test_webhook_storage_lists_chats_across_shards(self):
+        """Test that database.py merges the chats of every shard."""
+        with patch.object(database, "DATABASE_PATH", os.path.join(self.tmpdir.name, "messages.db")), \
+                patch.object(database, "NUM_SHARDS", 3):
+            database.init_database()
+            for i in range(6):
+                database.store_message(MessagePayload(
+                    sender_id="alice", chat_id=f"chat-{i}", timestamp=datetime(2024, 1, 1, 10, i),
+                    message_text="hello", message_id=f"m{i}"
+                ))
+            chats = database.list_chats(active_since=datetime(2024, 1, 1, 10, 2), limit=3)
+
+        self.assertEqual([c["chat_id"] for c in chats], ["chat-5", "chat-4", "chat-3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
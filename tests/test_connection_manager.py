@@ -0,0 +1,100 @@
+"""Tests for the pooled SQLite connection manager."""
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from connection_manager import ConnectionManager
+
+
+class TestConnectionManager(unittest.TestCase):
+    """Test cases for the ConnectionManager class."""
+
+    def setUp(self):
+        """Set up a manager on a temporary database."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "test.db")
+        self.manager = ConnectionManager(self.db_path)
+        with self.manager.writer() as conn:
+            conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+
+    def tearDown(self):
+        """Close connections and remove the temporary database."""
+        self.manager.close()
+        self.tmpdir.cleanup()
+
+    def test_pragmas_applied(self):
+        """Test that connections are opened in WAL mode with synchronous=NORMAL."""
+        with self.manager.reader() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)
+            self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -self.manager.cache_size_kb)
+
+    def test_connections_are_reused(self):
+        """Test that connections are returned to the pool and handed out again."""
+        with self.manager.reader() as first:
+            pass
+        with self.manager.reader() as second:
+            self.assertIs(first, second)
+        with self.manager.writer() as first:
+            pass
+        with self.manager.writer() as second:
+            self.assertIs(first, second)
+
+    def test_writer_commits_and_rolls_back(self):
+        """Test that writer blocks commit on success and roll back on error."""
+        with self.manager.writer() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('kept')")
+
+        with self.assertRaises(RuntimeError):
+            with self.manager.writer() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('dropped')")
+                raise RuntimeError("boom")
+
+        with self.manager.reader() as conn:
+            names = [row[0] for row in conn.execute("SELECT name FROM items")]
+        self.assertEqual(names, ["kept"])
+
+    def test_nested_writer_joins_outer_transaction(self):
+        """Test that an inner writer block does not commit on its own."""
+        with self.assertRaises(RuntimeError):
+            with self.manager.writer() as outer:
+                with self.manager.writer() as inner:
+                    inner.execute("INSERT INTO items (name) VALUES ('inner')")
+                raise RuntimeError("boom")
+
+        with self.manager.reader() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM items").fetchone()[0], 0)
+
+    def test_reader_pool_is_bounded(self):
+        """Test that threads share at most max_readers reader connections."""
+        manager = ConnectionManager(self.db_path, max_readers=2)
+        seen = set()
+        lock = threading.Lock()
+
+        def read():
+            for _ in range(20):
+                with manager.reader() as conn:
+                    conn.execute("SELECT COUNT(*) FROM items").fetchone()
+                    with lock:
+                        seen.add(id(conn))
+
+        threads = [threading.Thread(target=read) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        manager.close()
+
+        self.assertLessEqual(len(seen), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
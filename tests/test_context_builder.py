@@ -0,0 +1,103 @@
+"""Tests for token-budgeted prompt context."""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from context_builder import (
+    ContextBuilder, TRUNCATION_MARKER, estimate_tokens, message_tokens, truncate_to_tokens
+)
+
+SYSTEM = "You are a helpful assistant."
+
+
+def prompt_tokens(messages):
+    return sum(message_tokens(m["content"]) for m in messages)
+
+
+class TestTokenEstimates(unittest.TestCase):
+    """Test cases for the local token estimator."""
+
+    def test_estimates_track_text_length(self):
+        """Test that estimates grow with words, long words, digits and wide characters."""
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("Hello, world!"), 4)
+        self.assertEqual(estimate_tokens("internationalization"), 4)
+        self.assertEqual(estimate_tokens("1234567"), 3)
+        self.assertEqual(estimate_tokens("日本"), 4)
+        self.assertGreater(estimate_tokens("word " * 1000), estimate_tokens("word " * 100))
+
+    def test_estimates_are_cached(self):
+        """Test that a message's estimate is computed once."""
+        estimate_tokens.cache_clear()
+        for _ in range(3):
+            estimate_tokens("the same message")
+        info = estimate_tokens.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 2))
+
+    def test_truncate_keeps_beginning(self):
+        """Test that truncation keeps the longest prefix that fits."""
+        text = " ".join(f"word{i}" for i in range(500))
+        self.assertIs(truncate_to_tokens("short text", 50), "short text")
+
+        truncated = truncate_to_tokens(text, 100)
+
+        self.assertTrue(truncated.startswith("word0 word1"))
+        self.assertTrue(truncated.endswith(TRUNCATION_MARKER))
+        self.assertLessEqual(estimate_tokens(truncated), 100)
+        self.assertGreater(estimate_tokens(truncated), 90)
+
+
+class TestContextBuilder(unittest.TestCase):
+    """Test cases for ContextBuilder."""
+
+    def test_short_chats_send_all_history(self):
+        """Test that history is not capped at a fixed number of turns."""
+        history = [("user" if i % 2 else "assistant", f"msg {i}") for i in range(40)]
+        messages = ContextBuilder(SYSTEM).build(history, "and now?")
+
+        self.assertEqual(len(messages), 42)
+        self.assertEqual(messages[0], {"role": "system", "content": SYSTEM})
+        self.assertEqual(messages[1], {"role": "assistant", "content": "msg 0"})
+        self.assertEqual(messages[-1], {"role": "user", "content": "and now?"})
+
+    def test_oldest_turns_dropped_to_fit_budget(self):
+        """Test that the newest turns that fit are kept, leaving room for the completion."""
+        builder = ContextBuilder(SYSTEM, max_context_tokens=300, max_completion_tokens=100)
+        history = [("user", f"turn {i} " + "filler " * 20) for i in range(10)]
+
+        messages = builder.build(history, "question")
+
+        kept = [m["content"] for m in messages[1:-1]]
+        self.assertTrue(kept)
+        self.assertTrue(kept[-1].startswith("turn 9 "))
+        self.assertFalse(any(c.startswith("turn 0 ") for c in kept))
+        self.assertLessEqual(prompt_tokens(messages), builder.prompt_budget)
+
+    def test_long_pasted_message_is_bounded(self):
+        """Test that a huge history turn stops the history and a huge current message is truncated."""
+        builder = ContextBuilder(SYSTEM, max_context_tokens=500, max_completion_tokens=150)
+        pasted = "lorem ipsum " * 5000
+        history = [("user", "older"), ("user", pasted), ("assistant", "recent")]
+
+        messages = builder.build(history, pasted)
+
+        self.assertEqual([m["content"] for m in messages[1:-1]], [])
+        self.assertTrue(messages[-1]["content"].endswith(TRUNCATION_MARKER))
+        self.assertLessEqual(prompt_tokens(messages), builder.prompt_budget)
+
+        messages = builder.build(history, "hi")
+        self.assertEqual([m["content"] for m in messages[1:-1]], ["recent"])
+
+    def test_completion_must_fit_budget(self):
+        """Test that the completion reserve must leave room for a prompt."""
+        with self.assertRaises(ValueError):
+            ContextBuilder(SYSTEM, max_context_tokens=100, max_completion_tokens=100)
+
+
+if __name__ == "__main__":
+    unittest.main()
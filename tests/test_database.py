@@ -0,0 +1,151 @@
+"""Tests for the FastAPI webhook message storage."""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import database
+from models import MessagePayload
+
+
+class TestDatabase(unittest.TestCase):
+    """Test cases for database.py storage functions."""
+
+    def setUp(self):
+        """Point the module at a temporary database."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.patcher = patch.object(database, "DATABASE_PATH", os.path.join(self.tmpdir.name, "messages.db"))
+        self.patcher.start()
+        database.init_database()
+
+    def tearDown(self):
+        """Remove the temporary database."""
+        self.patcher.stop()
+        self.tmpdir.cleanup()
+
+    def store(self, chat_id, count, start=datetime(2024, 1, 1, 10, 0)):
+        for i in range(count):
+            database.store_message(MessagePayload(
+                sender_id="alice",
+                chat_id=chat_id,
+                timestamp=start + timedelta(minutes=i),
+                message_text=f"message {i}",
+                message_id=f"{chat_id}-{i}"
+            ))
+
+    def test_cursor_round_trip(self):
+        """Test that cursors decode back to the values they were built from."""
+        token = database.encode_cursor(1704103200000, 42)
+        self.assertEqual(database.decode_cursor(token), (1704103200000, 42))
+        with self.assertRaises(ValueError):
+            database.decode_cursor("not-a-cursor")
+
+    def test_pages_cover_history_without_overlap(self):
+        """Test that following next_cursor walks the whole chat exactly once."""
+        self.store("chat", 7)
+        self.store("other", 3)
+
+        seen = []
+        cursor = None
+        while True:
+            page, cursor = database.get_messages_page("chat", 3, cursor)
+            seen.extend(message.message_text for message in page)
+            if cursor is None:
+                break
+
+        self.assertEqual(seen, [f"message {i}" for i in reversed(range(7))])
+
+    def test_failed_page_read_returns_its_connection(self):
+        """Test that a page query that raises hands its reader back to the pool."""
+        self.store("chat", 2)
+        manager = database.get_connection_manager(database._shard_path("chat"))
+
+        with patch.object(database, "_select_chat_page", return_value=("SELECT * FROM missing", ())):
+            with self.assertRaises(Exception):
+                database.get_messages_page("chat", 3)
+
+        self.assertEqual(manager._idle_readers.qsize(), len(manager._readers))
+        self.assertEqual(len(database.get_messages_page("chat", 3)[0]), 2)
+
+    def test_records_match_validated_models(self):
+        """Test that the lightweight read path returns the same rows and cursor."""
+        self.store("chat", 4)
+
+        messages, cursor = database.get_messages_page("chat", 3)
+        records, record_cursor = database.get_message_records("chat", 3)
+        self.assertEqual(record_cursor, cursor)
+        self.assertEqual([r.id for r in records], [m.id for m in messages])
+
+        row = records[0].to_dict()
+        self.assertEqual(row["timestamp"], messages[0].timestamp.isoformat())
+        self.assertEqual(row["timestamp_ms"], 1704103380000)
+
+    def test_stream_resumes_from_row_cursor(self):
+        """Test that a streamed row's cursor resumes the stream after it."""
+        self.store("chat", 5)
+
+        rows = list(database.iter_messages_by_chat("chat"))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]["timestamp"], "2024-01-01T10:04:00")
+
+        rest = list(database.iter_messages_by_chat("chat", rows[1]["cursor"]))
+        self.assertEqual([row["id"] for row in rest], [row["id"] for row in rows[2:]])
+
+    def test_chat_stats_track_inserts_and_deletes(self):
+        """Test that the trigger-maintained counters match the messages table."""
+        self.store("chat", 4)
+        self.store("other", 2, start=datetime(2024, 2, 1))
+
+        self.assertEqual(database.get_message_count(), 6)
+        stats = database.get_chat_stats()
+        self.assertEqual(stats["total_chats"], 2)
+        self.assertEqual([chat["chat_id"] for chat in stats["chats"]], ["other", "chat"])
+        self.assertEqual(stats["chats"][1]["message_count"], 4)
+
+        conn = database.sqlite3.connect(database.DATABASE_PATH)
+        conn.execute("DELETE FROM messages WHERE chat_id = 'chat' AND message_id = 'chat-3'")
+        conn.commit()
+        conn.close()
+
+        chat = database.get_chat_stats()["chats"][1]
+        self.assertEqual(chat["message_count"], 3)
+        self.assertEqual(chat["last_timestamp"], "2024-01-01 10:02:00")
+
+    def test_replayed_message_is_ignored(self):
+        """Test that a second delivery of the same message_id is not stored."""
+        self.store("chat", 2)
+        replay = MessagePayload(
+            sender_id="alice", chat_id="chat", timestamp=datetime(2024, 1, 1, 10, 0),
+            message_text="message 0", message_id="chat-0"
+        )
+
+        self.assertTrue(database.is_duplicate(replay))
+        self.assertIsNone(database.store_message(replay))
+        self.assertIsNotNone(database.store_message(replay.model_copy(update={"chat_id": "other"})))
+        self.assertEqual(database.get_message_count(), 3)
+
+    def test_unique_index_catches_keys_missing_from_filter(self):
+        """Test that the unique index still rejects duplicates the Bloom filter has not seen."""
+        self.store("chat", 1)
+        database.init_database()
+        database._seen_messages = database.BloomFilter(100)
+
+        replay = MessagePayload(
+            sender_id="alice", chat_id="chat", timestamp=datetime(2024, 1, 1, 10, 0),
+            message_text="message 0", message_id="chat-0"
+        )
+        self.assertFalse(database.is_duplicate(replay))
+        self.assertIsNone(database.store_message(replay))
+        self.assertEqual(database.get_message_count(), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Tests for the epoch-millisecond ordering key."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import epoch_ms
+from chat_history import ChatHistoryDB
+
+
+class TestEpochMs(unittest.TestCase):
+    """Test cases for timestamp_ms ordering and its backfill."""
+
+    def setUp(self):
+        """Set up a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "history.db")
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.tmpdir.cleanup()
+
+    def test_mixed_iso_variants_sort_chronologically(self):
+        """Test that differently formatted timestamps are ordered by instant."""
+        db = ChatHistoryDB(self.db_path)
+        db.store_message("chat", "alice", "2024-01-15T09:00:00.250+00:00", "second")
+        db.store_message("chat", "bob", "2024-01-15T10:30:00+02:00", "first")
+        db.store_message("chat", "carol", "2024-01-15 09:00:01", "third")
+        db.store_message("chat", "dave", "2024-01-15T09:00:00.5Z", "between")
+
+        messages = db.get_recent_messages("chat")
+        self.assertEqual([content for _, _, content, _ in messages], ["third", "between", "second", "first"])
+
+    def test_backfill_migrates_legacy_rows(self):
+        """Test that rows written before the column existed are filled in batches."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO messages (chat_id, sender, timestamp, content) VALUES ('chat', 'alice', ?, ?)",
+                [(f"2024-01-15T09:{minute:02d}:00Z", f"m{minute}") for minute in range(7)] +
+                [("not a date", "undated")]
+            )
+
+        db = ChatHistoryDB(self.db_path)
+        with sqlite3.connect(self.db_path) as conn:
+            pending = conn.execute("SELECT COUNT(*) FROM messages WHERE timestamp_ms IS NULL").fetchone()[0]
+            first = conn.execute("SELECT timestamp_ms FROM messages WHERE content = 'm0'").fetchone()[0]
+        self.assertEqual(pending, 1)
+        self.assertEqual(first, 1705309200000)
+        self.assertEqual(epoch_ms.backfill(self.db_path, batch_size=3), 0)
+        self.assertEqual(db.get_recent_messages("chat")[-1][2], "undated")
+
+
+if __name__ == "__main__":
+    unittest.main()
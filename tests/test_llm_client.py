@@ -0,0 +1,154 @@
+"""Tests for the shared, pooled OpenAI client manager."""
+
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import llm_client
+from llm_client import LLMClientManager, get_llm_client_manager
+
+
+class FakeCompletions:
+    """Stands in for client.chat.completions, recording peak concurrency."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _exit(self):
+        with self.lock:
+            self.active -= 1
+
+    def create(self, **params):
+        self._enter()
+        try:
+            time.sleep(self.delay)
+            return params
+        finally:
+            self._exit()
+
+
+class FakeAsyncCompletions(FakeCompletions):
+    """Async variant; streams yield three chunks while holding the request open."""
+
+    async def create(self, stream=False, **params):
+        self._enter()
+        if stream:
+            return self._stream()
+        try:
+            await asyncio.sleep(self.delay)
+            return params
+        finally:
+            self._exit()
+
+    async def _stream(self):
+        try:
+            for chunk in ("a", "b", "c"):
+                await asyncio.sleep(self.delay / 3)
+                yield chunk
+        finally:
+            self._exit()
+
+
+def fake_client(completions):
+    return SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+
+class TestLLMClientManager(unittest.TestCase):
+    """Test cases for LLMClientManager."""
+
+    def tearDown(self):
+        """Drop managers created through get_llm_client_manager."""
+        llm_client.close_all()
+
+    def test_process_wide_manager_and_client(self):
+        """Test that callers share one manager and one pooled client with explicit timeouts."""
+        manager = get_llm_client_manager("sk-test", connect_timeout=2, read_timeout=30, max_concurrent=3)
+        self.assertIs(get_llm_client_manager("sk-test", max_concurrent=99), manager)
+        self.assertEqual(manager.max_concurrent, 3)
+
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(manager.client)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len({id(client) for client in clients}), 1)
+        self.assertEqual(manager.client.timeout, httpx.Timeout(30, connect=2))
+
+    def test_sync_requests_limited_to_max_concurrent(self):
+        """Test that threads beyond max_concurrent wait for a request slot."""
+        manager = LLMClientManager("sk-test", max_concurrent=2)
+        completions = FakeCompletions()
+        manager._client = fake_client(completions)
+
+        threads = [
+            threading.Thread(target=manager.create_chat_completion, kwargs={"model": "m", "messages": []})
+            for _ in range(6)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(completions.peak, 2)
+        self.assertEqual(manager.create_chat_completion(model="m"), {"model": "m"})
+
+    def test_async_requests_and_streams_limited(self):
+        """Test that async completions and streams share the loop's request slots."""
+        manager = LLMClientManager("sk-test", max_concurrent=2)
+        completions = FakeAsyncCompletions()
+
+        async def run():
+            client, slots = manager._async_client()
+            manager._async_clients[asyncio.get_running_loop()] = (fake_client(completions), slots)
+
+            async def stream():
+                return [chunk async for chunk in manager.astream_chat_completion(model="m")]
+
+            results = await asyncio.gather(
+                *[manager.acreate_chat_completion(model="m") for _ in range(3)],
+                *[stream() for _ in range(3)]
+            )
+            await client.close()
+            return results
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results[:3], [{"model": "m"}] * 3)
+        self.assertEqual(results[3:], [["a", "b", "c"]] * 3)
+        self.assertEqual(completions.peak, 2)
+        self.assertEqual(completions.active, 0)
+
+    def test_async_client_per_event_loop(self):
+        """Test that each event loop gets its own async client."""
+        manager = LLMClientManager("sk-test")
+
+        async def client_of_loop():
+            client = manager.async_client
+            self.assertIs(manager.async_client, client)
+            await manager.aclose()
+            return client
+
+        self.assertIsNot(asyncio.run(client_of_loop()), asyncio.run(client_of_loop()))
+
+
+if __name__ == "__main__":
+    unittest.main()
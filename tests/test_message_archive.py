@@ -0,0 +1,77 @@
+"""Tests for time-partitioned message archiving."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from chat_history import ChatHistoryDB
+
+
+class TestMessageArchiver(unittest.TestCase):
+    """Test cases for archiving through ChatHistoryDB."""
+
+    def setUp(self):
+        """Set up a database with messages spread over three months."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "history.db")
+        self.archive_dir = os.path.join(self.tmpdir.name, "archive")
+        self.db = ChatHistoryDB(self.db_path)
+        for month in (1, 2, 3):
+            for day in (1, 2):
+                self.db.store_message("chat", "alice", f"2024-{month:02d}-{day:02d}T10:00:00Z",
+                                      f"message {month}-{day}")
+        self.archiver = self.db.enable_archiving(self.archive_dir, max_age_days=30)
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def hot_count(self):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+
+    def test_old_messages_move_to_monthly_files(self):
+        """Test that messages older than the cutoff land in per-month archives."""
+        moved = self.archiver.archive(now=datetime(2024, 3, 15))
+
+        self.assertEqual(moved, {"2024-01": 2, "2024-02": 2})
+        self.assertEqual(self.archiver.list_months(), ["2024-02", "2024-01"])
+        self.assertEqual(self.hot_count(), 2)
+
+    def test_cutoff_compares_instants(self):
+        """Test that the cutoff applies to the instant, not to the date in the timestamp text."""
+        # 2024-02-14 04:30 UTC, after the 2024-02-14 cutoff although its text reads the 13th
+        self.db.store_message("chat", "bob", "2024-02-13T23:30:00-05:00", "late evening")
+        self.db.store_message("chat", "bob", "2024-02-13 23:30:00", "before the cutoff")
+
+        self.archiver.batch_size = 2
+        moved = self.archiver.archive(now=datetime(2024, 3, 15))
+
+        self.assertEqual(moved, {"2024-01": 2, "2024-02": 3})
+        self.assertEqual(self.hot_count(), 3)
+
+    def test_archiving_is_idempotent(self):
+        """Test that a second run finds nothing left to move."""
+        self.archiver.archive(now=datetime(2024, 3, 15))
+        self.assertEqual(self.archiver.archive(now=datetime(2024, 3, 15)), {})
+
+    def test_history_reads_continue_into_archives(self):
+        """Test that recent-message reads span the hot table and archives in order."""
+        self.archiver.archive(now=datetime(2024, 3, 15))
+
+        messages = self.db.get_recent_messages("chat", limit=5)
+        self.assertEqual([content for _, _, content, _ in messages],
+                         ["message 3-2", "message 3-1", "message 2-2", "message 2-1", "message 1-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
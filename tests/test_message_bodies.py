@@ -0,0 +1,101 @@
+"""Tests for shared storage of repeated message bodies."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from chat_history import ChatHistoryDB
+from connection_manager import ConnectionManager
+from epoch_ms import epoch_ms_sql
+from message_bodies import BodyInterner, insert_values_sql
+
+HELP_TEXT = "Available commands: help, summary. Anything else is answered by the assistant."
+
+# The insert app.py uses for bot replies
+INSERT_SQL = f"""
+    INSERT INTO messages (chat_id, sender, timestamp, content, body_id, timestamp_ms)
+    VALUES (?1, 'bot', ?2, {insert_values_sql('?3', '?4')}, {epoch_ms_sql('?2')})
+"""
+
+
+class TestMessageBodies(unittest.TestCase):
+    """Test cases for BodyInterner and the read paths that resolve shared bodies."""
+
+    def setUp(self):
+        """Set up a database with a connection manager and an interner."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "messages.db")
+        self.db = ChatHistoryDB(self.db_path)
+        self.manager = ConnectionManager(self.db_path)
+        self.interner = BodyInterner(self.manager)
+        self.minute = 0
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.db.close()
+        self.manager.close()
+        self.tmpdir.cleanup()
+
+    def reply(self, chat_id, content, body_id="intern"):
+        if body_id == "intern":
+            body_id = self.interner.intern(content)
+        self.minute += 1
+        with self.manager.writer() as conn:
+            conn.execute(INSERT_SQL, (chat_id, f"2024-01-01T10:{self.minute:02d}:00Z", content, body_id))
+        return body_id
+
+    def query(self, sql):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql).fetchall()
+
+    def test_repeated_body_is_stored_once(self):
+        """Test that a body is shared from its second occurrence and reads resolve it."""
+        ids = [self.reply("chat", HELP_TEXT) for _ in range(4)]
+
+        self.assertIsNone(ids[0])
+        self.assertEqual(len(set(ids[1:])), 1)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM messages WHERE content = ''")[0][0], 3)
+        self.assertEqual(self.query("SELECT ref_count FROM message_bodies")[0][0], 3)
+        self.assertEqual([content for _, _, content, _ in self.db.get_recent_messages("chat")], [HELP_TEXT] * 4)
+
+    def test_short_and_unique_bodies_stay_inline(self):
+        """Test that short replies are never shared and one-offs are not interned."""
+        self.assertIsNone(self.reply("chat", "OK"))
+        self.assertIsNone(self.reply("chat", "OK"))
+        self.assertIsNone(self.reply("chat", HELP_TEXT))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM message_bodies")[0][0], 0)
+
+    def test_body_is_deleted_with_last_reference(self):
+        """Test that deleting every referencing message deletes the body."""
+        self.reply("chat", HELP_TEXT)
+        body_id = self.reply("chat", HELP_TEXT)
+        self.assertTrue(self.db.delete_chat_history("chat"))
+        self.assertEqual(self.query("SELECT COUNT(*) FROM message_bodies")[0][0], 0)
+
+        # A reference to the deleted body falls back to storing the text inline
+        self.reply("other", HELP_TEXT, body_id=body_id)
+        self.assertEqual(self.query("SELECT content, body_id FROM messages"), [(HELP_TEXT, None)])
+
+    def test_export_and_archive_resolve_bodies(self):
+        """Test that exports and archive files carry the full text."""
+        for _ in range(3):
+            self.reply("chat", HELP_TEXT)
+        exported = list(self.db.export_chat("chat"))
+        self.assertTrue(all(HELP_TEXT in line for line in exported))
+
+        archiver = self.db.enable_archiving(os.path.join(self.tmpdir.name, "archive"), max_age_days=30)
+        self.assertEqual(archiver.archive(now=datetime(2024, 3, 1)), {"2024-01": 3})
+        self.assertEqual(self.query("SELECT COUNT(*) FROM message_bodies")[0][0], 0)
+        self.assertEqual([content for _, _, content, _ in self.db.get_recent_messages("chat")], [HELP_TEXT] * 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Tests for the per-chat recent message cache."""
+
+import sys
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from message_cache import RecentMessageCache
+
+
+def make_messages(count, prefix="m"):
+    return [{"sender": "alice", "content": f"{prefix}{i}", "timestamp": str(i), "id": i} for i in range(count)]
+
+
+class TestRecentMessageCache(unittest.TestCase):
+    """Test cases for the RecentMessageCache class."""
+
+    def setUp(self):
+        """Set up a small cache."""
+        self.cache = RecentMessageCache(per_chat=5)
+
+    def warm(self, chat_id, messages, complete):
+        self.cache.begin_warm(chat_id)
+        self.cache.finish_warm(chat_id, messages, complete)
+
+    def test_miss_then_hit(self):
+        """Test that a chat is served from memory once warmed."""
+        self.assertIsNone(self.cache.get("chat", 3))
+        self.warm("chat", make_messages(5), complete=False)
+
+        self.assertEqual([m["content"] for m in self.cache.get("chat", 3)], ["m2", "m3", "m4"])
+        self.assertEqual(self.cache.stats()["hits"], 1)
+
+    def test_limit_beyond_buffer_misses_unless_complete(self):
+        """Test that reads larger than the buffer only hit for fully cached chats."""
+        self.warm("long", make_messages(5), complete=False)
+        self.warm("short", make_messages(2), complete=True)
+
+        self.assertIsNone(self.cache.get("long", 10))
+        self.assertEqual(len(self.cache.get("short", 10)), 2)
+
+    def test_append_is_write_through_and_bounded(self):
+        """Test that appends land in the ring buffer and push out the oldest."""
+        self.warm("chat", make_messages(2), complete=True)
+        for message in make_messages(5, prefix="new"):
+            self.cache.append("chat", message)
+
+        self.assertEqual([m["content"] for m in self.cache.get("chat", 5)],
+                         ["new0", "new1", "new2", "new3", "new4"])
+        self.assertIsNone(self.cache.get("chat", 6))
+
+    def test_write_during_warm_discards_stale_read(self):
+        """Test that a warm-up racing with a write does not install stale history."""
+        self.cache.begin_warm("chat")
+        self.cache.append("chat", make_messages(1, prefix="late")[0])
+        self.cache.finish_warm("chat", make_messages(3), complete=True)
+
+        self.assertIsNone(self.cache.get("chat", 1))
+
+    def test_warm_during_write_is_discarded(self):
+        """Test that a warm-up reading a row before its append does not cache it twice."""
+        with self.cache.writing("chat"):
+            # Row committed; a concurrent miss warms and reads it
+            self.warm("chat", make_messages(3), complete=True)
+            self.cache.append("chat", make_messages(3)[-1])
+        self.assertIsNone(self.cache.get("chat", 3))
+
+        self.warm("chat", make_messages(3), complete=True)
+        self.assertEqual(self.cache.get("chat", 5), make_messages(3))
+
+    def test_lru_eviction_under_memory_cap(self):
+        """Test that the least recently used chat is evicted first."""
+        cache = RecentMessageCache(per_chat=5, max_bytes=5000)
+        for chat_id in ("a", "b"):
+            cache.begin_warm(chat_id)
+            cache.finish_warm(chat_id, make_messages(5), complete=True)
+        cache.get("a", 1)
+        cache.begin_warm("c")
+        cache.finish_warm("c", make_messages(5), complete=True)
+
+        self.assertIsNone(cache.get("b", 1))
+        self.assertIsNotNone(cache.get("a", 1))
+        self.assertLessEqual(cache.stats()["bytes"], 5000)
+
+
+if __name__ == "__main__":
+    unittest.main()
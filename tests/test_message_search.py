@@ -0,0 +1,56 @@
+"""Tests for full-text message search."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from chat_history import ChatHistoryDB
+from message_search import to_match_query
+
+
+class TestMessageSearch(unittest.TestCase):
+    """Test cases for FTS5 search through ChatHistoryDB."""
+
+    def setUp(self):
+        """Set up a database with a few messages."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = ChatHistoryDB(os.path.join(self.tmpdir.name, "history.db"))
+        self.db.store_message("team", "alice", "2024-01-15T09:00:00Z", "Standup meeting moved to noon")
+        self.db.store_message("team", "bob", "2024-01-15T09:01:00Z", "Which meeting room?")
+        self.db.store_message("family", "carol", "2024-01-15T10:00:00Z", "Dinner meeting at seven")
+
+    def tearDown(self):
+        """Remove the temporary database."""
+        self.tmpdir.cleanup()
+
+    def test_search_ranks_and_highlights(self):
+        """Test that matches come back with snippets across chats."""
+        results = self.db.search_messages("meeting")
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all("[meeting]" in result["snippet"].lower() for result in results))
+        self.assertEqual(results, sorted(results, key=lambda result: result["score"]))
+
+    def test_search_filters_by_chat(self):
+        """Test that chat_id restricts results to one chat."""
+        results = self.db.search_messages("meeting", chat_id="family")
+        self.assertEqual([result["sender"] for result in results], ["carol"])
+
+    def test_index_follows_deletes(self):
+        """Test that deleted messages disappear from the index."""
+        self.db.delete_chat_history("team")
+        self.assertEqual(len(self.db.search_messages("meeting")), 1)
+
+    def test_user_input_is_escaped(self):
+        """Test that FTS5 operators in user input are treated as plain words."""
+        self.assertEqual(to_match_query('room? -"noon" OR'), '"room" "noon" "OR"')
+        self.assertEqual(len(self.db.search_messages('meeting room?')), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
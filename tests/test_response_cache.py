@@ -0,0 +1,157 @@
+"""Tests for the LLM response cache."""
+
+import os
+import sys
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from response_cache import ResponseCache, cache_key, normalize_text, parse_routes
+
+SYSTEM = {"role": "system", "content": "You are a helpful assistant."}
+
+
+def key_for(text, history=(), **params):
+    messages = [SYSTEM, *history, {"role": "user", "content": text}]
+    return cache_key("gpt-3.5-turbo", messages, max_tokens=150, **params)
+
+
+class TestCacheKeys(unittest.TestCase):
+    """Test cases for prompt normalisation and keys."""
+
+    def test_near_identical_prompts_share_a_key(self):
+        """Test that case, spacing and surrounding punctuation are ignored."""
+        self.assertEqual(normalize_text("  What can   you DO?! "), "what can you do")
+        self.assertEqual(key_for("Hello!"), key_for("hello"))
+        self.assertEqual(key_for("what can you do?"), key_for("What  can you do"))
+
+    def test_prompt_parts_and_parameters_change_the_key(self):
+        """Test that context, wording and generation parameters are part of the key."""
+        self.assertNotEqual(key_for("hello"), key_for("hello there"))
+        self.assertNotEqual(key_for("yes"), key_for("yes", history=[{"role": "assistant", "content": "Ready?"}]))
+        self.assertNotEqual(key_for("hello"), key_for("hello", temperature=0.2))
+
+    def test_parse_routes(self):
+        """Test route lists from configuration."""
+        self.assertEqual(parse_routes("chat, summary,"), ["chat", "summary"])
+        self.assertIsNone(parse_routes("*"))
+        self.assertEqual(parse_routes(""), [])
+
+
+class TestResponseCache(unittest.TestCase):
+    """Test cases for ResponseCache."""
+
+    def setUp(self):
+        """Set up a temporary directory for the disk tier."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "llm_cache.db")
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.tmpdir.cleanup()
+
+    def test_hits_misses_and_lru_eviction(self):
+        """Test that the least recently used entry is evicted and counters add up."""
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        self.assertEqual(cache.get("a"), "A")
+        cache.put("c", "C")
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "C")
+        self.assertEqual(cache.stats(), {
+            "entries": 2, "hits": 2, "disk_hits": 0, "misses": 1,
+            "hit_rate": 0.6667, "evictions": 1, "expirations": 0,
+        })
+
+    def test_entries_expire(self):
+        """Test that entries are not served after their TTL."""
+        cache = ResponseCache(ttl_seconds=60)
+        with patch("response_cache.time.time", return_value=1000.0):
+            cache.put("a", "A")
+        with patch("response_cache.time.time", return_value=1059.0):
+            self.assertEqual(cache.get("a"), "A")
+        with patch("response_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_disk_tier_survives_restart_and_promotes(self):
+        """Test that the SQLite tier serves entries evicted from memory or from a previous process."""
+        cache = ResponseCache(max_entries=1, db_path=self.db_path)
+        cache.put("a", "A")
+        cache.put("b", "B")
+        self.assertEqual(cache.get("a"), "A")
+        cache.close()
+
+        restarted = ResponseCache(max_entries=1, db_path=self.db_path)
+        self.assertEqual(restarted.get("b"), "B")
+        self.assertEqual(restarted.get("b"), "B")
+        self.assertEqual(restarted.stats()["disk_hits"], 1)
+        restarted.close()
+
+    def test_disk_lookups_do_not_block_memory_hits(self):
+        """Test that a slow disk-tier read holds no lock other lookups need."""
+        cache = ResponseCache(db_path=self.db_path)
+        cache.put("hot", "H")
+        entered, release = threading.Event(), threading.Event()
+        disk_get = cache._disk_get
+
+        def slow_disk_get(key, now):
+            entered.set()
+            release.wait(5)
+            return disk_get(key, now)
+
+        with patch.object(cache, "_disk_get", side_effect=slow_disk_get):
+            reader = threading.Thread(target=cache.get, args=("cold",))
+            reader.start()
+            self.assertTrue(entered.wait(5))
+            self.assertEqual(cache.get("hot"), "H")
+            release.set()
+            reader.join()
+        cache.close()
+
+    def test_async_disk_tier_runs_off_the_event_loop(self):
+        """Test that aget/aput read and write the disk tier in an executor thread."""
+        cache = ResponseCache(max_entries=1, db_path=self.db_path)
+        threads = []
+        disk_get, disk_put = cache._disk_get, cache._disk_put
+
+        def record(fn):
+            def wrapper(*args):
+                threads.append(threading.get_ident())
+                return fn(*args)
+            return wrapper
+
+        async def run():
+            await cache.aput("a", "A")
+            await cache.aput("b", "B")
+            return await cache.aget("a"), await cache.aget("b")
+
+        with patch.object(cache, "_disk_get", side_effect=record(disk_get)), \
+                patch.object(cache, "_disk_put", side_effect=record(disk_put)):
+            self.assertEqual(asyncio.run(run()), ("A", "B"))
+
+        # Two disk writes, then two disk reads: each promotion evicts the other key
+        self.assertEqual(len(threads), 4)
+        self.assertNotIn(threading.get_ident(), threads)
+        self.assertEqual(cache.stats()["disk_hits"], 2)
+        cache.close()
+
+    def test_route_opt_in(self):
+        """Test that only listed routes use the cache."""
+        self.assertTrue(ResponseCache().enabled_for("urgent"))
+        cache = ResponseCache(routes=["chat"])
+        self.assertTrue(cache.enabled_for("chat"))
+        self.assertFalse(cache.enabled_for("urgent"))
+
+
+if __name__ == "__main__":
+    unittest.main()
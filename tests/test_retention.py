@@ -0,0 +1,109 @@
+"""Tests for message retention policies."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from chat_history import ChatHistoryDB
+from retention import RetentionManager, RetentionPolicy, parse_chat_policies
+
+
+class TestRetention(unittest.TestCase):
+    """Test cases for retention through ChatHistoryDB."""
+
+    def setUp(self):
+        """Set up two chats with one message a day through January."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "history.db")
+        self.db = ChatHistoryDB(self.db_path)
+        for chat_id in ("work", "family"):
+            for day in range(1, 31):
+                self.db.store_message(chat_id, "alice", f"2024-01-{day:02d}T10:00:00Z",
+                                      f"{chat_id} day {day} " + "x" * 500)
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def days(self, chat_id):
+        messages = self.db.get_recent_messages(chat_id, limit=100)
+        return sorted(int(content.split()[2]) for _, _, content, _ in messages)
+
+    def test_max_age_deletes_old_messages(self):
+        """Test that messages older than the age limit are deleted from every chat."""
+        retention = self.db.enable_retention(max_age_days=10)
+        deleted = retention.enforce(now=datetime(2024, 1, 31))
+
+        self.assertEqual(deleted, 40)
+        self.assertEqual(self.days("work"), list(range(21, 31)))
+        self.assertEqual(self.db.get_chat_message_count("family"), 10)
+
+    def test_max_rows_keeps_newest_messages(self):
+        """Test that each chat is trimmed to its newest messages, across several batches."""
+        retention = self.db.enable_retention(max_rows_per_chat=5)
+        retention.batch_size = 7
+
+        self.assertEqual(retention.enforce(), 50)
+        self.assertEqual(self.days("work"), [26, 27, 28, 29, 30])
+        self.assertEqual(self.days("family"), [26, 27, 28, 29, 30])
+
+    def test_chat_policy_overrides_default(self):
+        """Test that a per-chat policy replaces the default for that chat only."""
+        retention = self.db.enable_retention(
+            max_age_days=10, chat_policies=parse_chat_policies('{"family": {"max_rows": 3}}')
+        )
+        retention.enforce(now=datetime(2024, 1, 31))
+
+        self.assertEqual(len(self.days("work")), 10)
+        self.assertEqual(self.days("family"), [28, 29, 30])
+
+    def test_deleted_chats_are_reported(self):
+        """Test that on_delete is called for every chat a batch deleted from."""
+        reported = []
+        retention = self.db.enable_retention(max_age_days=10)
+        retention.on_delete = reported.append
+        retention.batch_size = 25
+
+        retention.enforce(now=datetime(2024, 1, 31))
+        self.assertEqual(sorted(set(reported)), ["family", "work"])
+
+        reported.clear()
+        retention.enforce(now=datetime(2024, 1, 31))
+        self.assertEqual(reported, [])
+
+    def test_delete_chat_history_in_batches(self):
+        """Test that deleting a chat removes all of its messages and nothing else."""
+        self.assertTrue(self.db.delete_chat_history("work"))
+        self.assertEqual(self.db.get_chat_message_count("work"), 0)
+        self.assertEqual(self.db.get_chat_message_count("family"), 30)
+
+    def test_freed_pages_are_returned(self):
+        """Test that new databases vacuum incrementally and shrink after deletes."""
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+            pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+
+        RetentionManager(self.db_path, RetentionPolicy(max_rows=1), order_column="timestamp_ms").enforce()
+
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA freelist_count").fetchone()[0], 0)
+            self.assertLess(conn.execute("PRAGMA page_count").fetchone()[0], pages_before)
+
+    def test_invalid_chat_policies_rejected(self):
+        """Test that malformed policy JSON raises ValueError."""
+        self.assertEqual(parse_chat_policies(""), {})
+        with self.assertRaises(ValueError):
+            parse_chat_policies('["work"]')
+
+
+if __name__ == "__main__":
+    unittest.main()
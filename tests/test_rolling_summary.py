@@ -0,0 +1,130 @@
+"""Tests for incremental per-chat summaries."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from chat_history import ChatHistoryDB
+from message_handler import Message, MessageHandler
+from rolling_summary import RollingSummarizer, load_state, save_state
+
+
+class FakeModel:
+    """Records prompts and answers with numbered summaries."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompt):
+        self.prompts.append(prompt)
+        return f" summary {len(self.prompts)} "
+
+
+class TestRollingSummary(unittest.TestCase):
+    """Test cases for RollingSummarizer over ChatHistoryDB."""
+
+    def setUp(self):
+        """Set up a database with one chat."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "history.db")
+        self.db = ChatHistoryDB(self.db_path)
+        self.model = FakeModel()
+        self.summarizer = RollingSummarizer(
+            self.model, max_new_messages=3, is_command=lambda text: text.startswith("/summary")
+        )
+        self.minute = 0
+
+    def tearDown(self):
+        """Remove the temporary database."""
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def store(self, sender, content, chat_id="chat"):
+        self.minute += 1
+        self.db.store_message(chat_id, sender, f"2024-01-01T10:{self.minute:02d}:00Z", content)
+
+    def test_first_then_incremental_summary(self):
+        """Test that a later summary sends only the messages stored since the last one."""
+        self.store("alice", "lunch at noon?")
+        self.store("bob", "sure")
+        self.assertEqual(self.db.summarize_chat("chat", self.summarizer), "summary 1")
+        self.assertIn("alice: lunch at noon?", self.model.prompts[0])
+
+        self.store("alice", "/summary")
+        self.store("bot", "summary 1")
+        self.store("carol", "count me in")
+        self.assertEqual(self.db.summarize_chat("chat", self.summarizer), "summary 2")
+
+        prompt = self.model.prompts[1]
+        self.assertIn("summary 1", prompt)
+        self.assertIn("carol: count me in", prompt)
+        self.assertNotIn("lunch at noon", prompt)
+        self.assertNotIn("/summary", prompt)
+        self.assertNotIn("bot:", prompt)
+
+    def test_nothing_new_skips_the_model(self):
+        """Test that repeated summary commands reuse the stored summary."""
+        self.store("alice", "hello")
+        self.db.summarize_chat("chat", self.summarizer)
+        self.store("alice", "/summary")
+        self.store("bot", "summary 1")
+
+        self.assertEqual(self.db.summarize_chat("chat", self.summarizer), "summary 1")
+        self.assertEqual(self.db.summarize_chat("chat", self.summarizer), "summary 1")
+        self.assertEqual(len(self.model.prompts), 1)
+        self.assertIsNone(self.db.summarize_chat("empty", self.summarizer))
+
+    def test_backlog_beyond_limit_is_skipped(self):
+        """Test that only the newest max_new_messages are folded in, noting the gap."""
+        self.store("alice", "first")
+        self.db.summarize_chat("chat", self.summarizer)
+        for text in ("one", "two", "three", "four"):
+            self.store("bob", text)
+
+        self.db.summarize_chat("chat", self.summarizer)
+
+        prompt = self.model.prompts[1]
+        self.assertIn("earlier messages were skipped", prompt)
+        self.assertNotIn("bob: one", prompt)
+        self.assertIn("bob: two\nbob: three\nbob: four", prompt)
+
+    def test_state_never_moves_backwards(self):
+        """Test that a slower request cannot overwrite a summary covering later messages."""
+        conn = sqlite3.connect(self.db_path)
+        save_state(conn, "chat", "newer", 10)
+        save_state(conn, "chat", "older", 5)
+        self.assertEqual(load_state(conn, "chat").summary, "newer")
+        conn.close()
+
+    def test_deleting_history_forgets_the_summary(self):
+        """Test that a chat starts over after its history is deleted."""
+        self.store("alice", "secret plans")
+        self.db.summarize_chat("chat", self.summarizer)
+        self.db.delete_chat_history("chat")
+        self.store("alice", "new topic")
+
+        self.db.summarize_chat("chat", self.summarizer)
+
+        self.assertEqual(len(self.model.prompts), 2)
+        self.assertNotIn("summary 1", self.model.prompts[1])
+
+    def test_message_handler_uses_rolling_summary(self):
+        """Test that the auto-reply handler answers /summary from the rolling summary."""
+        handler = MessageHandler(self.db, self.model)
+        self.store("alice", "meeting moved to 3pm")
+
+        response = handler.generate_summary_response(Message("chat", "alice", "/summary", 0))
+
+        self.assertEqual(response.response_text, "📊 **Chat Summary**\n\nsummary 1")
+        self.assertNotIn("/summary", self.model.prompts[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
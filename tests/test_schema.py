@@ -0,0 +1,160 @@
+"""Tests for the shared messages schema and its migrations."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import database
+import schema
+from chat_history import ChatHistoryDB
+from models import MessagePayload
+
+
+class TestSchema(unittest.TestCase):
+    """Test cases for schema.initialize() on new and legacy databases."""
+
+    def setUp(self):
+        """Set up a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "messages.db")
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.tmpdir.cleanup()
+
+    def query(self, sql, params=()):
+        with sqlite3.connect(self.db_path) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def columns(self):
+        return [row[1] for row in self.query("PRAGMA table_info(messages)")]
+
+    def test_new_database_gets_canonical_schema(self):
+        """Test that a new file is created at the latest version with every index."""
+        schema.initialize(self.db_path)
+        schema.initialize(self.db_path)
+
+        self.assertEqual(self.columns(), schema.MESSAGE_COLUMNS)
+        self.assertEqual(self.query("PRAGMA user_version")[0][0], len(schema.MIGRATIONS))
+        names = {row[0] for row in self.query("SELECT name FROM sqlite_master WHERE tbl_name = 'messages'")}
+        for name in ("idx_messages_chat_timestamp", "idx_messages_chat_timestamp_ms",
+                     "idx_chat_message_id", "trg_messages_chat_stats_insert"):
+            self.assertIn(name, names)
+
+    def test_legacy_webhook_table_is_migrated(self):
+        """Test that a database.py table keeps its rows, IDs and dedup under the new names."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sender_id TEXT NOT NULL,
+                    chat_id TEXT NOT NULL,
+                    timestamp DATETIME NOT NULL,
+                    message_text TEXT NOT NULL,
+                    message_id TEXT,
+                    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO messages (sender_id, chat_id, timestamp, message_text, message_id) VALUES (?, ?, ?, ?, ?)",
+                [("alice", "chat", "2024-01-01 10:00:00", "first", "m1"),
+                 ("alice", "chat", "2024-01-01 10:00:00", "first", "m1"),
+                 ("bob", "chat", "2024-01-01 10:01:00", "second lunch", "m2"),
+                 ("bob", "chat", "2024-01-01 10:02:00", "deleted", "m3")]
+            )
+            conn.execute("DELETE FROM messages WHERE message_id = 'm3'")
+
+        db = ChatHistoryDB(self.db_path)
+
+        # Renamed and added in place, so the order differs from a new table's
+        self.assertEqual(sorted(self.columns()), sorted(schema.MESSAGE_COLUMNS))
+        self.assertEqual([(s, c) for s, _, c, _ in db.get_recent_messages("chat")],
+                         [("bob", "second lunch"), ("alice", "first")])
+        self.assertEqual(db.get_chat_message_count("chat"), 2)
+        self.assertEqual(db.search_messages("lunch")[0]["sender"], "bob")
+        self.assertEqual(self.query("SELECT seq FROM sqlite_sequence WHERE name = 'messages'")[0][0], 4)
+
+    def test_legacy_flask_table_is_migrated(self):
+        """Test that an app.py table already at version 1 gets the remaining migrations."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    timestamp DATETIME NOT NULL,
+                    content TEXT NOT NULL,
+                    message_type TEXT DEFAULT 'text'
+                )
+            """)
+            conn.execute("""
+                INSERT INTO messages (chat_id, sender, timestamp, content, message_type)
+                VALUES ('chat', 'bot', '2024-01-01 10:00:00.250000', 'hello', 'text')
+            """)
+            conn.execute("PRAGMA user_version = 1")
+
+        schema.initialize(self.db_path)
+
+        row = self.query("SELECT message_type, created_at, timestamp_ms FROM messages")[0]
+        self.assertEqual(row, ("text", "2024-01-01 10:00:00.250000", 1704103200250))
+
+    def test_legacy_table_is_altered_in_place(self):
+        """Test that migrating a legacy table does not copy it, and rows stored afterwards get created_at."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id TEXT NOT NULL,
+                    sender TEXT NOT NULL,
+                    timestamp DATETIME NOT NULL,
+                    content TEXT NOT NULL
+                )
+            """)
+            conn.executemany(
+                "INSERT INTO messages (chat_id, sender, timestamp, content) VALUES ('chat', 'bob', ?, 'hi')",
+                [(f"2024-01-01 10:00:{i:02d}",) for i in range(12)]
+            )
+        root_page = self.query("SELECT rootpage FROM sqlite_master WHERE name = 'messages'")
+
+        schema.initialize(self.db_path)
+
+        self.assertEqual(self.query("SELECT rootpage FROM sqlite_master WHERE name = 'messages'"), root_page)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM messages WHERE created_at = timestamp")[0][0], 12)
+        self.assertEqual(self.query("SELECT COUNT(*) FROM messages WHERE timestamp_ms IS NOT NULL")[0][0], 12)
+        self.assertEqual(self.query("SELECT name FROM sqlite_master WHERE name LIKE '%created_at_pending'"), [])
+
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("INSERT INTO messages (chat_id, sender, timestamp, content) "
+                         "VALUES ('chat', 'bob', '2024-01-02 09:00:00', 'later')")
+        created_at = self.query("SELECT created_at FROM messages WHERE content = 'later'")[0][0]
+        self.assertIsNotNone(created_at)
+
+    def test_modules_share_one_file(self):
+        """Test that the webhook and chat history modules read each other's messages."""
+        history = ChatHistoryDB(self.db_path)
+        history.store_message("chat", "alice", "2024-01-01T10:00:00Z", "from history")
+        with patch.object(database, "DATABASE_PATH", self.db_path):
+            database.init_database()
+            database.store_message(MessagePayload(
+                sender_id="bob", chat_id="chat", timestamp=datetime(2024, 1, 1, 11, 0),
+                message_text="from webhook", message_id="w1"
+            ))
+            page, _ = database.get_messages_page("chat")
+
+        self.assertEqual([m.message_text for m in page], ["from webhook", "from history"])
+        self.assertEqual(page[1].sender_id, "alice")
+        self.assertEqual(history.get_recent_messages("chat")[0][0], "bob")
+        self.assertEqual(history.get_chat_message_count("chat"), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
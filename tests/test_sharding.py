@@ -0,0 +1,91 @@
+"""Tests for chat-id sharded message storage."""
+
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import database
+from models import MessagePayload
+from sharding import shard_index, shard_paths
+
+
+class TestSharding(unittest.TestCase):
+    """Test cases for database.py in sharded mode."""
+
+    def setUp(self):
+        """Point the module at four shards in a temporary directory."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "messages.db")
+        self.patchers = [
+            patch.object(database, "DATABASE_PATH", self.db_path),
+            patch.object(database, "NUM_SHARDS", 4),
+        ]
+        for patcher in self.patchers:
+            patcher.start()
+        database.init_database()
+
+        self.chats = [f"chat-{i}" for i in range(8)]
+        for n, chat_id in enumerate(self.chats):
+            for i in range(n + 1):
+                database.store_message(MessagePayload(
+                    sender_id="alice",
+                    chat_id=chat_id,
+                    timestamp=datetime(2024, 1, 1, 10, 0) + timedelta(minutes=n * 10 + i),
+                    message_text=f"hello from {chat_id} number {i}",
+                    message_id=f"{chat_id}-{i}"
+                ))
+
+    def tearDown(self):
+        """Remove the temporary shards."""
+        for patcher in self.patchers:
+            patcher.stop()
+        self.tmpdir.cleanup()
+
+    def test_chats_are_routed_to_their_shard(self):
+        """Test that each chat's messages are stored only in its hashed shard."""
+        paths = shard_paths(self.db_path, 4)
+        self.assertFalse(os.path.exists(self.db_path))
+        for chat_id in self.chats:
+            for index, path in enumerate(paths):
+                with sqlite3.connect(path) as conn:
+                    count = conn.execute(
+                        "SELECT COUNT(*) FROM messages WHERE chat_id = ?", (chat_id,)
+                    ).fetchone()[0]
+                expected = self.chats.index(chat_id) + 1 if index == shard_index(chat_id, 4) else 0
+                self.assertEqual(count, expected)
+
+        page, _ = database.get_messages_page("chat-7", 3)
+        self.assertEqual([m.message_text for m in page][0], "hello from chat-7 number 7")
+
+    def test_global_queries_fan_out(self):
+        """Test that stats and search merge results from every shard."""
+        self.assertEqual(database.get_message_count(), 36)
+
+        stats = database.get_chat_stats(limit=3)
+        self.assertEqual(stats["total_chats"], 8)
+        self.assertEqual([chat["chat_id"] for chat in stats["chats"]], ["chat-7", "chat-6", "chat-5"])
+
+        results = database.search_messages("hello", limit=50)
+        self.assertEqual(len(results), 36)
+        self.assertEqual(results, sorted(results, key=lambda result: result["score"]))
+
+    def test_duplicates_are_detected_per_chat_shard(self):
+        """Test that replays are rejected by the shard that holds the chat."""
+        replay = MessagePayload(
+            sender_id="alice", chat_id="chat-3", timestamp=datetime(2024, 1, 1),
+            message_text="again", message_id="chat-3-0"
+        )
+        self.assertIsNone(database.store_message(replay))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+"""Tests for single-flight coalescing of identical LLM requests."""
+
+import sys
+import time
+import asyncio
+import threading
+import unittest
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from single_flight import AsyncSingleFlight, SingleFlight
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test cases for coalescing calls across threads."""
+
+    def run_threads(self, flights, key, fn, count=5):
+        results = []
+
+        def call():
+            try:
+                results.append(flights.do(key, fn))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_concurrent_duplicates_share_one_call(self):
+        """Test that concurrent callers with one key make a single call."""
+        flights = SingleFlight()
+        calls = []
+
+        def request():
+            calls.append(1)
+            time.sleep(0.1)
+            return "summary"
+
+        self.assertEqual(self.run_threads(flights, "k", request), ["summary"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats(), {"in_flight": 0, "calls": 1, "coalesced": 4})
+
+        # Finished flights are not cached
+        self.assertEqual(flights.do("k", lambda: "fresh"), "fresh")
+
+    def test_errors_reach_every_caller(self):
+        """Test that a failed call raises in every waiting caller."""
+        def request():
+            time.sleep(0.1)
+            raise RuntimeError("rate limited")
+
+        results = self.run_threads(SingleFlight(), "k", request, count=3)
+
+        self.assertEqual([str(r) for r in results], ["rate limited"] * 3)
+
+    def test_different_keys_do_not_wait(self):
+        """Test that calls with different keys run independently."""
+        flights = SingleFlight()
+        self.assertEqual(flights.do("a", lambda: 1), 1)
+        self.assertEqual(flights.do("b", lambda: 2), 2)
+        self.assertEqual(flights.stats()["coalesced"], 0)
+
+
+class TestAsyncSingleFlight(unittest.TestCase):
+    """Test cases for coalescing coroutine calls and streams."""
+
+    def test_concurrent_duplicates_share_one_call(self):
+        """Test that a cancelled caller does not cancel the shared call."""
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def request():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "reply"
+
+        async def run():
+            first = asyncio.create_task(flights.do("k", request))
+            await asyncio.sleep(0)
+            others = [asyncio.create_task(flights.do("k", request)) for _ in range(3)]
+            await asyncio.sleep(0)
+            first.cancel()
+            return await asyncio.gather(*others)
+
+        self.assertEqual(asyncio.run(run()), ["reply"] * 3)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flights.stats(), {"calls": 1, "coalesced": 3})
+
+    def test_stream_fans_out_to_late_joiners(self):
+        """Test that every consumer of a coalesced stream gets every chunk."""
+        flights = AsyncSingleFlight()
+        upstreams = []
+
+        async def upstream():
+            upstreams.append(1)
+            for chunk in ("Hel", "lo ", "there"):
+                await asyncio.sleep(0.02)
+                yield chunk
+
+        async def consume(delay):
+            await asyncio.sleep(delay)
+            return "".join([chunk async for chunk in flights.stream("k", upstream)])
+
+        async def run():
+            return await asyncio.gather(consume(0), consume(0), consume(0.03))
+
+        self.assertEqual(asyncio.run(run()), ["Hello there"] * 3)
+        self.assertEqual(len(upstreams), 1)
+
+    def test_stream_stops_when_consumers_leave(self):
+        """Test that the upstream stream is closed once nobody reads it."""
+        flights = AsyncSingleFlight()
+        closed = []
+
+        async def upstream():
+            try:
+                while True:
+                    await asyncio.sleep(0.01)
+                    yield "chunk"
+            finally:
+                closed.append(1)
+
+        async def run():
+            stream = flights.stream("k", upstream)
+            self.assertEqual(await stream.__anext__(), "chunk")
+            await stream.aclose()
+            await asyncio.sleep(0.02)
+            # The next request starts a new upstream stream
+            stream = flights.stream("k", upstream)
+            await stream.__anext__()
+            await stream.aclose()
+            await asyncio.sleep(0.02)
+
+        asyncio.run(run())
+        self.assertEqual(closed, [1, 1])
+        self.assertEqual(flights.stats()["coalesced"], 0)
+
+    def test_stream_errors_reach_consumers(self):
+        """Test that an upstream failure is raised after the chunks received."""
+        flights = AsyncSingleFlight()
+
+        async def upstream():
+            yield "partial"
+            raise RuntimeError("connection reset")
+
+        async def run():
+            chunks = []
+            with self.assertRaises(RuntimeError):
+                async for chunk in flights.stream("k", upstream):
+                    chunks.append(chunk)
+            return chunks
+
+        self.assertEqual(asyncio.run(run()), ["partial"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for time-window summaries: command parsing and range queries."""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import database
+from chat_history import ChatHistoryDB
+from models import MessagePayload
+from summary_window import parse_summary_window
+
+NOW = datetime(2024, 3, 10, 14, 30)
+
+
+class TestParseSummaryWindow(unittest.TestCase):
+    """Test cases for parse_summary_window."""
+
+    def test_durations(self):
+        """Test relative durations in each unit."""
+        self.assertEqual(parse_summary_window("24h", NOW), (datetime(2024, 3, 9, 14, 30), NOW))
+        self.assertEqual(parse_summary_window("last 2 days", NOW), (datetime(2024, 3, 8, 14, 30), NOW))
+        self.assertEqual(parse_summary_window("90 min", NOW), (datetime(2024, 3, 10, 13, 0), NOW))
+        self.assertEqual(parse_summary_window("1w", NOW), (datetime(2024, 3, 3, 14, 30), NOW))
+
+    def test_clock_times(self):
+        """Test 'since' clock times, rolling back a day for times still to come."""
+        self.assertEqual(parse_summary_window("since 9am", NOW), (datetime(2024, 3, 10, 9, 0), NOW))
+        self.assertEqual(parse_summary_window("since 12am", NOW), (datetime(2024, 3, 10, 0, 0), NOW))
+        self.assertEqual(parse_summary_window("since 21:30", NOW), (datetime(2024, 3, 9, 21, 30), NOW))
+        self.assertEqual(parse_summary_window("3pm", NOW), (datetime(2024, 3, 9, 15, 0), NOW))
+
+    def test_days(self):
+        """Test today and yesterday."""
+        self.assertEqual(parse_summary_window("Today", NOW), (datetime(2024, 3, 10), NOW))
+        self.assertEqual(parse_summary_window("since  yesterday", NOW), (datetime(2024, 3, 9), NOW))
+
+    def test_empty_and_invalid(self):
+        """Test that no argument means no window and nonsense is rejected."""
+        self.assertIsNone(parse_summary_window("  ", NOW))
+        for text in ["lots", "0h", "since 25:00", "13pm", "9"]:
+            with self.assertRaises(ValueError, msg=text):
+                parse_summary_window(text, NOW)
+
+
+class TestGetMessagesBetween(unittest.TestCase):
+    """Test cases for time-range history reads."""
+
+    def setUp(self):
+        """Set up a history spanning two months, one of them archived."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db = ChatHistoryDB(os.path.join(self.tmpdir.name, "history.db"))
+        for day in range(25, 32):
+            self.db.store_message("chat", "alice", f"2024-01-{day}T12:00:00Z", f"jan {day}")
+        for day in range(1, 6):
+            self.db.store_message("chat", "bob", f"2024-02-0{day}T12:00:00Z", f"feb {day}")
+        self.db.store_message("other", "carol", "2024-02-03T12:00:00Z", "elsewhere")
+
+    def tearDown(self):
+        """Remove the temporary files."""
+        self.db.close()
+        self.tmpdir.cleanup()
+
+    def contents(self, rows):
+        return [content for _, _, content, _ in rows]
+
+    def test_window_is_half_open_and_oldest_first(self):
+        """Test that since is inclusive, until exclusive and other chats are excluded."""
+        rows = self.db.get_messages_between("chat", datetime(2024, 2, 2, 12), datetime(2024, 2, 4, 12))
+        self.assertEqual(self.contents(rows), ["feb 2", "feb 3"])
+
+    def test_limit_keeps_newest(self):
+        """Test that a limit returns the newest messages of the window."""
+        rows = self.db.get_messages_between("chat", datetime(2024, 1, 1), datetime(2024, 3, 1), limit=3)
+        self.assertEqual(self.contents(rows), ["feb 3", "feb 4", "feb 5"])
+
+    def test_window_continues_into_archive(self):
+        """Test that a window reaching past the hot table reads the archive files."""
+        archiver = self.db.enable_archiving(os.path.join(self.tmpdir.name, "archive"), max_age_days=10)
+        self.assertEqual(archiver.archive(now=datetime(2024, 2, 10)), {"2024-01": 6})
+
+        rows = self.db.get_messages_between("chat", datetime(2024, 1, 30), datetime(2024, 2, 2, 13))
+        self.assertEqual(self.contents(rows), ["jan 30", "jan 31", "feb 1", "feb 2"])
+        rows = self.db.get_messages_between("chat", datetime(2024, 1, 1), datetime(2024, 3, 1), limit=7)
+        self.assertEqual(self.contents(rows), ["jan 30", "jan 31"] + [f"feb {d}" for d in range(1, 6)])
+
+    def test_webhook_storage_range(self):
+        """Test database.get_messages_between on a sharded store."""
+        with patch.object(database, "DATABASE_PATH", os.path.join(self.tmpdir.name, "messages.db")), \
+                patch.object(database, "NUM_SHARDS", 2):
+            database.init_database()
+            for hour in range(8, 14):
+                database.store_message(MessagePayload(
+                    sender_id="alice", chat_id="chat", timestamp=datetime(2024, 1, 1, hour),
+                    message_text=f"at {hour}", message_id=f"m{hour}"
+                ))
+            messages = database.get_messages_between("chat", datetime(2024, 1, 1, 9), datetime(2024, 1, 1, 12),
+                                                     limit=2)
+
+        self.assertEqual([m.message_text for m in messages], ["at 10", "at 11"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for the completion requests made by TypingSimulator."""
+
+import sys
+import asyncio
+import unittest
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import Config
+from typing_simulator import TypingSimulator
+
+MESSAGES = [{"role": "user", "content": "Explain SQLite WAL mode"}]
+
+
+class FakeGPTClient:
+    """Records the keyword arguments of every completion request."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def stream_completion(self, messages, **kwargs):
+        self.requests.append(kwargs)
+        yield "A reply."
+
+    async def get_completion(self, messages, **kwargs):
+        self.requests.append(kwargs)
+        return "A reply."
+
+
+class TestTypingSimulator(unittest.TestCase):
+    """Test cases for the requests behind streamed and simple replies."""
+
+    def setUp(self):
+        """Set up a simulator with a recording client and no real delays."""
+        self.simulator = TypingSimulator()
+        self.simulator.gpt_client = FakeGPTClient()
+        self.whatsapp = AsyncMock()
+        for patcher in (
+            patch("typing_simulator.asyncio.sleep", new=AsyncMock()),
+            # config.py's second Config class, the one in effect, lacks the typing settings
+            patch.multiple(Config, create=True, TYPING_INDICATOR_DELAY=0, TYPING_DELAY_PER_WORD=0),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_replies_capped_at_reserved_tokens(self):
+        """Test that both reply paths pass the completion budget ContextBuilder reserved."""
+        asyncio.run(self.simulator.stream_response_with_typing("chat", MESSAGES, self.whatsapp))
+        asyncio.run(self.simulator.handle_simple_response("chat", MESSAGES, self.whatsapp))
+
+        self.assertEqual(self.simulator.gpt_client.requests, [{"max_tokens": Config.LLM_MAX_TOKENS}] * 2)
+        self.whatsapp.send_message.assert_awaited_with("chat", "A reply.")
+
+
+if __name__ == "__main__":
+    unittest.main()
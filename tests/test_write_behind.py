@@ -0,0 +1,86 @@
+"""Tests for the group-commit write-behind queue."""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from connection_manager import ConnectionManager
+from write_behind import WriteBehindQueue
+from chat_history import ChatHistoryDB
+
+INSERT_SQL = "INSERT INTO items (name) VALUES (?)"
+
+
+class TestWriteBehindQueue(unittest.TestCase):
+    """Test cases for the WriteBehindQueue class."""
+
+    def setUp(self):
+        """Set up a queue on a temporary database."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manager = ConnectionManager(os.path.join(self.tmpdir.name, "test.db"))
+        with self.manager.writer() as conn:
+            conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE)")
+
+    def tearDown(self):
+        """Close connections and remove the temporary database."""
+        self.manager.close()
+        self.tmpdir.cleanup()
+
+    def count_items(self):
+        with self.manager.reader() as conn:
+            return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+    def test_futures_resolve_with_row_ids(self):
+        """Test that want_rowid futures resolve to the inserted row ids."""
+        wb = WriteBehindQueue(self.manager, flush_interval_ms=10)
+        futures = [wb.submit(INSERT_SQL, (f"item{i}",), want_rowid=True) for i in range(5)]
+        ids = [future.result(timeout=5) for future in futures]
+        wb.close()
+
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+    def test_rows_are_committed_in_batches(self):
+        """Test that many queued rows share a single commit."""
+        wb = WriteBehindQueue(self.manager, max_batch=1000, flush_interval_ms=1000)
+        with patch.object(self.manager, "writer", wraps=self.manager.writer) as writer:
+            for i in range(200):
+                wb.submit(INSERT_SQL, (f"item{i}",))
+            wb.flush(timeout=5)
+            self.assertEqual(writer.call_count, 1)
+        wb.close()
+
+        self.assertEqual(self.count_items(), 200)
+
+    def test_failed_batch_sets_exceptions(self):
+        """Test that a failing batch is rolled back and reported through futures."""
+        wb = WriteBehindQueue(self.manager, flush_interval_ms=1000)
+        first = wb.submit(INSERT_SQL, ("dup",))
+        second = wb.submit(INSERT_SQL, ("dup",))
+        wb.flush(timeout=5)
+        wb.close()
+
+        self.assertIsNotNone(first.exception())
+        self.assertIsNotNone(second.exception())
+        self.assertEqual(self.count_items(), 0)
+
+    def test_chat_history_write_behind(self):
+        """Test that ChatHistoryDB queues messages until flushed."""
+        db = ChatHistoryDB(os.path.join(self.tmpdir.name, "history.db"), write_behind=True,
+                           flush_interval_ms=1000)
+        for i in range(10):
+            self.assertTrue(db.store_message("chat", "alice", f"2024-01-01T10:{i:02d}:00Z", f"msg {i}"))
+        db.flush()
+
+        self.assertEqual(db.get_chat_message_count("chat"), 10)
+        db.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
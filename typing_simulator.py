@@ -102,7 +102,10 @@ class TypingSimulator:
             # Collect the full response first
             if self.gpt_client:
                 full_response = ""
-                async for chunk in self.gpt_client.stream_completion(messages):
+                # Capped at the reply budget ContextBuilder reserved when trimming the history
+                async for chunk in self.gpt_client.stream_completion(
+                    messages, max_tokens=self.config.LLM_MAX_TOKENS
+                ):
                     full_response += chunk
             else:
                 full_response = "Mock response: This is a test response for demonstration purposes."
@@ -159,7 +162,9 @@ class TypingSimulator:
             
             # Get complete response
             if self.gpt_client:
-                response = await self.gpt_client.get_completion(messages)
+                response = await self.gpt_client.get_completion(
+                    messages, max_tokens=self.config.LLM_MAX_TOKENS
+                )
             else:
                 response = "Mock response: Hello! This is a test response."
             
@@ -0,0 +1,162 @@
+"""
+Group-commit write-behind queue for SQLite inserts.
+
+Committing one row per transaction costs one fsync per message. The
+WriteBehindQueue buffers inserts in a bounded in-process queue and a single
+writer thread flushes them in one transaction, either once max_batch rows are
+waiting or flush_interval_ms after the first row of a batch arrived.
+
+Callers get a concurrent.futures.Future back from submit(). It resolves once
+the row is committed, with the row id when want_rowid=True was requested.
+Rows are not visible to readers until their batch is committed; call flush()
+when a caller needs to read its own writes.
+"""
+
+import atexit
+import queue
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, List, Optional, Sequence, Tuple
+
+from connection_manager import ConnectionManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 500
+DEFAULT_FLUSH_INTERVAL_MS = 50
+DEFAULT_MAX_PENDING = 10000
+
+# (sql, params, future, want_rowid); sql is None for flush barriers
+_Item = Tuple[Optional[str], Optional[Sequence[Any]], Future, bool]
+
+
+class WriteBehindQueue:
+    """Buffers INSERT statements and commits them in batches from one thread."""
+
+    def __init__(
+        self,
+        manager: ConnectionManager,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        flush_interval_ms: int = DEFAULT_FLUSH_INTERVAL_MS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+    ):
+        """
+        Initialize the queue and start its writer thread.
+
+        Args:
+            manager: Connection manager whose writer connection is used for flushes
+            max_batch: Number of queued rows that triggers an immediate flush
+            flush_interval_ms: Maximum time a row waits before being flushed
+            max_pending: Queue capacity; submit() blocks when it is full
+        """
+        self.manager = manager
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval_ms / 1000
+        self._queue: "queue.Queue[_Item]" = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, sql: str, params: Sequence[Any], want_rowid: bool = False) -> Future:
+        """
+        Queue a single-row INSERT.
+
+        Args:
+            sql: Parameterised INSERT statement
+            params: Values for the statement placeholders
+            want_rowid: Resolve the future with the inserted row id (None if
+                the statement inserted nothing, e.g. ON CONFLICT DO NOTHING)
+
+        Returns:
+            Future that resolves once the row is committed
+        """
+        if self._closed:
+            raise RuntimeError("WriteBehindQueue is closed")
+        future: Future = Future()
+        self._queue.put((sql, params, future, want_rowid))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every row submitted before this call is committed."""
+        if self._closed:
+            return
+        barrier: Future = Future()
+        self._queue.put((None, None, barrier, False))
+        barrier.result(timeout)
+
+    def close(self) -> None:
+        """Flush pending rows and stop the writer thread."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put((None, None, Future(), False))
+        self._thread.join()
+
+    def _run(self) -> None:
+        """Writer thread: collect batches and commit them."""
+        while True:
+            first = self._queue.get()
+            batch: List[_Item] = [first]
+            barriers: List[Future] = []
+            deadline = time.monotonic() + self.flush_interval
+
+            if first[0] is None:
+                barriers.append(first[2])
+            else:
+                while len(batch) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if item[0] is None:
+                        barriers.append(item[2])
+                        break
+                    batch.append(item)
+
+            rows = [item for item in batch if item[0] is not None]
+            if rows:
+                self._write_batch(rows)
+            for barrier in barriers:
+                barrier.set_result(None)
+
+            if self._closed and self._queue.empty():
+                return
+
+    def _write_batch(self, rows: List[_Item]) -> None:
+        """Write one batch in a single transaction and resolve its futures."""
+        results: List[Optional[int]] = []
+        try:
+            with self.manager.writer() as conn:
+                start = 0
+                while start < len(rows):
+                    # Group consecutive rows that share a statement
+                    sql = rows[start][0]
+                    end = start
+                    while end < len(rows) and rows[end][0] == sql:
+                        end += 1
+                    group = rows[start:end]
+
+                    if any(item[3] for item in group):
+                        for item in group:
+                            cursor = conn.execute(sql, item[1])
+                            results.append(cursor.lastrowid if cursor.rowcount else None)
+                    else:
+                        conn.executemany(sql, [item[1] for item in group])
+                        results.extend([None] * len(group))
+                    start = end
+        except Exception as e:
+            logger.error(f"Error flushing {len(rows)} queued writes: {e}")
+            for item in rows:
+                item[2].set_exception(e)
+            return
+
+        for item, row_id in zip(rows, results):
+            item[2].set_result(row_id)
+        logger.debug(f"Flushed {len(rows)} queued writes")